@@ -62,6 +62,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.tenancy.EmpresaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -125,10 +126,46 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Cache compartilhado entre os processos (web e Celery), ex.: redis://redis:6379/2.
+# Sem ele cada processo tem o seu LocMem, que não serve para nada que
+# precise ser invalidado entre processos.
+CACHE_URL = os.environ.get('CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+# Segundos que a empresa do usuário fica no cache (0 = só por request).
+# Só é ligado por padrão com o cache compartilhado: com LocMem, salvar ou
+# apagar a Empresa limparia o cache de um processo só.
+EMPRESA_CACHE_TTL = int(os.environ.get('EMPRESA_CACHE_TTL', 30 if CACHE_URL else 0))
+
 # Celery
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/1')
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://redis:6379/1')
 
+# Reprecificação de orçamentos: espera N segundos sem novas alterações
+# de custo (no máximo ESPERA_MAXIMA desde a primeira) antes de rodar
+REPRECIFICACAO_ESPERA = int(os.environ.get('REPRECIFICACAO_ESPERA', 60))
+REPRECIFICACAO_ESPERA_MAXIMA = int(os.environ.get('REPRECIFICACAO_ESPERA_MAXIMA', 600))
+# A cada N segundos o beat reenfileira as rodadas que passaram da hora
+REPRECIFICACAO_VARREDURA = int(os.environ.get('REPRECIFICACAO_VARREDURA', 300))
+
+# Documento do orçamento 'processando' há mais de N segundos: a task
+# se perdeu e a próxima consulta agenda de novo
+DOCUMENTO_TIMEOUT = int(os.environ.get('DOCUMENTO_TIMEOUT', 300))
+
+# Tarefas periódicas (processo "celery -A core beat")
+CELERY_BEAT_SCHEDULE = {
+    'reagendar-reprecificacoes': {
+        'task': 'quotes.tasks.reagendar_reprecificacoes',
+        'schedule': REPRECIFICACAO_VARREDURA,
+    },
+}
+
 
 # ===============================================
 # === CONFIGURAÇÕES PARA ALLAUTH E GOOGLE LOGIN ===
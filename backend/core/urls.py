@@ -7,7 +7,7 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from subscriptions.views import PlanViewSet, SubscriptionViewSet
 from payments.views import PaymentViewSet
 from users.views import SocialLoginRedirectView 
-#from quotes.views import OrcamentoViewSet
+from quotes.views import OrcamentoViewSet
 from pricing.views import ProdutoViewSet, ComposicaoViewSet
 
 # Router para ViewSets
@@ -17,6 +17,7 @@ router.register(r'subscriptions', SubscriptionViewSet, basename='subscription')
 router.register(r'payments', PaymentViewSet, basename='payment')
 router.register(r'produtos', ProdutoViewSet, basename='produto')
 router.register(r'composicoes', ComposicaoViewSet, basename='composicao')
+router.register(r'orcamentos', OrcamentoViewSet, basename='orcamento')
 
 urlpatterns = [
     path('', lambda r: redirect('api/', permanent=False)),
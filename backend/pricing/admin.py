@@ -1,27 +1,59 @@
 # Em backend/pricing/admin.py
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import BaseInlineFormSet
 from .models import Produto, Composicao, ItemComposicao # <- Novas importações
+from .custos import propagar_custos
+from .alcance import componentes_que_criam_ciclo, atualizar_alcance, sincronizar_receita, travar_receitas
+
+
+class ItemComposicaoFormSet(BaseInlineFormSet):
+    """Rejeita receitas circulares também quando editadas pelo admin."""
+    def clean(self):
+        super().clean()
+        componentes = {
+            form.cleaned_data['componente'].id
+            for form in self.forms
+            if form.cleaned_data.get('componente') and not form.cleaned_data.get('DELETE')
+        }
+        # O admin já salva dentro de uma transação: a trava vale até o save_related
+        travar_receitas(self.instance.empresa_id)
+        if componentes_que_criam_ciclo(self.instance.produto_acabado_id, componentes):
+            raise ValidationError("Receita circular: algum item já usa este produto (ou é o próprio produto).")
 
 # Esta classe "inline" permite que você adicione
 # Itens de Composição (ingredientes) diretamente
 # dentro da página da Composição (receita). É muito útil.
 class ItemComposicaoInline(admin.TabularInline):
     model = ItemComposicao
+    formset = ItemComposicaoFormSet
     extra = 1 # Começa com 1 linha de ingrediente em branco
     autocomplete_fields = ['componente'] # Facilita buscar o produto
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('componente')
+
 
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'empresa', 'tipo', 'unidade_medida', 'preco_custo', 'is_active')
+    list_display = ('nome', 'empresa', 'tipo', 'unidade_medida', 'preco_custo', 'custo_calculado', 'is_active')
+    list_select_related = ('empresa',)
     list_filter = ('empresa', 'tipo', 'is_active')
     search_fields = ('nome', 'codigo_sku', 'empresa__nome_fantasia')
     autocomplete_fields = ['empresa']
     ordering = ('nome',)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Mantém o custo calculado (deste item e das receitas que o usam)
+        if not change or 'preco_custo' in form.changed_data:
+            propagar_custos([obj.id])
+
 @admin.register(Composicao)
 class ComposicaoAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'empresa', 'custo_adicional_fixo')
+    list_select_related = ('produto_acabado', 'empresa') # O __str__ usa o produto
     list_filter = ('empresa',)
     search_fields = ('produto_acabado__nome', 'empresa__nome_fantasia')
     
@@ -30,5 +62,37 @@ class ComposicaoAdmin(admin.ModelAdmin):
     
     autocomplete_fields = ['empresa', 'produto_acabado']
 
+    def save_model(self, request, obj, form, change):
+        # Guarda os itens de antes para atualizar o índice de alcance
+        obj._itens_anteriores = (
+            dict(obj.itens.values_list('componente_id', 'quantidade')) if change else {}
+        )
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # Os itens (inline) só estão salvos depois do save_related
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        atuais = dict(obj.itens.values_list('componente_id', 'quantidade'))
+        produto_anterior_id = form.initial.get('produto_acabado', obj.produto_acabado_id)
+        sincronizar_receita(
+            obj.empresa_id, produto_anterior_id, obj.produto_acabado_id, obj._itens_anteriores, atuais
+        )
+        propagar_custos({produto_anterior_id, obj.produto_acabado_id})
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Composicao.objects.filter(pk=obj.pk))
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        receitas = list(queryset.values_list('id', 'empresa_id', 'produto_acabado_id'))
+        for empresa_id in sorted({empresa_id for _, empresa_id, _ in receitas}):
+            travar_receitas(empresa_id)
+        for composicao_id, empresa_id, produto_id in receitas:
+            itens = ItemComposicao.objects.filter(composicao_id=composicao_id).values_list('componente_id', 'quantidade')
+            atualizar_alcance(empresa_id, produto_id, removidos=dict(itens))
+        super().delete_queryset(request, queryset)
+        propagar_custos([produto_id for _, _, produto_id in receitas])
+
 # Nota: Não precisamos registrar o ItemComposicao separadamente
 # porque ele já é gerenciável através do ComposicaoAdmin.
\ No newline at end of file
@@ -0,0 +1,231 @@
+# Em backend/pricing/alcance.py
+"""
+Manutenção do índice de alcance (AlcanceComposicao).
+
+O índice guarda, para cada par (ancestral, descendente, profundidade),
+QUANTOS caminhos ligam os dois e a quantidade acumulada neles. Com isso
+dá para aplicar tanto a inclusão quanto a remoção de um item de receita
+(produto -> componente, quantidade q) só com somas/subtrações:
+
+    caminhos(A, D)   +/-= caminhos(A, produto) x caminhos(componente, D)
+    quantidade(A, D) +/-= quantidade(A, produto) x q x quantidade(componente, D)
+
+para todo ancestral A do produto e todo descendente D do componente
+(contando o próprio produto/componente com profundidade 0 e quantidade 1).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from users.models import Empresa
+from .grafo import GrafoComposicao
+from .models import AlcanceComposicao
+
+CASAS_QUANTIDADE = Decimal('0.0000000001')
+
+
+class AlcanceInconsistente(Exception):
+    """
+    O índice não bate com as receitas (ex.: remover um caminho que o
+    índice não tem). Rode: python manage.py reconstruir_alcance
+    """
+
+
+def travar_receitas(empresa_id):
+    """
+    Trava a Empresa até o fim da transação. Quem grava receitas chama
+    isto ANTES da checagem de ciclo: assim duas edições concorrentes da
+    mesma empresa não passam as duas na checagem (A -> B e B -> A) nem
+    aplicam variações sobre um índice que a outra ainda está mudando.
+    """
+    if empresa_id:
+        list(Empresa.objects.select_for_update().filter(pk=empresa_id).values_list('pk', flat=True))
+
+
+def componentes_que_criam_ciclo(produto_id, componente_ids):
+    """
+    Retorna os componentes que, se entrarem na receita do produto,
+    formam um ciclo: o próprio produto, ou qualquer item que já usa
+    o produto (em qualquer nível). Chame dentro da transação que grava
+    a receita, depois de travar_receitas.
+
+    Uma única query indexada, independente do tamanho da receita.
+    """
+    componente_ids = set(componente_ids)
+    if not produto_id or not componente_ids:
+        return set()
+
+    proibidos = {produto_id} & componente_ids
+    proibidos.update(
+        AlcanceComposicao.objects.filter(
+            descendente_id=produto_id, ancestral_id__in=componente_ids
+        ).values_list('ancestral_id', flat=True)
+    )
+    return proibidos
+
+
+def ancestrais(produto_ids):
+    """Todos os produtos que usam algum dos produtos informados, em qualquer nível."""
+    return set(
+        AlcanceComposicao.objects.filter(descendente_id__in=set(produto_ids))
+        .values_list('ancestral_id', flat=True)
+        .distinct()
+    )
+
+
+def _acumulado():
+    """{(outro_id, profundidade): [caminhos, quantidade]}"""
+    return defaultdict(lambda: [0, Decimal(0)])
+
+
+def atualizar_alcance(empresa_id, produto_id, removidos=None, adicionados=None):
+    """
+    Aplica ao índice as mudanças nos itens da receita de UM produto.
+
+    'removidos' e 'adicionados' são {componente_id: quantidade}. Mudar só
+    a quantidade de um item é removê-lo com a quantidade antiga e
+    adicioná-lo com a nova. As checagens de ciclo devem ter sido feitas
+    antes (componentes_que_criam_ciclo).
+
+    Custo: 3 queries de leitura + gravações em lote, seja qual for o
+    tamanho da receita.
+    """
+    removidos, adicionados = removidos or {}, adicionados or {}
+    if not removidos and not adicionados:
+        return
+
+    # Quem usa o produto (não muda com a edição da receita dele)
+    ancestrais = _acumulado()
+    ancestrais[(produto_id, 0)] = [1, Decimal(1)]
+    linhas = (
+        AlcanceComposicao.objects.filter(descendente_id=produto_id)
+        .values_list('ancestral_id', 'profundidade', 'caminhos', 'quantidade')
+    )
+    for ancestral_id, profundidade, caminhos, quantidade in linhas:
+        ancestrais[(ancestral_id, profundidade)] = [caminhos, quantidade]
+
+    # O que cada componente alterado usa
+    descendentes = defaultdict(_acumulado)
+    for componente_id in set(removidos) | set(adicionados):
+        descendentes[componente_id][(componente_id, 0)] = [1, Decimal(1)]
+    linhas = (
+        AlcanceComposicao.objects.filter(ancestral_id__in=list(descendentes))
+        .values_list('ancestral_id', 'descendente_id', 'profundidade', 'caminhos', 'quantidade')
+    )
+    for componente_id, descendente_id, profundidade, caminhos, quantidade in linhas:
+        descendentes[componente_id][(descendente_id, profundidade)] = [caminhos, quantidade]
+
+    variacao = _acumulado()
+    mudancas = [(c, q, -1) for c, q in removidos.items()] + [(c, q, 1) for c, q in adicionados.items()]
+    for componente_id, quantidade_item, sinal in mudancas:
+        for (ancestral_id, prof_a), (caminhos_a, qtd_a) in ancestrais.items():
+            for (descendente_id, prof_d), (caminhos_d, qtd_d) in descendentes[componente_id].items():
+                delta = variacao[(ancestral_id, descendente_id, prof_a + 1 + prof_d)]
+                delta[0] += sinal * caminhos_a * caminhos_d
+                delta[1] += sinal * (qtd_a * quantidade_item * qtd_d).quantize(CASAS_QUANTIDADE)
+
+    _aplicar_variacao(empresa_id, variacao)
+
+
+def sincronizar_receita(empresa_id, produto_anterior_id, produto_id, anteriores, atuais):
+    """
+    Atualiza o índice depois de salvar uma receita.
+
+    'anteriores' e 'atuais' são {componente_id: quantidade} de antes e
+    depois do salvamento. Se a receita trocou de produto, sai tudo do
+    produto antigo e entra tudo no novo.
+    """
+    if produto_anterior_id and produto_anterior_id != produto_id:
+        atualizar_alcance(empresa_id, produto_anterior_id, removidos=anteriores)
+        atualizar_alcance(empresa_id, produto_id, adicionados=atuais)
+        return
+
+    atualizar_alcance(
+        empresa_id, produto_id,
+        removidos={c: q for c, q in anteriores.items() if atuais.get(c) != q},
+        adicionados={c: q for c, q in atuais.items() if anteriores.get(c) != q},
+    )
+
+
+def _aplicar_variacao(empresa_id, variacao):
+    """
+    Soma a variação às linhas existentes (criando/apagando o necessário).
+    Levanta AlcanceInconsistente se alguma linha ficaria com caminhos
+    negativos: o índice estava desatualizado e gravar só pioraria.
+    """
+    variacao = {chave: valor for chave, valor in variacao.items() if valor[0] or valor[1]}
+    if not variacao:
+        return
+
+    existentes = AlcanceComposicao.objects.filter(
+        ancestral_id__in={a for a, _, _ in variacao},
+        descendente_id__in={d for _, d, _ in variacao},
+    ).only('id', 'ancestral_id', 'descendente_id', 'profundidade', 'caminhos', 'quantidade')
+    por_chave = {(l.ancestral_id, l.descendente_id, l.profundidade): l for l in existentes}
+
+    criar, atualizar, apagar = [], [], []
+    for chave, (caminhos, quantidade) in variacao.items():
+        linha = por_chave.get(chave)
+        if (linha.caminhos if linha else 0) + caminhos < 0:
+            ancestral_id, descendente_id, profundidade = chave
+            raise AlcanceInconsistente(
+                f"Índice de alcance desatualizado: o produto {ancestral_id} não usa o {descendente_id} "
+                f"no nível {profundidade}. Rode: python manage.py reconstruir_alcance --empresa {empresa_id}"
+            )
+        if linha is None:
+            ancestral_id, descendente_id, profundidade = chave
+            criar.append(AlcanceComposicao(
+                empresa_id=empresa_id, ancestral_id=ancestral_id, descendente_id=descendente_id,
+                profundidade=profundidade, caminhos=caminhos, quantidade=quantidade,
+            ))
+        elif linha.caminhos + caminhos == 0:
+            apagar.append(linha.id)
+        else:
+            linha.caminhos += caminhos
+            linha.quantidade += quantidade
+            atualizar.append(linha)
+
+    if apagar:
+        AlcanceComposicao.objects.filter(id__in=apagar).delete()
+    AlcanceComposicao.objects.bulk_update(atualizar, ['caminhos', 'quantidade'], batch_size=1000)
+    AlcanceComposicao.objects.bulk_create(criar, batch_size=1000)
+
+
+def calcular_alcance(grafo):
+    """
+    Índice completo a partir do grafo em memória (sem tocar no banco):
+    {ancestral_id: {(descendente_id, profundidade): [caminhos, quantidade]}}.
+    Levanta CicloNaComposicao se as receitas tiverem um ciclo.
+    """
+    descendentes = {}
+    for produto_id in grafo.ordem_topologica():
+        acumulado = _acumulado()
+        for componente_id, quantidade_item in grafo.componentes.get(produto_id, ()):
+            direto = acumulado[(componente_id, 1)]
+            direto[0] += 1
+            direto[1] += quantidade_item
+            for (descendente_id, profundidade), (caminhos, quantidade) in descendentes[componente_id].items():
+                indireto = acumulado[(descendente_id, profundidade + 1)]
+                indireto[0] += caminhos
+                indireto[1] += (quantidade_item * quantidade).quantize(CASAS_QUANTIDADE)
+        descendentes[produto_id] = acumulado
+    return descendentes
+
+
+def reconstruir_alcance(empresa):
+    """
+    Reconstrói do zero o índice da empresa a partir do grafo em memória.
+    Usado na carga inicial ou se o índice ficar inconsistente.
+    """
+    descendentes = calcular_alcance(GrafoComposicao.carregar(empresa))
+    AlcanceComposicao.objects.filter(empresa=empresa).delete()
+    AlcanceComposicao.objects.bulk_create(
+        (
+            AlcanceComposicao(
+                empresa=empresa, ancestral_id=ancestral_id, descendente_id=descendente_id,
+                profundidade=profundidade, caminhos=caminhos, quantidade=quantidade,
+            )
+            for ancestral_id, acumulado in descendentes.items()
+            for (descendente_id, profundidade), (caminhos, quantidade) in acumulado.items()
+        ),
+        batch_size=1000,
+    )
@@ -0,0 +1,57 @@
+# Em backend/pricing/busca.py
+"""
+Busca rápida de produtos por nome/SKU (autocomplete do editor de receitas).
+
+No PostgreSQL a busca usa os índices trigram (pg_trgm) criados na
+migração 0009: "contém" no nome e "começa com" no SKU são atendidos pelo
+índice, e o resultado é ordenado pela similaridade. Em outros bancos
+(SQLite dos testes) vira uma busca por prefixo.
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Produto
+
+LIMITE_AUTOCOMPLETE = 20
+
+CAMPOS_AUTOCOMPLETE = ('id', 'nome', 'codigo_sku', 'tipo', 'unidade_medida', 'custo_calculado')
+
+
+def buscar_produtos(empresa, termo, tipo=None, limite=LIMITE_AUTOCOMPLETE):
+    """Os produtos ativos da empresa que mais combinam com 'termo' (até 'limite')."""
+    termo = termo.strip()
+    if not termo:
+        return Produto.objects.none()
+
+    produtos = Produto.objects.filter(empresa=empresa, is_active=True)
+    if tipo:
+        produtos = produtos.filter(tipo=tipo)
+
+    # SKU idêntico primeiro, depois nomes que começam com o termo
+    prioridade = Case(
+        When(codigo_sku__iexact=termo, then=Value(0)),
+        When(nome__istartswith=termo, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+
+    if connection.vendor == 'postgresql':
+        # Import tardio: só existe/importa no PostgreSQL
+        from django.contrib.postgres.search import TrigramSimilarity
+        produtos = (
+            produtos.filter(Q(nome__icontains=termo) | Q(codigo_sku__istartswith=termo))
+            .annotate(
+                prioridade=prioridade,
+                similaridade=Greatest(TrigramSimilarity('nome', termo), TrigramSimilarity('codigo_sku', termo)),
+            )
+            .order_by('prioridade', '-similaridade', 'nome', 'id')
+        )
+    else:
+        produtos = (
+            produtos.filter(Q(nome__istartswith=termo) | Q(codigo_sku__istartswith=termo))
+            .annotate(prioridade=prioridade)
+            .order_by('prioridade', 'nome', 'id')
+        )
+
+    return produtos.values(*CAMPOS_AUTOCOMPLETE)[:limite]
@@ -0,0 +1,82 @@
+# Em backend/pricing/contribuicoes.py
+"""
+Quanto cada matéria-prima/serviço pesa no custo de cada produto (Pareto).
+
+A quantidade de um item "folha" (sem receita) dentro de uma unidade de
+um produto, somando todos os caminhos pelos sub-produtos, já está no
+índice de alcance (AlcanceComposicao.quantidade). Então a contribuição
+sai de UMA query agregada:
+
+    valor(P, F) = soma(quantidade(P, F)) x custo_calculado(F)
+
+O que sobra até 100% são os custos fixos das receitas (e arredondamentos).
+"""
+import heapq
+from decimal import Decimal
+from itertools import groupby, islice
+
+from django.db.models import Sum
+
+from .models import AlcanceComposicao, ContribuicaoCusto
+
+# Quantos itens são guardados por produto
+TOP_CONTRIBUICOES = 10
+
+CASAS_VALOR = Decimal('0.0001')
+CASAS_PERCENTUAL = Decimal('0.01')
+
+
+def _calcular(alcance, top):
+    """Gera os ContribuicaoCusto (já ranqueados) a partir das linhas do índice."""
+    linhas = (
+        alcance.filter(descendente__composicao__isnull=True)
+        .values('ancestral_id', 'descendente_id')
+        .annotate(quantidade=Sum('quantidade'))
+        .values_list(
+            'empresa_id', 'ancestral_id', 'descendente_id', 'quantidade',
+            'descendente__custo_calculado', 'ancestral__custo_calculado',
+        )
+        .order_by('ancestral_id')
+    )
+    # Em streaming: só as linhas de UM produto ficam na memória por vez
+    for produto_id, grupo in groupby(linhas.iterator(chunk_size=2000), key=lambda linha: linha[1]):
+        candidatos = (
+            (quantidade * custo_item, empresa_id, componente_id, quantidade, custo_produto)
+            for empresa_id, _, componente_id, quantidade, custo_item, custo_produto in grupo
+        )
+        maiores = heapq.nlargest(top, candidatos, key=lambda candidato: (candidato[0], -candidato[2]))
+        for posicao, (valor, empresa_id, componente_id, quantidade, custo_produto) in enumerate(maiores, start=1):
+            percentual = valor * 100 / custo_produto if custo_produto else Decimal(0)
+            yield ContribuicaoCusto(
+                empresa_id=empresa_id, produto_id=produto_id, componente_id=componente_id,
+                posicao=posicao, quantidade=quantidade, valor=valor.quantize(CASAS_VALOR),
+                percentual=percentual.quantize(CASAS_PERCENTUAL),
+            )
+
+
+def _gravar(contribuicoes, tamanho_lote=1000):
+    """Grava em lotes, sem montar a lista inteira na memória."""
+    while True:
+        lote = list(islice(contribuicoes, tamanho_lote))
+        if not lote:
+            break
+        ContribuicaoCusto.objects.bulk_create(lote)
+
+
+def atualizar_contribuicoes(produto_ids, top=TOP_CONTRIBUICOES):
+    """
+    Recalcula as contribuições só dos produtos informados (os que tiveram
+    o custo ou a receita alterados). Chamado por propagar_custos; quem
+    perdeu a receita fica sem contribuições.
+    """
+    produto_ids = set(produto_ids)
+    if not produto_ids:
+        return
+    ContribuicaoCusto.objects.filter(produto_id__in=produto_ids).delete()
+    _gravar(_calcular(AlcanceComposicao.objects.filter(ancestral_id__in=produto_ids), top))
+
+
+def recalcular_contribuicoes_empresa(empresa, top=TOP_CONTRIBUICOES):
+    """Recalcula (do zero) as contribuições de todo o catálogo da empresa."""
+    ContribuicaoCusto.objects.filter(empresa=empresa).delete()
+    _gravar(_calcular(AlcanceComposicao.objects.filter(empresa=empresa), top))
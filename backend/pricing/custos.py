@@ -0,0 +1,155 @@
+# Em backend/pricing/custos.py
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from .grafo import GrafoComposicao
+from .models import Produto, Composicao, ItemComposicao
+from .alcance import ancestrais
+from .contribuicoes import atualizar_contribuicoes
+from .historico import registrar_historico
+from .signals import custos_alterados
+
+# Mesma precisão do Produto.preco_custo
+CASAS_CUSTO = Decimal('0.0001')
+
+
+def arredondar_custo(valor):
+    """Arredonda um custo para 4 casas (meio para cima), como no banco."""
+    return Decimal(valor).quantize(CASAS_CUSTO, rounding=ROUND_HALF_UP)
+
+
+def custo_do_no(grafo, produto_id, custos):
+    """
+    Custo unitário de UM produto, assumindo que os custos dos
+    seus componentes já estão em 'custos'.
+
+    - Sem Composição (MP, SV ou item sem receita): o próprio preco_custo.
+    - Com Composição: soma(custo do componente x quantidade) + custo_adicional_fixo.
+    """
+    if produto_id not in grafo.receitas:
+        return arredondar_custo(grafo.precos.get(produto_id, 0))
+
+    total = grafo.receitas[produto_id]
+    for componente_id, quantidade in grafo.componentes.get(produto_id, ()):
+        total += custos[componente_id] * quantidade
+    return arredondar_custo(total)
+
+
+def calcular_custos(grafo):
+    """
+    Calcula o custo unitário de TODOS os produtos do grafo numa única
+    passada linear (ordem topológica + memoização).
+
+    Retorna {produto_id: custo}.
+    """
+    custos = {}
+    for produto_id in grafo.ordem_topologica():
+        custos[produto_id] = custo_do_no(grafo, produto_id, custos)
+    return custos
+
+
+def calcular_custos_empresa(empresa):
+    """Atalho: carrega o grafo da empresa e calcula todos os custos."""
+    return calcular_custos(GrafoComposicao.carregar(empresa))
+
+
+def recalcular_custos_empresa(empresa, vetorizado=False):
+    """
+    Recalcula o custo_calculado de TODO o catálogo da empresa e grava
+    só as linhas que mudaram. Usado na carga inicial e como "reset".
+
+    Com vetorizado=True o cálculo é feito em lote com NumPy/SciPy
+    (recomendado para o recálculo noturno e catálogos grandes).
+    Atualiza as contribuições (Pareto) e o histórico dos produtos
+    alterados, como o propagar_custos.
+    """
+    if vetorizado:
+        # Import tardio: NumPy/SciPy só são carregados quando usados
+        from .custos_vetorizados import calcular_custos_empresa_vetorizado
+        custos = calcular_custos_empresa_vetorizado(empresa)
+    else:
+        custos = calcular_custos_empresa(empresa)
+    atuais = dict(Produto.objects.filter(empresa=empresa).values_list('id', 'custo_calculado'))
+    alterados = _gravar_custos(custos, atuais)
+    # O "Pareto" de quem mudou de custo (e de quem usa esses produtos)
+    if alterados:
+        atualizar_contribuicoes(set(alterados) | ancestrais(alterados))
+    registrar_historico(alterados)
+    empresa_id = getattr(empresa, 'pk', empresa)
+    _avisar_alterados(alterados, atuais, {produto_id: empresa_id for produto_id in alterados})
+    return alterados
+
+
+def propagar_custos(produto_ids):
+    """
+    Atualiza o custo_calculado dos produtos informados E de todos os
+    produtos que dependem deles, sem recalcular o resto do catálogo.
+
+    Use sempre que mudar um preco_custo ou uma receita (itens ou
+    custo_adicional_fixo). Também atualiza as contribuições (Pareto)
+    e o histórico de custos, e avisa quem guarda cópias dos custos
+    (signal custos_alterados). Retorna {produto_id: novo_custo} do que mudou.
+    """
+    afetados = set(produto_ids) | ancestrais(produto_ids)
+    if not afetados:
+        return {}
+
+    produtos = Produto.objects.filter(id__in=afetados).values_list('id', 'empresa_id', 'preco_custo', 'custo_calculado')
+    precos, atuais, empresas = {}, {}, {}
+    for produto_id, empresa_id, preco_custo, custo_calculado in produtos:
+        precos[produto_id] = preco_custo
+        atuais[produto_id] = custo_calculado
+        empresas[produto_id] = empresa_id
+
+    receitas = dict(
+        Composicao.objects.filter(produto_acabado_id__in=afetados)
+        .values_list('produto_acabado_id', 'custo_adicional_fixo')
+    )
+    itens = []
+    itens_query = (
+        ItemComposicao.objects.filter(composicao__produto_acabado_id__in=afetados)
+        .values_list('composicao__produto_acabado_id', 'componente_id', 'quantidade', 'componente__custo_calculado')
+    )
+    for produto_id, componente_id, quantidade, custo_componente in itens_query:
+        itens.append((produto_id, componente_id, quantidade))
+        # Componentes fora do subgrafo afetado entram como "folhas"
+        # com o custo que já está gravado.
+        if componente_id not in afetados:
+            precos[componente_id] = custo_componente
+
+    subgrafo = GrafoComposicao(precos, receitas, itens)
+    custos = calcular_custos(subgrafo)
+    alterados = _gravar_custos({pid: custos[pid] for pid in afetados if pid in atuais}, atuais)
+
+    # O "Pareto" dos afetados depende dos custos que acabaram de ser gravados
+    atualizar_contribuicoes(afetados)
+    # Histórico: quem teve preço/receita alterados e quem mudou de custo
+    # (só entra quem de fato mudou desde a última linha)
+    registrar_historico(set(produto_ids) | set(alterados))
+    # Orçamentos em aberto com cópias destes custos (quotes.reprecificacao)
+    _avisar_alterados(alterados, atuais, empresas)
+    return alterados
+
+
+def _avisar_alterados(alterados, anteriores, empresas):
+    """Envia custos_alterados (um por empresa) com o custo anterior de cada produto."""
+    por_empresa = defaultdict(dict)
+    for produto_id in alterados:
+        por_empresa[empresas[produto_id]][produto_id] = anteriores[produto_id]
+    for empresa_id, custos in por_empresa.items():
+        custos_alterados.send(sender=Produto, empresa_id=empresa_id, anteriores=custos)
+
+
+def _gravar_custos(custos, atuais):
+    """Grava (em lote) apenas os custos que mudaram."""
+    alterados = {
+        produto_id: custo
+        for produto_id, custo in custos.items()
+        if produto_id in atuais and atuais[produto_id] != custo
+    }
+    Produto.objects.bulk_update(
+        [Produto(id=produto_id, custo_calculado=custo) for produto_id, custo in alterados.items()],
+        ['custo_calculado'],
+        batch_size=1000,
+    )
+    return alterados
@@ -0,0 +1,190 @@
+# Em backend/pricing/custos_vetorizados.py
+"""
+Cálculo do catálogo inteiro com NumPy/SciPy (modo "lote").
+
+As receitas viram uma matriz esparsa Q (produto x componente = quantidade).
+O custo de todos os produtos de um mesmo nível da árvore sai de uma única
+multiplicação Q @ custos, então o número de passos é a profundidade das
+receitas (5-8), e não o número de produtos.
+
+As contas são feitas em inteiros (int64) escalados: custos, preços e
+quantidades multiplicados por 10^4, custos fixos por 10^8 (a escala do
+produto quantidade x custo). Assim o resultado é exatamente o do
+pricing.custos.calcular_custos, com o mesmo arredondamento de 4 casas
+por nó. Se algum valor puder passar do int64, o cálculo volta para o
+caminho em Decimal.
+"""
+from decimal import Decimal
+
+import numpy as np
+from scipy import sparse
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, Round
+
+from .custos import calcular_custos, calcular_custos_empresa
+from .grafo import CicloNaComposicao
+from .models import Produto, Composicao, ItemComposicao
+
+# 4 casas decimais (Produto.preco_custo, ItemComposicao.quantidade)
+ESCALA = 10_000
+
+# Margem abaixo do máximo do int64 (2^63) para as somas de cada nível
+LIMITE_INT64 = float(2 ** 62)
+
+
+def _arredondar(valores):
+    """
+    Volta da escala 10^8 para 10^4 arredondando "meio para cima"
+    (longe do zero), igual ao arredondar_custo.
+    """
+    return np.sign(valores) * ((np.abs(valores) + ESCALA // 2) // ESCALA)
+
+
+def _escalado(campo, escala=ESCALA):
+    """Expressão que traz o campo decimal do banco já como inteiro escalado."""
+    return Cast(Round(F(campo) * escala), BigIntegerField())
+
+
+def _colunas(linhas, tipos):
+    """Transforma uma lista de tuplas em um array do NumPy por coluna."""
+    # Um array estruturado converte todas as tuplas de uma vez, em C
+    estruturado = np.array(linhas, dtype=[(f'c{i}', tipo) for i, tipo in enumerate(tipos)])
+    return [np.ascontiguousarray(estruturado[nome]) for nome in estruturado.dtype.names]
+
+
+def _montar(produto_ids, precos, receita_ids, fixos, pais, filhos, quantidades):
+    """
+    Monta as matrizes a partir de arrays "crus" (ids + valores).
+
+    Retorna (nos, Q, E, precos, fixos, tem_receita), onde 'nos' é o array
+    ordenado de ids de Produto (a ordem das linhas/colunas), Q tem as
+    quantidades e E só a estrutura (1 para cada item de receita).
+    """
+    nos = np.unique(np.concatenate([produto_ids, receita_ids, pais, filhos]))
+    n = len(nos)
+
+    vetor_precos = np.zeros(n, dtype=np.int64)
+    vetor_precos[np.searchsorted(nos, produto_ids)] = precos
+    vetor_fixos = np.zeros(n, dtype=np.int64)
+    vetor_fixos[np.searchsorted(nos, receita_ids)] = fixos
+    tem_receita = np.zeros(n, dtype=bool)
+    tem_receita[np.searchsorted(nos, receita_ids)] = True
+
+    linhas = np.searchsorted(nos, pais)
+    colunas = np.searchsorted(nos, filhos)
+    Q = sparse.csr_matrix((quantidades, (linhas, colunas)), shape=(n, n))
+    E = sparse.csr_matrix((np.ones(len(linhas), dtype=np.int64), (linhas, colunas)), shape=(n, n))
+    return nos, Q, E, vetor_precos, vetor_fixos, tem_receita
+
+
+def montar_matriz(grafo):
+    """
+    Converte um GrafoComposicao (já em memória) nas matrizes do modo lote.
+    Levanta OverflowError se algum valor não couber no int64.
+    """
+    produto_ids, precos = _colunas(
+        [(produto_id, int(preco * ESCALA)) for produto_id, preco in grafo.precos.items()],
+        (np.int64, np.int64),
+    )
+    receita_ids, fixos = _colunas(
+        [(produto_id, int(fixo * ESCALA * ESCALA)) for produto_id, fixo in grafo.receitas.items()],
+        (np.int64, np.int64),
+    )
+    pais, filhos, quantidades = _colunas(
+        [
+            (produto_id, componente_id, int(quantidade * ESCALA))
+            for produto_id, componentes in grafo.componentes.items()
+            for componente_id, quantidade in componentes
+        ],
+        (np.int64, np.int64, np.int64),
+    )
+    return _montar(produto_ids, precos, receita_ids, fixos, pais, filhos, quantidades)
+
+
+def carregar_matriz(empresa):
+    """
+    Carrega as matrizes da empresa direto do banco, em 3 queries.
+
+    Os valores já vêm do banco como inteiros escalados, sem passar por
+    Decimal nem pelo GrafoComposicao (é isso que torna o lote barato).
+    """
+    produtos = (
+        Produto.objects.filter(empresa=empresa)
+        .annotate(preco=_escalado('preco_custo'))
+        .values_list('id', 'preco')
+    )
+    receitas = (
+        Composicao.objects.filter(empresa=empresa)
+        .annotate(fixo=_escalado('custo_adicional_fixo', ESCALA * ESCALA))
+        .values_list('produto_acabado_id', 'fixo')
+    )
+    itens = (
+        ItemComposicao.objects.filter(composicao__empresa=empresa)
+        .annotate(qtd=_escalado('quantidade'))
+        .values_list('composicao__produto_acabado_id', 'componente_id', 'qtd')
+    )
+    produto_ids, precos = _colunas(list(produtos), (np.int64, np.int64))
+    receita_ids, fixos = _colunas(list(receitas), (np.int64, np.int64))
+    pais, filhos, quantidades = _colunas(list(itens), (np.int64, np.int64, np.int64))
+    return _montar(produto_ids, precos, receita_ids, fixos, pais, filhos, quantidades)
+
+
+def propagar_matriz(Q, E, precos, fixos, tem_receita):
+    """
+    Propaga os custos pela matriz, um nível da árvore por vez.
+
+    Um produto com receita fica "pronto" no passo em que todos os seus
+    componentes já estão prontos. Se num passo nenhum produto novo fica
+    pronto, sobrou um ciclo.
+
+    Retorna (custos, pronto): o array de custos (escala 10^4) e a máscara
+    de quem foi resolvido. Levanta OverflowError se a soma de algum nível
+    puder passar do int64.
+    """
+    custos = np.where(tem_receita, 0, precos)
+    pronto = ~tem_receita
+    # Em float só para conferir o tamanho das somas (não estoura, só perde casas)
+    Q_absoluto = abs(Q).astype(np.float64)
+    fixos_absolutos = np.abs(fixos).astype(np.float64)
+
+    while not pronto.all():
+        # Quantos componentes de cada produto ainda não estão prontos
+        pendentes = E @ (~pronto).astype(np.int64)
+        novos = ~pronto & (pendentes == 0)
+        if not novos.any():
+            break
+        maior = (Q_absoluto @ np.abs(custos).astype(np.float64) + fixos_absolutos)[novos].max()
+        if maior >= LIMITE_INT64:
+            raise OverflowError("Valores grandes demais para o cálculo em int64.")
+        custos[novos] = _arredondar(Q @ custos + fixos)[novos]
+        pronto |= novos
+
+    return custos, pronto
+
+
+def resolver_matriz(nos, Q, E, precos, fixos, tem_receita):
+    """
+    Calcula os custos a partir das matrizes e devolve {produto_id: Decimal}.
+    Levanta CicloNaComposicao se as receitas tiverem um ciclo.
+    """
+    custos, pronto = propagar_matriz(Q, E, precos, fixos, tem_receita)
+    if not pronto.all():
+        raise CicloNaComposicao(nos[~pronto].tolist())
+
+    return {no: Decimal(custo).scaleb(-4) for no, custo in zip(nos.tolist(), custos.tolist())}
+
+
+def calcular_custos_vetorizado(grafo):
+    """Equivalente vetorizado de pricing.custos.calcular_custos."""
+    try:
+        return resolver_matriz(*montar_matriz(grafo))
+    except OverflowError:
+        return calcular_custos(grafo)
+
+
+def calcular_custos_empresa_vetorizado(empresa):
+    """Carrega as receitas da empresa direto em matrizes e calcula todos os custos."""
+    try:
+        return resolver_matriz(*carregar_matriz(empresa))
+    except OverflowError:
+        return calcular_custos_empresa(empresa)
@@ -0,0 +1,95 @@
+# Em backend/pricing/explosao.py
+"""
+Explosão de receitas (necessidade de materiais).
+
+Dado um plano de produção ({produto_id: quantidade}), desce pelas
+receitas (inclusive sub-produtos SB, em qualquer nível) multiplicando
+as quantidades e soma, por item "folha" (sem receita: MP, SV...), o
+total necessário.
+
+Tudo roda sobre o GrafoComposicao já em memória: a profundidade das
+receitas não aumenta o número de queries.
+"""
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from .grafo import GrafoComposicao, CicloNaComposicao
+from .models import Produto
+from .alcance import CASAS_QUANTIDADE
+
+
+def explodir(grafo, demandas):
+    """
+    Explode as 'demandas' ({produto_id: quantidade}) no grafo.
+
+    Retorna {produto_id: quantidade} só dos itens sem receita. Cada
+    produto intermediário é processado UMA vez, depois de somadas as
+    quantidades pedidas por todos os que o usam (Kahn no subgrafo
+    alcançável a partir do plano).
+
+    Levanta CicloNaComposicao se o plano alcançar um ciclo.
+    """
+    # Subgrafo alcançável e quantos "pais" cada nó tem dentro dele
+    pais_pendentes = defaultdict(int)
+    alcancaveis = set(demandas)
+    pilha = list(demandas)
+    while pilha:
+        produto_id = pilha.pop()
+        for componente_id, _ in grafo.componentes.get(produto_id, ()):
+            pais_pendentes[componente_id] += 1
+            if componente_id not in alcancaveis:
+                alcancaveis.add(componente_id)
+                pilha.append(componente_id)
+
+    necessidade = defaultdict(Decimal)
+    for produto_id, quantidade in demandas.items():
+        necessidade[produto_id] += Decimal(quantidade)
+
+    fila = deque(no for no in alcancaveis if pais_pendentes[no] == 0)
+    processados = 0
+    folhas = {}
+    while fila:
+        produto_id = fila.popleft()
+        processados += 1
+        quantidade = necessidade[produto_id]
+        if produto_id not in grafo.receitas:
+            folhas[produto_id] = quantidade.quantize(CASAS_QUANTIDADE)
+            continue
+        for componente_id, quantidade_item in grafo.componentes.get(produto_id, ()):
+            necessidade[componente_id] += quantidade * quantidade_item
+            pais_pendentes[componente_id] -= 1
+            if pais_pendentes[componente_id] == 0:
+                fila.append(componente_id)
+
+    if processados < len(alcancaveis):
+        raise CicloNaComposicao(no for no in alcancaveis if pais_pendentes[no] > 0)
+    return folhas
+
+
+def explodir_empresa(empresa, demandas, grafo=None):
+    """
+    Explosão do plano com os dados de cada item necessário.
+
+    Retorna a lista (ordenada por tipo e nome) de dicts com id, nome,
+    codigo_sku, tipo, unidade_medida, quantidade, custo_unitario
+    (custo_calculado) e custo_total. 4 queries no total.
+    """
+    grafo = grafo or GrafoComposicao.carregar(empresa)
+    folhas = explodir(grafo, demandas)
+
+    produtos = (
+        Produto.objects.filter(empresa=empresa, id__in=folhas)
+        .values('id', 'nome', 'codigo_sku', 'tipo', 'unidade_medida', 'custo_calculado')
+        .order_by('tipo', 'nome', 'id')
+    )
+    necessidades = []
+    for produto in produtos:
+        custo_unitario = produto.pop('custo_calculado')
+        quantidade = folhas[produto['id']]
+        necessidades.append({
+            **produto,
+            'quantidade': quantidade,
+            'custo_unitario': custo_unitario,
+            'custo_total': (quantidade * custo_unitario).quantize(Decimal('0.01')),
+        })
+    return necessidades
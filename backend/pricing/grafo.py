@@ -0,0 +1,85 @@
+# Em backend/pricing/grafo.py
+from collections import defaultdict, deque
+
+from .models import Produto, Composicao, ItemComposicao
+
+
+class CicloNaComposicao(Exception):
+    """
+    As receitas formam um ciclo: um sub-produto acaba contendo
+    (direta ou indiretamente) a si mesmo.
+    """
+    def __init__(self, produto_ids):
+        self.produto_ids = sorted(produto_ids)
+        super().__init__(f"Ciclo detectado entre os produtos {self.produto_ids}")
+
+
+class GrafoComposicao:
+    """
+    Grafo em memória de TODAS as receitas de uma empresa.
+
+    Os nós são ids de Produto. Cada produto que tem Composição aponta
+    para os seus componentes (com a quantidade usada), e cada componente
+    sabe em quais produtos é usado (o 'usado_em' do modelo).
+    """
+
+    def __init__(self, precos, receitas, itens):
+        # precos:   {produto_id: preco_custo}
+        # receitas: {produto_id: custo_adicional_fixo} (só quem tem Composição)
+        # itens:    iterável de (produto_id, componente_id, quantidade)
+        self.precos = precos
+        self.receitas = receitas
+        self.componentes = defaultdict(list)
+        self.usado_em = defaultdict(list)
+        for produto_id, componente_id, quantidade in itens:
+            self.componentes[produto_id].append((componente_id, quantidade))
+            self.usado_em[componente_id].append(produto_id)
+
+    @classmethod
+    def carregar(cls, empresa):
+        """
+        Carrega o grafo inteiro da empresa em 3 queries,
+        independente da profundidade das receitas.
+        """
+        precos = dict(
+            Produto.objects.filter(empresa=empresa)
+            .values_list('id', 'preco_custo')
+        )
+        receitas = dict(
+            Composicao.objects.filter(empresa=empresa)
+            .values_list('produto_acabado_id', 'custo_adicional_fixo')
+        )
+        itens = (
+            ItemComposicao.objects.filter(composicao__empresa=empresa)
+            .values_list('composicao__produto_acabado_id', 'componente_id', 'quantidade')
+        )
+        return cls(precos, receitas, itens)
+
+    def nos(self):
+        """Todos os produtos do grafo (inclusive os que só aparecem como componente)."""
+        return set(self.precos) | set(self.receitas) | set(self.componentes) | set(self.usado_em)
+
+    def ordem_topologica(self):
+        """
+        Ordena os produtos de forma que todo componente venha ANTES
+        dos produtos que o usam (algoritmo de Kahn, O(nós + itens)).
+
+        Levanta CicloNaComposicao se as receitas tiverem um ciclo.
+        """
+        nos = self.nos()
+        pendentes = {no: len(self.componentes.get(no, ())) for no in nos}
+        fila = deque(no for no, qtd in pendentes.items() if qtd == 0)
+        ordem = []
+
+        while fila:
+            no = fila.popleft()
+            ordem.append(no)
+            for pai in self.usado_em.get(no, ()):
+                pendentes[pai] -= 1
+                if pendentes[pai] == 0:
+                    fila.append(pai)
+
+        if len(ordem) < len(nos):
+            # Quem sobrou com componentes pendentes está em (ou acima de) um ciclo
+            raise CicloNaComposicao(no for no, qtd in pendentes.items() if qtd > 0)
+        return ordem
@@ -0,0 +1,102 @@
+# Em backend/pricing/historico.py
+"""
+Histórico de custos (HistoricoCusto): gravação, consulta numa data e
+compactação.
+
+A gravação só acrescenta linhas (nunca altera as antigas), e só quando
+o preço ou o custo mudou desde a última linha do produto. Para saber
+o custo de um produto numa data basta a última linha com
+vigente_desde <= data, uma busca no índice (produto, vigente_desde).
+"""
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Produto, HistoricoCusto
+
+
+def registrar_historico(produto_ids, quando=None, tamanho_lote=1000):
+    """
+    Acrescenta ao histórico o preço e o custo ATUAIS dos produtos
+    informados, só para quem mudou desde a última linha do histórico
+    (2 queries por lote de produtos). Retorna quantas linhas gravou.
+    """
+    produto_ids = list(set(produto_ids))
+    quando = quando or timezone.now()
+    ultima = HistoricoCusto.objects.filter(produto_id=OuterRef('pk')).order_by('-vigente_desde', '-id')
+    gravadas = 0
+    for inicio in range(0, len(produto_ids), tamanho_lote):
+        produtos = (
+            Produto.objects.filter(id__in=produto_ids[inicio:inicio + tamanho_lote])
+            .annotate(
+                preco_anterior=Subquery(ultima.values('preco_custo')[:1]),
+                custo_anterior=Subquery(ultima.values('custo_calculado')[:1]),
+            )
+            .values_list('id', 'empresa_id', 'preco_custo', 'custo_calculado', 'preco_anterior', 'custo_anterior')
+        )
+        linhas = [
+            HistoricoCusto(
+                empresa_id=empresa_id, produto_id=produto_id, preco_custo=preco_custo,
+                custo_calculado=custo_calculado, vigente_desde=quando,
+            )
+            for produto_id, empresa_id, preco_custo, custo_calculado, preco_anterior, custo_anterior in produtos
+            if (preco_custo, custo_calculado) != (preco_anterior, custo_anterior)
+        ]
+        HistoricoCusto.objects.bulk_create(linhas)
+        gravadas += len(linhas)
+    return gravadas
+
+
+def custo_na_data(produto_id, data):
+    """A linha do histórico vigente na data (ou None se o produto não existia)."""
+    return (
+        HistoricoCusto.objects.filter(produto_id=produto_id, vigente_desde__lte=data)
+        .order_by('-vigente_desde', '-id')
+        .first()
+    )
+
+
+def catalogo_na_data(empresa, data):
+    """
+    Todos os produtos da empresa com o preço e o custo vigentes na data,
+    numa única query (uma sub-consulta indexada por produto).
+    Produtos criados depois da data ficam de fora.
+    """
+    vigente = (
+        HistoricoCusto.objects.filter(produto_id=OuterRef('pk'), vigente_desde__lte=data)
+        .order_by('-vigente_desde', '-id')
+    )
+    return (
+        Produto.objects.filter(empresa=empresa)
+        .annotate(
+            preco_na_data=Subquery(vigente.values('preco_custo')[:1]),
+            custo_na_data=Subquery(vigente.values('custo_calculado')[:1]),
+        )
+        .filter(custo_na_data__isnull=False)
+        .values('id', 'nome', 'codigo_sku', 'tipo', 'preco_na_data', 'custo_na_data')
+        .order_by('nome', 'id')
+    )
+
+
+def compactar_historico(empresa, tamanho_lote=5000):
+    """
+    Remove as linhas que repetem o preço e o custo da linha anterior do
+    mesmo produto (a anterior continua valendo, então as consultas por
+    data não mudam). Lê o histórico em streaming e só guarda os ids a
+    remover; retorna quantas linhas foram removidas.
+    """
+    linhas = (
+        HistoricoCusto.objects.filter(empresa=empresa)
+        .order_by('produto_id', 'vigente_desde', 'id')
+        .values_list('id', 'produto_id', 'preco_custo', 'custo_calculado')
+    )
+    repetidas, anterior = [], None
+    for linha_id, produto_id, preco_custo, custo_calculado in linhas.iterator(chunk_size=tamanho_lote):
+        atual = (produto_id, preco_custo, custo_calculado)
+        if atual == anterior:
+            repetidas.append(linha_id)
+        anterior = atual
+
+    # Apaga depois da leitura (o SQLite não isola o cursor aberto das escritas)
+    for inicio in range(0, len(repetidas), tamanho_lote):
+        HistoricoCusto.objects.filter(id__in=repetidas[inicio:inicio + tamanho_lote]).delete()
+    return len(repetidas)
@@ -0,0 +1,197 @@
+# Em backend/pricing/importacao.py
+"""
+Importação em massa do catálogo (Produto) a partir de CSV ou JSONL.
+
+O arquivo é lido em streaming e gravado em lotes com um "upsert"
+(bulk_create com update_conflicts em (empresa, codigo_sku)): SKUs novos
+são criados, SKUs existentes são atualizados. A unicidade do SKU é
+checada contra um conjunto carregado UMA vez por importação, em vez de
+uma query por linha como no ProdutoSerializer.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Produto
+from .custos import propagar_custos
+from .historico import registrar_historico
+
+TAMANHO_LOTE = 1000
+
+CAMPOS_ATUALIZADOS = ['nome', 'tipo', 'unidade_medida', 'preco_custo', 'is_active', 'updated_at']
+
+TIPOS_VALIDOS = {codigo for codigo, _ in Produto.TIPO_CHOICES}
+VERDADEIROS = {'1', 'true', 'sim', 's', 'yes', 'y', 'verdadeiro'}
+FALSOS = {'0', 'false', 'nao', 'não', 'n', 'no', 'falso'}
+
+
+def ler_csv(arquivo):
+    """Gera um dict por linha de um CSV (aceita arquivo binário ou texto)."""
+    if isinstance(arquivo.read(0), bytes):
+        arquivo = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    amostra = arquivo.read(2048)
+    arquivo.seek(0)
+    # Planilhas em pt-BR costumam exportar com ';'
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+    yield from csv.DictReader(arquivo, dialect=dialeto)
+
+
+def ler_arquivo(arquivo, formato):
+    """Escolhe o leitor pelo formato ('csv' ou 'jsonl')."""
+    leitores = {'csv': ler_csv, 'jsonl': ler_jsonl}
+    if formato not in leitores:
+        raise ValueError(f"Formato não suportado: {formato}. Use 'csv' ou 'jsonl'.")
+    return leitores[formato](arquivo)
+
+
+def ler_jsonl(arquivo):
+    """Gera um dict por linha de um arquivo JSON Lines."""
+    for linha in arquivo:
+        if isinstance(linha, bytes):
+            linha = linha.decode('utf-8')
+        linha = linha.strip()
+        if not linha:
+            yield None  # linha em branco: ignorada, mas mantém a numeração
+            continue
+        try:
+            yield json.loads(linha)
+        except json.JSONDecodeError as erro:
+            yield {'__erro__': f"JSON inválido: {erro.msg}"}
+
+
+def _max_length(campo):
+    return Produto._meta.get_field(campo).max_length
+
+
+def validar_linha(dados):
+    """
+    Valida UMA linha sem tocar no banco.
+
+    Retorna (valores, erros): 'valores' pronto para montar o Produto
+    e 'erros' como {campo: mensagem} (vazio se a linha está ok).
+    """
+    if not isinstance(dados, dict):
+        return None, {'linha': "Linha vazia ou em formato inválido."}
+    if '__erro__' in dados:
+        return None, {'linha': dados['__erro__']}
+
+    erros = {}
+    valores = {}
+    for campo in ('nome', 'codigo_sku', 'unidade_medida'):
+        valor = str(dados.get(campo) or '').strip()
+        if not valor:
+            erros[campo] = "Campo obrigatório."
+        elif len(valor) > _max_length(campo):
+            erros[campo] = f"Máximo de {_max_length(campo)} caracteres."
+        valores[campo] = valor
+
+    tipo = str(dados.get('tipo') or '').strip().upper()
+    if tipo not in TIPOS_VALIDOS:
+        erros['tipo'] = f"Tipo inválido. Use um de: {', '.join(sorted(TIPOS_VALIDOS))}."
+    valores['tipo'] = tipo
+
+    preco = str(dados.get('preco_custo') or '0').strip()
+    if ',' in preco and '.' not in preco:
+        preco = preco.replace(',', '.')  # "12,50" -> "12.50"
+    try:
+        valores['preco_custo'] = Decimal(preco).quantize(Decimal('0.0001'))
+        if valores['preco_custo'] < 0 or valores['preco_custo'] >= Decimal('1000000'):
+            erros['preco_custo'] = "Preço fora do intervalo permitido."
+    except InvalidOperation:
+        erros['preco_custo'] = "Número inválido."
+
+    ativo = dados.get('is_active', True)
+    if isinstance(ativo, str):
+        ativo = ativo.strip().lower()
+        if ativo in VERDADEIROS or ativo == '':
+            ativo = True
+        elif ativo in FALSOS:
+            ativo = False
+        else:
+            erros['is_active'] = "Use verdadeiro/falso."
+    valores['is_active'] = bool(ativo)
+
+    return valores, erros
+
+
+def importar_produtos(empresa, linhas, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa (cria ou atualiza pelo SKU) os produtos das 'linhas' (dicts).
+
+    Retorna o relatório:
+        {'criados': n, 'atualizados': n, 'erros': [{'linha': n, 'erros': {...}}]}
+
+    A numeração das linhas começa em 1 (cabeçalho do CSV não conta).
+    """
+    # Uma query para conhecer todos os SKUs (e preços) atuais da empresa
+    existentes = {
+        sku: (produto_id, preco)
+        for produto_id, sku, preco in Produto.objects.filter(empresa=empresa)
+        .values_list('id', 'codigo_sku', 'preco_custo')
+    }
+    vistos = set()
+    relatorio = {'criados': 0, 'atualizados': 0, 'erros': []}
+    precos_alterados = []
+    skus_novos = []
+
+    numeradas = enumerate(linhas, start=1)
+    with transaction.atomic():
+        while True:
+            lote = list(islice(numeradas, tamanho_lote))
+            if not lote:
+                break
+
+            produtos = []
+            for numero, dados in lote:
+                if dados is None:
+                    continue
+                valores, erros = validar_linha(dados)
+                if not erros and valores['codigo_sku'] in vistos:
+                    erros = {'codigo_sku': f"SKU ({valores['codigo_sku']}) repetido no arquivo."}
+                if erros:
+                    relatorio['erros'].append({'linha': numero, 'erros': erros})
+                    continue
+
+                sku = valores['codigo_sku']
+                vistos.add(sku)
+                if sku in existentes:
+                    produto_id, preco_anterior = existentes[sku]
+                    relatorio['atualizados'] += 1
+                    if preco_anterior != valores['preco_custo']:
+                        precos_alterados.append(produto_id)
+                else:
+                    relatorio['criados'] += 1
+                    skus_novos.append(sku)
+
+                # custo_calculado só vale para produtos novos (ainda sem receita);
+                # nos existentes ele fica fora do update e é propagado abaixo.
+                produtos.append(Produto(empresa=empresa, custo_calculado=valores['preco_custo'], **valores))
+
+            Produto.objects.bulk_create(
+                produtos,
+                update_conflicts=True,
+                unique_fields=['empresa', 'codigo_sku'],
+                update_fields=CAMPOS_ATUALIZADOS,
+            )
+
+        # Propagação em lotes (as consultas de quem usa cada produto
+        # ficam com listas de tamanho limitado)
+        for inicio in range(0, len(precos_alterados), tamanho_lote):
+            propagar_custos(precos_alterados[inicio:inicio + tamanho_lote])
+        # Os novos entram no histórico de custos (os alterados já entraram na
+        # propagação). Buscados pelos SKUs deste arquivo: um produto criado
+        # ao mesmo tempo por outra tela não é do relatório desta importação.
+        for inicio in range(0, len(skus_novos), tamanho_lote):
+            registrar_historico(
+                Produto.objects.filter(empresa=empresa, codigo_sku__in=skus_novos[inicio:inicio + tamanho_lote])
+                .values_list('id', flat=True)
+            )
+
+    return relatorio
@@ -0,0 +1,114 @@
+# Em backend/pricing/management/commands/benchmark_custos.py
+import random
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from pricing.grafo import GrafoComposicao
+from pricing.custos import calcular_custos
+from pricing.custos_vetorizados import ESCALA, _colunas, _montar, propagar_matriz, resolver_matriz
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o cálculo de custos produto a produto com o cálculo "
+        "vetorizado (NumPy/SciPy) numa estrutura de receitas sintética."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arestas', type=int, default=100_000, help="Total de itens de receita")
+        parser.add_argument('--niveis', type=int, default=8, help="Profundidade das receitas")
+        parser.add_argument('--itens-por-receita', type=int, default=10)
+        parser.add_argument('--materias-primas', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        produtos, receitas, itens = self.gerar_receitas(
+            options['arestas'], options['niveis'], options['itens_por_receita'],
+            options['materias_primas'], random.Random(options['seed'])
+        )
+        self.stdout.write(
+            f"Receitas sintéticas: {len(produtos)} produtos, {len(receitas)} receitas, "
+            f"{len(itens)} itens, {options['niveis']} níveis"
+        )
+
+        # Caminho produto a produto: linhas em Decimal (como vêm do banco)
+        inicio = time.perf_counter()
+        por_produto = calcular_custos(GrafoComposicao(dict(produtos), dict(receitas), itens))
+        tempo_produto = time.perf_counter() - inicio
+
+        # Caminho vetorizado: linhas já em inteiros escalados (como o carregar_matriz pede ao banco)
+        produtos_escalados = [(pid, int(preco * ESCALA)) for pid, preco in produtos]
+        receitas_escaladas = [(pid, int(fixo * ESCALA * ESCALA)) for pid, fixo in receitas]
+        itens_escalados = [(pid, cid, int(qtd * ESCALA)) for pid, cid, qtd in itens]
+
+        inicio = time.perf_counter()
+        matrizes = _montar(
+            *_colunas(produtos_escalados, (np.int64, np.int64)),
+            *_colunas(receitas_escaladas, (np.int64, np.int64)),
+            *_colunas(itens_escalados, (np.int64, np.int64, np.int64)),
+        )
+        tempo_montagem = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        propagar_matriz(*matrizes[1:])
+        tempo_propagacao = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        vetorizado = resolver_matriz(*matrizes)
+        tempo_vetorizado = tempo_montagem + time.perf_counter() - inicio
+
+        diferencas = [abs(por_produto[no] - vetorizado[no]) for no in por_produto]
+        divergentes = sum(1 for diferenca in diferencas if diferenca)
+
+        self.stdout.write(f"Produto a produto (Decimal):  {tempo_produto:.3f}s")
+        self.stdout.write(
+            f"Vetorizado (NumPy/SciPy):     {tempo_vetorizado:.3f}s "
+            f"(montagem {tempo_montagem:.3f}s, propagação {tempo_propagacao:.3f}s)"
+        )
+        self.stdout.write(f"Ganho total: {tempo_produto / tempo_vetorizado:.1f}x")
+        self.stdout.write(f"Ganho no cálculo: {tempo_produto / tempo_propagacao:.1f}x")
+        self.stdout.write(
+            f"Diferença máxima: {max(diferencas, default=0)} "
+            f"({divergentes} produto(s) com diferença de arredondamento)"
+        )
+
+    def gerar_receitas(self, arestas, niveis, itens_por_receita, materias_primas, rng):
+        """
+        Monta receitas em camadas: cada receita do nível N usa pelo menos
+        um item do nível N-1 (garantindo a profundidade) e o resto de
+        qualquer nível abaixo, inclusive matérias-primas.
+
+        Retorna as linhas no mesmo formato das queries do GrafoComposicao:
+        (produto_id, preco_custo), (produto_id, custo_adicional_fixo) e
+        (produto_id, componente_id, quantidade).
+        """
+        proximo_id = 1
+        produtos, receitas, itens = [], [], []
+
+        camadas = [[]]
+        for _ in range(materias_primas):
+            produtos.append((proximo_id, Decimal(rng.randint(100, 1_000_000)) / 10_000))
+            camadas[0].append(proximo_id)
+            proximo_id += 1
+
+        receitas_por_nivel = max(1, arestas // itens_por_receita // niveis)
+        for nivel in range(1, niveis + 1):
+            abaixo = [no for camada in camadas for no in camada]
+            camadas.append([])
+            for _ in range(receitas_por_nivel):
+                produto_id = proximo_id
+                proximo_id += 1
+                produtos.append((produto_id, Decimal(0)))
+                receitas.append((produto_id, Decimal(rng.randint(0, 10_000)) / 100))
+
+                componentes = {rng.choice(camadas[nivel - 1])}
+                while len(componentes) < min(itens_por_receita, len(abaixo)):
+                    componentes.add(rng.choice(abaixo))
+                for componente_id in componentes:
+                    quantidade = Decimal(rng.randint(1, 2_000)) / 10_000
+                    itens.append((produto_id, componente_id, quantidade))
+                camadas[nivel].append(produto_id)
+
+        return produtos, receitas, itens
@@ -0,0 +1,20 @@
+# Em backend/pricing/management/commands/compactar_historico_custos.py
+from django.core.management.base import BaseCommand
+from users.models import Empresa
+from pricing.historico import compactar_historico
+
+
+class Command(BaseCommand):
+    help = "Compacta o histórico de custos, unindo linhas seguidas com os mesmos valores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID da empresa (padrão: todas)")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.all()
+        if options['empresa']:
+            empresas = empresas.filter(id=options['empresa'])
+
+        for empresa in empresas.iterator():
+            removidas = compactar_historico(empresa)
+            self.stdout.write(f"{empresa}: {removidas} linha(s) repetida(s) removida(s)")
@@ -0,0 +1,27 @@
+# Em backend/pricing/management/commands/importar_produtos.py
+from django.core.management.base import BaseCommand, CommandError
+from users.models import Empresa
+from pricing.importacao import ler_arquivo, importar_produtos
+
+
+class Command(BaseCommand):
+    help = "Importa (cria/atualiza pelo SKU) produtos de um arquivo CSV ou JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Caminho do arquivo .csv ou .jsonl")
+        parser.add_argument('--empresa', type=int, required=True, help="ID da empresa")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help="Padrão: pela extensão do arquivo")
+
+    def handle(self, *args, **options):
+        try:
+            empresa = Empresa.objects.get(id=options['empresa'])
+        except Empresa.DoesNotExist:
+            raise CommandError("Empresa não encontrada.")
+
+        formato = options['formato'] or ('jsonl' if options['arquivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        with open(options['arquivo'], 'rb') as arquivo:
+            relatorio = importar_produtos(empresa, ler_arquivo(arquivo, formato))
+
+        self.stdout.write(f"Criados: {relatorio['criados']}  Atualizados: {relatorio['atualizados']}")
+        for erro in relatorio['erros']:
+            self.stderr.write(f"Linha {erro['linha']}: {erro['erros']}")
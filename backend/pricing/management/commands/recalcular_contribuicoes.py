@@ -0,0 +1,23 @@
+# Em backend/pricing/management/commands/recalcular_contribuicoes.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.models import Empresa
+from pricing.contribuicoes import recalcular_contribuicoes_empresa, TOP_CONTRIBUICOES
+
+
+class Command(BaseCommand):
+    help = "Recalcula (do zero) os principais itens que formam o custo de cada produto."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument('--top', type=int, default=TOP_CONTRIBUICOES, help="Itens guardados por produto")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.all()
+        if options['empresa']:
+            empresas = empresas.filter(id=options['empresa'])
+
+        for empresa in empresas.iterator():
+            with transaction.atomic():
+                recalcular_contribuicoes_empresa(empresa, top=options['top'])
+            self.stdout.write(f"{empresa}: contribuições recalculadas")
@@ -0,0 +1,27 @@
+# Em backend/pricing/management/commands/recalcular_custos.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.models import Empresa
+from pricing.custos import recalcular_custos_empresa
+
+
+class Command(BaseCommand):
+    help = "Recalcula (do zero) o custo_calculado de todos os produtos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument(
+            '--vetorizado', action='store_true',
+            help="Calcula em lote com NumPy/SciPy (catálogos grandes)"
+        )
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.all()
+        if options['empresa']:
+            empresas = empresas.filter(id=options['empresa'])
+
+        for empresa in empresas.iterator():
+            # Custos, contribuições e histórico da empresa entram juntos (ou nada)
+            with transaction.atomic():
+                alterados = recalcular_custos_empresa(empresa, vetorizado=options['vetorizado'])
+            self.stdout.write(f"{empresa}: {len(alterados)} custo(s) atualizado(s)")
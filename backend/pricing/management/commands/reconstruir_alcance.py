@@ -0,0 +1,22 @@
+# Em backend/pricing/management/commands/reconstruir_alcance.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.models import Empresa
+from pricing.alcance import reconstruir_alcance
+
+
+class Command(BaseCommand):
+    help = "Reconstrói (do zero) o índice de alcance das receitas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID da empresa (padrão: todas)")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.all()
+        if options['empresa']:
+            empresas = empresas.filter(id=options['empresa'])
+
+        for empresa in empresas.iterator():
+            with transaction.atomic():
+                reconstruir_alcance(empresa)
+            self.stdout.write(f"{empresa}: índice de alcance reconstruído")
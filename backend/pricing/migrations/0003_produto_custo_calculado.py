@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:37
+
+from collections import defaultdict, deque
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+# Cópia congelada do cálculo de pricing.custos (a migração não depende do código atual)
+CASAS_CUSTO = Decimal('0.0001')
+
+
+def _arredondar(valor):
+    return Decimal(valor).quantize(CASAS_CUSTO, rounding=ROUND_HALF_UP)
+
+
+def inicializar_custo_calculado(apps, schema_editor):
+    # Sem receita o custo calculado é o próprio preco_custo; com receita,
+    # soma(custo do componente x quantidade) + custo_adicional_fixo, com
+    # os componentes calculados antes de quem os usa (Kahn). Produtos em
+    # receitas circulares ficam com o preco_custo até o ciclo ser
+    # corrigido (python manage.py recalcular_custos aponta o ciclo).
+    Empresa = apps.get_model('users', 'Empresa')
+    Produto = apps.get_model('pricing', 'Produto')
+    Composicao = apps.get_model('pricing', 'Composicao')
+    ItemComposicao = apps.get_model('pricing', 'ItemComposicao')
+
+    Produto.objects.update(custo_calculado=models.F('preco_custo'))
+    for empresa_id in Empresa.objects.values_list('id', flat=True).iterator():
+        receitas = dict(
+            Composicao.objects.filter(empresa_id=empresa_id).values_list('produto_acabado_id', 'custo_adicional_fixo')
+        )
+        if not receitas:
+            continue
+        precos = dict(Produto.objects.filter(empresa_id=empresa_id).values_list('id', 'preco_custo'))
+        componentes, usado_em = defaultdict(list), defaultdict(list)
+        itens = ItemComposicao.objects.filter(composicao__empresa_id=empresa_id).values_list(
+            'composicao__produto_acabado_id', 'componente_id', 'quantidade'
+        )
+        for produto_id, componente_id, quantidade in itens:
+            componentes[produto_id].append((componente_id, quantidade))
+            usado_em[componente_id].append(produto_id)
+
+        pendentes = {produto_id: len(componentes.get(produto_id, ())) for produto_id in precos}
+        fila = deque(produto_id for produto_id, qtd in pendentes.items() if qtd == 0)
+        custos = {}
+        while fila:
+            produto_id = fila.popleft()
+            if produto_id in receitas:
+                total = Decimal(receitas[produto_id])
+                for componente_id, quantidade in componentes.get(produto_id, ()):
+                    total += custos[componente_id] * quantidade
+                custos[produto_id] = _arredondar(total)
+            else:
+                custos[produto_id] = _arredondar(precos[produto_id])
+            for pai in usado_em.get(produto_id, ()):
+                pendentes[pai] -= 1
+                if pendentes[pai] == 0:
+                    fila.append(pai)
+
+        Produto.objects.bulk_update(
+            [Produto(id=produto_id, custo_calculado=custos[produto_id]) for produto_id in receitas if produto_id in custos],
+            ['custo_calculado'],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_empresa'),
+        ('pricing', '0002_composicao_itemcomposicao_produto_delete_pricingrule_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='custo_calculado',
+            field=models.DecimalField(decimal_places=4, default=0.0, editable=False, max_digits=14, verbose_name='Custo Calculado'),
+        ),
+        migrations.RunPython(inicializar_custo_calculado, migrations.RunPython.noop),
+    ]
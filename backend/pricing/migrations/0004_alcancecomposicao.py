@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_empresa'),
+        ('pricing', '0003_produto_custo_calculado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlcanceComposicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profundidade', models.PositiveSmallIntegerField(verbose_name='Profundidade')),
+                ('caminhos', models.PositiveBigIntegerField(default=1, verbose_name='Caminhos')),
+                ('ancestral', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alcance_descendentes', to='pricing.produto', verbose_name='Ancestral')),
+                ('descendente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alcance_ancestrais', to='pricing.produto', verbose_name='Descendente')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Alcance da Composição',
+                'verbose_name_plural': 'Alcances das Composições',
+                'indexes': [models.Index(fields=['descendente', 'ancestral'], name='alcance_desc_anc_idx')],
+                'unique_together': {('ancestral', 'descendente', 'profundidade')},
+            },
+        ),
+    ]
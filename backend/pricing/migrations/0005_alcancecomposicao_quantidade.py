@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0004_alcancecomposicao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alcancecomposicao',
+            name='quantidade',
+            field=models.DecimalField(decimal_places=10, default=0, max_digits=28, verbose_name='Quantidade Acumulada'),
+        ),
+    ]
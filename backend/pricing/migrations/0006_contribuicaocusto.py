@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_empresa'),
+        ('pricing', '0005_alcancecomposicao_quantidade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContribuicaoCusto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField(verbose_name='Posição')),
+                ('quantidade', models.DecimalField(decimal_places=10, max_digits=28, verbose_name='Quantidade Acumulada')),
+                ('valor', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Valor no Custo')),
+                ('percentual', models.DecimalField(decimal_places=2, max_digits=7, verbose_name='% do Custo')),
+                ('componente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contribuicoes_em', to='pricing.produto', verbose_name='Componente')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.empresa', verbose_name='Empresa')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contribuicoes', to='pricing.produto', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Contribuição no Custo',
+                'verbose_name_plural': 'Contribuições no Custo',
+                'ordering': ['produto', 'posicao'],
+                'indexes': [models.Index(fields=['componente', 'percentual'], name='contrib_comp_perc_idx')],
+                'unique_together': {('produto', 'componente')},
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def historico_inicial(apps, schema_editor):
+    # Uma linha por produto com os valores atuais, vigente desde a criação
+    # (não há como saber os preços anteriores a esta migração).
+    Produto = apps.get_model('pricing', 'Produto')
+    HistoricoCusto = apps.get_model('pricing', 'HistoricoCusto')
+    linhas = Produto.objects.values_list('id', 'empresa_id', 'preco_custo', 'custo_calculado', 'created_at')
+    HistoricoCusto.objects.bulk_create(
+        (
+            HistoricoCusto(
+                produto_id=produto_id, empresa_id=empresa_id, preco_custo=preco_custo,
+                custo_calculado=custo_calculado, vigente_desde=created_at,
+            )
+            for produto_id, empresa_id, preco_custo, custo_calculado, created_at in linhas.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_empresa'),
+        ('pricing', '0006_contribuicaocusto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoCusto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preco_custo', models.DecimalField(decimal_places=4, max_digits=10, verbose_name='Preço de Custo')),
+                ('custo_calculado', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Custo Calculado')),
+                ('vigente_desde', models.DateTimeField(verbose_name='Vigente Desde')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.empresa', verbose_name='Empresa')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_custos', to='pricing.produto', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Histórico de Custo',
+                'verbose_name_plural': 'Históricos de Custo',
+                'ordering': ['produto', 'vigente_desde'],
+                'indexes': [models.Index(fields=['produto', 'vigente_desde'], name='historico_prod_data_idx')],
+            },
+        ),
+        migrations.RunPython(historico_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Os índices seguem as expressões que o Django gera para
+# nome__icontains / codigo_sku__istartswith: UPPER(coluna::text) LIKE ...
+CRIAR_INDICES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS produto_nome_trgm_idx ON pricing_produto "
+    "USING gin (UPPER(nome::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS produto_sku_trgm_idx ON pricing_produto "
+    "USING gin (UPPER(codigo_sku::text) gin_trgm_ops)",
+]
+REMOVER_INDICES = [
+    "DROP INDEX IF EXISTS produto_sku_trgm_idx",
+    "DROP INDEX IF EXISTS produto_nome_trgm_idx",
+]
+
+
+def _executar(comandos):
+    def executar(apps, schema_editor):
+        # pg_trgm só existe no PostgreSQL (no SQLite a busca é por prefixo)
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for comando in comandos:
+            schema_editor.execute(comando)
+    return executar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0008_produto_indices_listagem'),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(CRIAR_INDICES), _executar(REMOVER_INDICES)),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:02
+
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.db import migrations
+
+# Cópia congelada do cálculo de pricing.alcance.calcular_alcance: a
+# migração não pode depender do código atual (que pode mudar depois).
+CASAS_QUANTIDADE = Decimal('0.0000000001')
+
+
+def _calcular_alcance(itens):
+    """
+    {ancestral_id: {(descendente_id, profundidade): [caminhos, quantidade]}}
+    a partir de (produto_id, componente_id, quantidade), com os
+    componentes processados antes dos produtos que os usam (Kahn).
+    """
+    componentes, usado_em = defaultdict(list), defaultdict(list)
+    for produto_id, componente_id, quantidade in itens:
+        componentes[produto_id].append((componente_id, quantidade))
+        usado_em[componente_id].append(produto_id)
+
+    nos = set(componentes) | set(usado_em)
+    pendentes = {no: len(componentes.get(no, ())) for no in nos}
+    fila = deque(no for no, qtd in pendentes.items() if qtd == 0)
+    descendentes = {}
+    while fila:
+        produto_id = fila.popleft()
+        acumulado = defaultdict(lambda: [0, Decimal(0)])
+        for componente_id, quantidade_item in componentes.get(produto_id, ()):
+            direto = acumulado[(componente_id, 1)]
+            direto[0] += 1
+            direto[1] += quantidade_item
+            for (descendente_id, profundidade), (caminhos, quantidade) in descendentes[componente_id].items():
+                indireto = acumulado[(descendente_id, profundidade + 1)]
+                indireto[0] += caminhos
+                indireto[1] += (quantidade_item * quantidade).quantize(CASAS_QUANTIDADE)
+        descendentes[produto_id] = acumulado
+        for pai in usado_em.get(produto_id, ()):
+            pendentes[pai] -= 1
+            if pendentes[pai] == 0:
+                fila.append(pai)
+
+    if len(descendentes) < len(nos):
+        ciclo = sorted(no for no, qtd in pendentes.items() if qtd > 0)
+        raise RuntimeError(f"Receitas circulares entre os produtos {ciclo}: corrija-as antes de migrar")
+    return descendentes
+
+
+def preencher_alcance(apps, schema_editor):
+    # O índice de alcance é mantido por deltas a partir do estado atual:
+    # as receitas que já existiam antes dele precisam entrar de uma vez.
+    Empresa = apps.get_model('users', 'Empresa')
+    ItemComposicao = apps.get_model('pricing', 'ItemComposicao')
+    AlcanceComposicao = apps.get_model('pricing', 'AlcanceComposicao')
+
+    for empresa_id in Empresa.objects.values_list('id', flat=True).iterator():
+        itens = ItemComposicao.objects.filter(composicao__empresa_id=empresa_id).values_list(
+            'composicao__produto_acabado_id', 'componente_id', 'quantidade'
+        )
+        descendentes = _calcular_alcance(itens)
+
+        AlcanceComposicao.objects.filter(empresa_id=empresa_id).delete()
+        AlcanceComposicao.objects.bulk_create(
+            (
+                AlcanceComposicao(
+                    empresa_id=empresa_id, ancestral_id=ancestral_id, descendente_id=descendente_id,
+                    profundidade=profundidade, caminhos=caminhos, quantidade=quantidade,
+                )
+                for ancestral_id, acumulado in descendentes.items()
+                for (descendente_id, profundidade), (caminhos, quantidade) in acumulado.items()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_empresa'),
+        ('pricing', '0009_produto_busca_trigram'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_alcance, migrations.RunPython.noop),
+    ]
@@ -35,6 +35,17 @@ class Produto(models.Model):
         verbose_name="Preço de Custo"
     )
 
+    # Custo unitário "de verdade": para quem tem Composição é o custo
+    # da receita (com sub-produtos resolvidos); para os demais é o preco_custo.
+    # Mantido incrementalmente por pricing.custos.propagar_custos.
+    custo_calculado = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        default=0.0,
+        editable=False,
+        verbose_name="Custo Calculado"
+    )
+
     is_active = models.BooleanField(default=True, verbose_name="Está Ativo?")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -45,6 +56,13 @@ class Produto(models.Model):
         ordering = ['nome']
         # Garante que um SKU não se repita DENTRO da mesma empresa
         unique_together = ('empresa', 'codigo_sku')
+        indexes = [
+            # Listagem paginada por (nome, id), com e sem filtro de tipo
+            models.Index(fields=['empresa', 'nome', 'id'], name='produto_empresa_nome_idx'),
+            models.Index(fields=['empresa', 'tipo', 'nome', 'id'], name='produto_emp_tipo_nome_idx'),
+            # "O que mudou desde ontem" (sincronizações)
+            models.Index(fields=['empresa', 'updated_at'], name='produto_emp_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nome} ({self.unidade_medida})" # Corrigido de get_unidade_medida_display
@@ -128,4 +146,140 @@ class ItemComposicao(models.Model):
         unique_together = ('composicao', 'componente')
 
     def __str__(self):
-        return f"{self.quantidade} x {self.componente.nome}"
\ No newline at end of file
+        return f"{self.quantidade} x {self.componente.nome}"
+
+class AlcanceComposicao(models.Model):
+    """
+    Índice de alcance (fecho transitivo) das receitas.
+
+    Cada linha diz que 'ancestral' usa 'descendente' a 'profundidade'
+    níveis abaixo, por 'caminhos' caminhos distintos, consumindo ao todo
+    'quantidade' do descendente por unidade do ancestral. Mantido
+    incrementalmente por pricing.alcance (não edite à mão).
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Empresa"
+    )
+    ancestral = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='alcance_descendentes',
+        verbose_name="Ancestral"
+    )
+    descendente = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='alcance_ancestrais',
+        verbose_name="Descendente"
+    )
+    profundidade = models.PositiveSmallIntegerField(verbose_name="Profundidade")
+
+    # Quantos caminhos diferentes (com esta profundidade) ligam os dois.
+    # É o que permite remover itens sem reconstruir o índice.
+    caminhos = models.PositiveBigIntegerField(default=1, verbose_name="Caminhos")
+
+    # Soma, em todos esses caminhos, do produto das quantidades das receitas
+    quantidade = models.DecimalField(
+        max_digits=28,
+        decimal_places=10,
+        default=0,
+        verbose_name="Quantidade Acumulada"
+    )
+
+    class Meta:
+        verbose_name = "Alcance da Composição"
+        verbose_name_plural = "Alcances das Composições"
+        unique_together = ('ancestral', 'descendente', 'profundidade')
+        indexes = [
+            # "Quem usa este produto?" (e a checagem de ciclo)
+            models.Index(fields=['descendente', 'ancestral'], name='alcance_desc_anc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestral_id} -> {self.descendente_id} (nível {self.profundidade})"
+
+
+class ContribuicaoCusto(models.Model):
+    """
+    Os principais "formadores" do custo de um produto com receita (Pareto).
+
+    Para cada produto, guarda os N itens sem receita (MP, SV...) que mais
+    pesam no custo unitário, já com os sub-produtos "achatados": quanto
+    do item entra em uma unidade do produto, quanto isso custa e o
+    percentual do custo_calculado. Mantido por pricing.contribuicoes.
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Empresa"
+    )
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='contribuicoes',
+        verbose_name="Produto"
+    )
+    componente = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='contribuicoes_em',
+        verbose_name="Componente"
+    )
+    posicao = models.PositiveSmallIntegerField(verbose_name="Posição") # 1 = o que mais pesa
+    quantidade = models.DecimalField(max_digits=28, decimal_places=10, verbose_name="Quantidade Acumulada")
+    valor = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Valor no Custo")
+    percentual = models.DecimalField(max_digits=7, decimal_places=2, verbose_name="% do Custo")
+
+    class Meta:
+        verbose_name = "Contribuição no Custo"
+        verbose_name_plural = "Contribuições no Custo"
+        ordering = ['produto', 'posicao']
+        unique_together = ('produto', 'componente')
+        indexes = [
+            # "Produtos em que o aço pesa mais de 40%"
+            models.Index(fields=['componente', 'percentual'], name='contrib_comp_perc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.produto_id}: {self.componente_id} ({self.percentual}%)"
+
+
+class HistoricoCusto(models.Model):
+    """
+    Histórico (só inclusão) do preço de custo e do custo calculado.
+
+    Cada linha vale a partir de 'vigente_desde' até a próxima linha do
+    mesmo produto. Gravado por pricing.historico sempre que o preço ou
+    a receita mudam; linhas seguidas iguais são unidas na compactação.
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Empresa"
+    )
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='historico_custos',
+        verbose_name="Produto"
+    )
+    preco_custo = models.DecimalField(max_digits=10, decimal_places=4, verbose_name="Preço de Custo")
+    custo_calculado = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Custo Calculado")
+    vigente_desde = models.DateTimeField(verbose_name="Vigente Desde")
+
+    class Meta:
+        verbose_name = "Histórico de Custo"
+        verbose_name_plural = "Históricos de Custo"
+        ordering = ['produto', 'vigente_desde']
+        indexes = [
+            # "Custo do produto P na data D": uma busca no índice
+            models.Index(fields=['produto', 'vigente_desde'], name='historico_prod_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.produto_id} @ {self.vigente_desde:%Y-%m-%d %H:%M}: {self.custo_calculado}"
@@ -0,0 +1,108 @@
+# Em backend/pricing/paginacao.py
+"""
+Paginação por "chave" (keyset / cursor) para listas grandes.
+
+Em vez de OFFSET (que lê e descarta todas as linhas anteriores), cada
+página continua a partir da última linha da página anterior:
+
+    WHERE nome > :nome OR (nome = :nome AND id > :id)
+    ORDER BY nome, id LIMIT :tamanho
+
+Com o índice (empresa, nome, id) a página 1000 custa o mesmo que a 1.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class NomeIdCursorPagination(BasePagination):
+    """Páginas ordenadas por (nome, id), com links 'next'/'previous' opacos."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.tamanho = self._tamanho_pagina(request)
+        self.cursor = self._ler_cursor(request)
+        voltando = bool(self.cursor and self.cursor['v'])
+
+        if self.cursor:
+            nome, pk = self.cursor['n'], self.cursor['i']
+            if voltando:
+                queryset = queryset.filter(Q(nome__lt=nome) | Q(nome=nome, id__lt=pk))
+            else:
+                queryset = queryset.filter(Q(nome__gt=nome) | Q(nome=nome, id__gt=pk))
+        ordem = ('-nome', '-id') if voltando else ('nome', 'id')
+
+        # Um item a mais só para saber se existe outra página
+        linhas = list(queryset.order_by(*ordem)[:self.tamanho + 1])
+        tem_mais = len(linhas) > self.tamanho
+        linhas = linhas[:self.tamanho]
+        if voltando:
+            linhas.reverse()
+
+        self.tem_proxima = tem_mais if not voltando else True
+        self.tem_anterior = tem_mais if voltando else self.cursor is not None
+        self.primeira, self.ultima = (linhas[0], linhas[-1]) if linhas else (None, None)
+        return linhas
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.tem_proxima or self.ultima is None:
+            return None
+        return self._link(self.ultima, voltando=False)
+
+    def get_previous_link(self):
+        if not self.tem_anterior:
+            return None
+        if self.primeira is None:
+            # Página vazia depois de um cursor: volta para o começo
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.primeira, voltando=True)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def _tamanho_pagina(self, request):
+        try:
+            tamanho = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(tamanho, self.max_page_size))
+
+    def _ler_cursor(self, request):
+        valor = request.query_params.get(self.cursor_query_param)
+        if not valor:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(valor.encode('ascii')))
+            return {'n': str(cursor['n']), 'i': int(cursor['i']), 'v': bool(cursor.get('v'))}
+        except (ValueError, TypeError, KeyError, UnicodeError):
+            raise NotFound("Cursor inválido.")
+
+    def _link(self, objeto, voltando):
+        cursor = {'n': objeto.nome, 'i': objeto.id, 'v': voltando}
+        valor = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, valor)
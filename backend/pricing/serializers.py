@@ -1,6 +1,9 @@
 # Em backend/pricing/serializers.py
+from decimal import Decimal
 from rest_framework import serializers
-from .models import Produto, Composicao, ItemComposicao
+from users.tenancy import get_empresa
+from .models import Produto, Composicao, ItemComposicao, ContribuicaoCusto
+from .alcance import componentes_que_criam_ciclo, sincronizar_receita
 
 class ProdutoSerializer(serializers.ModelSerializer):
     """
@@ -11,11 +14,12 @@ class ProdutoSerializer(serializers.ModelSerializer):
         model = Produto
         fields = [
             'id', 'empresa', 'nome', 'codigo_sku', 'tipo', 
-            'unidade_medida', 'preco_custo', 'is_active'
+            'unidade_medida', 'preco_custo', 'custo_calculado', 'is_active'
         ]
         # A 'empresa' será preenchida automaticamente pela view,
         # então o frontend não precisa enviá-la.
-        read_only_fields = ['empresa']
+        # O 'custo_calculado' é mantido pelo backend (pricing.custos).
+        read_only_fields = ['empresa', 'custo_calculado']
 
     def validate_codigo_sku(self, value):
         """
@@ -26,7 +30,7 @@ class ProdutoSerializer(serializers.ModelSerializer):
         if not request:
             return value # Não pode validar sem o request
 
-        empresa = request.user.owned_empresas.first()
+        empresa = get_empresa(request)
         if not empresa:
             raise serializers.ValidationError("Usuário não tem empresa.")
         
@@ -49,9 +53,22 @@ class ProdutoSerializer(serializers.ModelSerializer):
 
 class ItemComposicaoSerializer(serializers.ModelSerializer):
     """Tradutor para os 'ingredientes' da receita"""
+
+    # Dados do componente (só leitura). A view já traz o componente
+    # junto com os itens (select_related), então não há query extra.
+    componente_nome = serializers.CharField(source='componente.nome', read_only=True)
+    componente_sku = serializers.CharField(source='componente.codigo_sku', read_only=True)
+    componente_unidade = serializers.CharField(source='componente.unidade_medida', read_only=True)
+    componente_custo = serializers.DecimalField(
+        source='componente.custo_calculado', max_digits=14, decimal_places=4, read_only=True
+    )
+
     class Meta:
         model = ItemComposicao
-        fields = ['id', 'componente', 'quantidade']
+        fields = [
+            'id', 'componente', 'quantidade',
+            'componente_nome', 'componente_sku', 'componente_unidade', 'componente_custo',
+        ]
         read_only_fields = ['id']
 
 class ComposicaoSerializer(serializers.ModelSerializer):
@@ -59,14 +76,40 @@ class ComposicaoSerializer(serializers.ModelSerializer):
     
     # Campo aninhado: mostra os 'itens' (ingredientes) juntos
     itens = ItemComposicaoSerializer(many=True)
+    produto_acabado_nome = serializers.CharField(source='produto_acabado.nome', read_only=True)
 
     class Meta:
         model = Composicao
         fields = [
-            'id', 'empresa', 'produto_acabado', 'descricao', 
+            'id', 'empresa', 'produto_acabado', 'produto_acabado_nome', 'descricao',
             'custo_adicional_fixo', 'itens' # 'itens' é o campo aninhado
         ]
         read_only_fields = ['empresa']
+
+    def validate(self, data):
+        """
+        Impede receitas circulares (um item não pode usar a si mesmo,
+        nem usar algo que, em qualquer nível, já o usa) e componentes
+        repetidos na mesma receita.
+        """
+        produto = data.get('produto_acabado') or getattr(self.instance, 'produto_acabado', None)
+        if 'itens' in data:
+            componentes = {item['componente'].id for item in data['itens']}
+            if len(componentes) < len(data['itens']):
+                raise serializers.ValidationError({'itens': "O mesmo componente aparece mais de uma vez na receita."})
+        elif self.instance is not None and 'produto_acabado' in data:
+            # PATCH trocando só o produto: os itens atuais passam para o novo produto
+            componentes = set(self.instance.itens.values_list('componente_id', flat=True))
+        else:
+            return data
+
+        proibidos = componentes_que_criam_ciclo(getattr(produto, 'id', None), componentes)
+        if proibidos:
+            nomes = Produto.objects.filter(id__in=proibidos).order_by('nome').values_list('nome', flat=True)
+            raise serializers.ValidationError({
+                'itens': f"Receita circular: {', '.join(nomes)} já usa(m) '{produto.nome}' (ou é o próprio produto)."
+            })
+        return data
     
     def create(self, validated_data):
         """
@@ -78,9 +121,17 @@ class ComposicaoSerializer(serializers.ModelSerializer):
         # 2. Cria a 'Composição' (a receita principal)
         composicao = Composicao.objects.create(**validated_data)
         
-        # 3. Cria cada 'Item' (ingrediente) e liga à receita
-        for item_data in itens_data:
-            ItemComposicao.objects.create(composicao=composicao, **item_data)
+        # 3. Cria todos os 'Itens' (ingredientes) de uma vez
+        ItemComposicao.objects.bulk_create(
+            [ItemComposicao(composicao=composicao, **item_data) for item_data in itens_data],
+            batch_size=500,
+        )
+
+        # 4. Atualiza o índice de alcance (ciclos e "onde é usado")
+        sincronizar_receita(
+            composicao.empresa_id, None, composicao.produto_acabado_id,
+            {}, {item['componente'].id: item['quantidade'] for item in itens_data},
+        )
         
         return composicao
 
@@ -90,16 +141,114 @@ class ComposicaoSerializer(serializers.ModelSerializer):
         """
         # Separa os dados dos 'itens' (se eles foram enviados)
         itens_data = validated_data.pop('itens', None)
+
+        # Estado anterior: usado no "diff" dos itens e no índice de alcance
+        produto_anterior_id = instance.produto_acabado_id
+        existentes = {
+            item.componente_id: item
+            for item in instance.itens.only('id', 'composicao_id', 'componente_id', 'quantidade')
+        }
+        anteriores = {componente_id: item.quantidade for componente_id, item in existentes.items()}
         
         # 1. Atualiza os campos simples da Composição (ex: 'descricao')
         instance = super().update(instance, validated_data)
 
-        # 2. Lógica para atualizar/criar/deletar os itens da receita
+        # 2. Compara os itens recebidos com os que já existem (pelo componente)
+        #    e grava só a diferença: 1 INSERT, 1 UPDATE e 1 DELETE em lote,
+        #    preservando os IDs dos itens que continuam na receita.
+        atuais = anteriores
         if itens_data is not None:
-            # Abordagem simples: apaga todos os itens antigos
-            instance.itens.all().delete() 
-            # E cria os novos que vieram do frontend
+            atuais = {item['componente'].id: item['quantidade'] for item in itens_data}
+            novos, alterados = [], []
             for item_data in itens_data:
-                ItemComposicao.objects.create(composicao=instance, **item_data)
+                item = existentes.get(item_data['componente'].id)
+                if item is None:
+                    novos.append(ItemComposicao(composicao=instance, **item_data))
+                elif item.quantidade != item_data['quantidade']:
+                    item.quantidade = item_data['quantidade']
+                    alterados.append(item)
+
+            removidos = [item.id for componente_id, item in existentes.items() if componente_id not in atuais]
+            if removidos:
+                ItemComposicao.objects.filter(id__in=removidos).delete()
+            ItemComposicao.objects.bulk_update(alterados, ['quantidade'], batch_size=500)
+            ItemComposicao.objects.bulk_create(novos, batch_size=500)
+
+        # 3. Atualiza o índice de alcance
+        sincronizar_receita(
+            instance.empresa_id, produto_anterior_id, instance.produto_acabado_id, anteriores, atuais
+        )
         
-        return instance
\ No newline at end of file
+        return instance
+
+
+# --- Contribuições no custo (Pareto) ---
+
+class ContribuicaoCustoSerializer(serializers.ModelSerializer):
+    """Um item que forma o custo de um produto (só leitura)"""
+    produto_nome = serializers.CharField(source='produto.nome', read_only=True)
+    produto_sku = serializers.CharField(source='produto.codigo_sku', read_only=True)
+    produto_tipo = serializers.CharField(source='produto.tipo', read_only=True)
+    componente_nome = serializers.CharField(source='componente.nome', read_only=True)
+    componente_sku = serializers.CharField(source='componente.codigo_sku', read_only=True)
+
+    class Meta:
+        model = ContribuicaoCusto
+        fields = [
+            'produto', 'produto_nome', 'produto_sku', 'produto_tipo',
+            'componente', 'componente_nome', 'componente_sku',
+            'posicao', 'quantidade', 'valor', 'percentual',
+        ]
+        read_only_fields = fields
+
+
+# --- Plano de produção (explosão das receitas) ---
+
+class ItemPlanoSerializer(serializers.Serializer):
+    """Um produto do plano e quantas unidades serão produzidas"""
+    produto = serializers.IntegerField()
+    quantidade = serializers.DecimalField(max_digits=14, decimal_places=4, min_value=Decimal('0.0001'))
+
+
+class PlanoProducaoSerializer(serializers.Serializer):
+    """Plano inteiro: lista de (produto, quantidade)"""
+    itens = ItemPlanoSerializer(many=True, allow_empty=False)
+
+
+# --- Simulação de preços ("e se?") ---
+
+class PrecoSimuladoSerializer(serializers.Serializer):
+    """Um preço hipotético, pelo id do produto OU pelo SKU"""
+    produto = serializers.IntegerField(required=False)
+    codigo_sku = serializers.CharField(required=False)
+    preco_custo = serializers.DecimalField(max_digits=10, decimal_places=4, min_value=Decimal('0'))
+
+    def validate(self, data):
+        if not data.get('produto') and not data.get('codigo_sku'):
+            raise serializers.ValidationError("Informe o 'produto' ou o 'codigo_sku'.")
+        return data
+
+
+class ReajusteSimuladoSerializer(serializers.Serializer):
+    """
+    Reajuste percentual sobre o preço atual de um grupo de produtos
+    (ex.: +12% em todas as MP cujo SKU começa com "ACO-").
+    """
+    percentual = serializers.DecimalField(max_digits=7, decimal_places=2, min_value=Decimal('-100'))
+    tipo = serializers.ChoiceField(choices=Produto.TIPO_CHOICES, required=False)
+    codigo_sku_prefixo = serializers.CharField(required=False)
+    produtos = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class SimulacaoSerializer(serializers.Serializer):
+    """Cenário: reajustes em grupo + preços pontuais (que têm a palavra final)"""
+    reajustes = ReajusteSimuladoSerializer(many=True, required=False)
+    precos = PrecoSimuladoSerializer(many=True, required=False)
+    tipo = serializers.ChoiceField(
+        choices=Produto.TIPO_CHOICES, required=False, help_text="Mostrar só produtos deste tipo no resultado"
+    )
+
+    def validate(self, data):
+        if not data.get('reajustes') and not data.get('precos'):
+            raise serializers.ValidationError("Informe ao menos um reajuste ou preço.")
+        return data
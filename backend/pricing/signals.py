@@ -0,0 +1,7 @@
+# Em backend/pricing/signals.py
+from django.dispatch import Signal
+
+# Enviado depois de gravar custos calculados que mudaram, uma vez por
+# empresa: custos_alterados.send(sender=Produto, empresa_id=..., anteriores={produto_id: custo_anterior}).
+# Quem guarda cópias de custos (ex.: os orçamentos) escuta aqui.
+custos_alterados = Signal()
@@ -0,0 +1,125 @@
+# Em backend/pricing/simulacao.py
+"""
+Simulação de preços ("e se?") sem gravar nada.
+
+O grafo de receitas da empresa e os custos atuais ficam em cache na
+memória do processo, identificados por uma "versão" do catálogo (total
+de linhas + último updated_at de Produto e Composição, e um resumo dos
+itens das receitas). Enquanto o
+catálogo não muda, cada simulação só recalcula os produtos afetados
+pelos preços alterados (eles e quem os usa, em qualquer nível).
+"""
+import copy
+import threading
+from collections import ChainMap, OrderedDict, deque
+from decimal import Decimal
+
+from django.db.models import Count, Max, Sum
+
+from .custos import arredondar_custo, calcular_custos, custo_do_no
+from .grafo import GrafoComposicao, CicloNaComposicao
+from .models import Produto, Composicao, ItemComposicao
+
+# Quantas empresas ficam com o grafo em cache, por processo
+MAX_GRAFOS_EM_CACHE = 8
+
+_grafos_em_cache = OrderedDict()
+# Workers com threads compartilham o cache: leitura e gravação do LRU sob a trava
+_trava_cache = threading.Lock()
+
+
+def versao_catalogo(empresa_id):
+    """
+    Muda sempre que um produto/receita é criado, alterado ou apagado
+    (3 queries). ItemComposicao não tem updated_at: os itens entram
+    pelo total, maior id e somas de quantidade/componente, o que pega
+    itens incluídos, removidos ou alterados direto no banco.
+    """
+    produtos = Produto.objects.filter(empresa_id=empresa_id).aggregate(total=Count('id'), ultimo=Max('updated_at'))
+    receitas = Composicao.objects.filter(empresa_id=empresa_id).aggregate(total=Count('id'), ultimo=Max('updated_at'))
+    itens = ItemComposicao.objects.filter(composicao__empresa_id=empresa_id).aggregate(
+        total=Count('id'), ultimo=Max('id'), quantidade=Sum('quantidade'), componentes=Sum('componente_id'),
+    )
+    return (
+        produtos['total'], produtos['ultimo'], receitas['total'], receitas['ultimo'],
+        itens['total'], itens['ultimo'], itens['quantidade'], itens['componentes'],
+    )
+
+
+def grafo_em_cache(empresa_id):
+    """
+    Retorna (grafo, custos) da empresa, recarregando do banco só
+    quando a versão do catálogo mudou.
+    """
+    versao = versao_catalogo(empresa_id)
+    with _trava_cache:
+        guardado = _grafos_em_cache.get(empresa_id)
+        if guardado is not None and guardado[0] == versao:
+            _grafos_em_cache.move_to_end(empresa_id)
+            return guardado[1], guardado[2]
+
+    # Carrega fora da trava: uma empresa grande não segura as outras
+    grafo = GrafoComposicao.carregar(empresa_id)
+    custos = calcular_custos(grafo)
+    with _trava_cache:
+        _grafos_em_cache[empresa_id] = (versao, grafo, custos)
+        _grafos_em_cache.move_to_end(empresa_id)
+        while len(_grafos_em_cache) > MAX_GRAFOS_EM_CACHE:
+            _grafos_em_cache.popitem(last=False)
+    return grafo, custos
+
+
+def afetados_por(grafo, produto_ids):
+    """Os produtos informados e todos os que os usam, em qualquer nível (só memória)."""
+    afetados = set(produto_ids)
+    pilha = list(afetados)
+    while pilha:
+        for pai in grafo.usado_em.get(pilha.pop(), ()):
+            if pai not in afetados:
+                afetados.add(pai)
+                pilha.append(pai)
+    return afetados
+
+
+def simular(grafo, custos, precos_novos):
+    """
+    Recalcula só o subgrafo afetado por 'precos_novos' ({produto_id: preco}).
+
+    Os demais produtos entram com o custo atual ('custos'). Retorna
+    {produto_id: custo_simulado} de todos os afetados.
+    """
+    afetados = afetados_por(grafo, precos_novos)
+
+    # Kahn restrito aos afetados: um produto só é calculado depois
+    # de todos os seus componentes que também foram afetados.
+    pendentes = {
+        produto_id: sum(1 for componente_id, _ in grafo.componentes.get(produto_id, ()) if componente_id in afetados)
+        for produto_id in afetados
+    }
+    fila = deque(produto_id for produto_id, qtd in pendentes.items() if qtd == 0)
+
+    simulado = copy.copy(grafo)
+    simulado.precos = ChainMap(precos_novos, grafo.precos)
+    novos = {}
+    custos_simulados = ChainMap(novos, custos)
+    while fila:
+        produto_id = fila.popleft()
+        novos[produto_id] = custo_do_no(simulado, produto_id, custos_simulados)
+        for pai in grafo.usado_em.get(produto_id, ()):
+            pendentes[pai] -= 1
+            if pendentes[pai] == 0:
+                fila.append(pai)
+
+    if len(novos) < len(afetados):
+        raise CicloNaComposicao(produto_id for produto_id, qtd in pendentes.items() if qtd > 0)
+    return novos
+
+
+def aplicar_reajuste(grafo, produto_ids, percentual):
+    """Novos preços de custo com +/- percentual sobre o preço atual."""
+    fator = 1 + Decimal(percentual) / 100
+    return {
+        produto_id: arredondar_custo(grafo.precos[produto_id] * fator)
+        for produto_id in produto_ids
+        if produto_id in grafo.precos
+    }
@@ -1,3 +1,911 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+import importlib
+import io
+import random
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import Empresa
+from . import alcance, simulacao
+from .alcance import AlcanceInconsistente, calcular_alcance, reconstruir_alcance
+from .contribuicoes import atualizar_contribuicoes
+from .custos import calcular_custos, calcular_custos_empresa, propagar_custos, recalcular_custos_empresa
+from .custos_vetorizados import calcular_custos_empresa_vetorizado
+from .grafo import CicloNaComposicao, GrafoComposicao
+from .importacao import importar_produtos
+from .historico import compactar_historico, custo_na_data
+from .models import Produto, Composicao, ItemComposicao, AlcanceComposicao, ContribuicaoCusto, HistoricoCusto
+
+
+class CalculoCustosTests(SimpleTestCase):
+    """Custo das receitas no grafo em memória (sem banco)."""
+
+    def custos(self, precos, receitas, itens):
+        grafo = GrafoComposicao(
+            {produto: Decimal(preco) for produto, preco in precos.items()},
+            {produto: Decimal(fixo) for produto, fixo in receitas.items()},
+            [(produto, componente, Decimal(quantidade)) for produto, componente, quantidade in itens],
+        )
+        return calcular_custos(grafo)
+
+    def test_sub_produtos_e_custo_fixo(self):
+        # 1 = Chapa, 2 = Parafuso, 3 = Módulo (SB), 4 = Armário (PA)
+        custos = self.custos(
+            {1: '10', 2: '0.5', 3: '0', 4: '0'},
+            {3: '1.50', 4: '20'},
+            [(3, 1, '2'), (3, 2, '8'), (4, 3, '3'), (4, 2, '4')],
+        )
+        # Módulo: 2 x 10 + 8 x 0,5 + 1,50; Armário: 3 x 25,50 + 4 x 0,5 + 20
+        self.assertEqual(custos, {1: Decimal('10'), 2: Decimal('0.5'), 3: Decimal('25.50'), 4: Decimal('98.50')})
+
+    def test_arredonda_em_cada_nivel(self):
+        # 0,5 x 0,0001 = 0,00005 -> 0,0001 (meio para cima); o pai usa o valor arredondado
+        custos = self.custos({1: '0.0001', 2: '0', 3: '0'}, {2: '0', 3: '0'}, [(2, 1, '0.5'), (3, 2, '3')])
+        self.assertEqual((custos[2], custos[3]), (Decimal('0.0001'), Decimal('0.0003')))
+
+    def test_componente_sem_preco_nem_receita_custa_zero(self):
+        custos = self.custos({1: '0'}, {1: '5'}, [(1, 2, '3')])
+        self.assertEqual(custos, {1: Decimal('5'), 2: Decimal('0')})
+
+    def test_ciclo(self):
+        with self.assertRaises(CicloNaComposicao) as contexto:
+            self.custos({1: '1', 2: '0', 3: '0'}, {2: '0', 3: '0'}, [(2, 1, '1'), (2, 3, '1'), (3, 2, '1')])
+        self.assertEqual(contexto.exception.produto_ids, [2, 3])
+
+
+@override_settings(EMPRESA_CACHE_TTL=0)
+class ComposicaoQueriesTests(APITestCase):
+    """
+    O número de queries da API de receitas não pode crescer com o número de linhas.
+    Orçamento: empresa + receitas (com o produto) + itens (com o componente).
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        self.materias = [
+            Produto.objects.create(
+                empresa=self.empresa, nome=f'MP {i}', codigo_sku=f'MP{i}', tipo='MP',
+                unidade_medida='kg', preco_custo=Decimal('1.5'), custo_calculado=Decimal('1.5'),
+            )
+            for i in range(3)
+        ]
+        self.total_receitas = 0
+
+    def criar_receitas(self, quantidade):
+        for _ in range(quantidade):
+            self.total_receitas += 1
+            produto = Produto.objects.create(
+                empresa=self.empresa, nome=f'PA {self.total_receitas}', codigo_sku=f'PA{self.total_receitas}',
+                tipo='PA', unidade_medida='un',
+            )
+            composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=produto)
+            ItemComposicao.objects.bulk_create([
+                ItemComposicao(composicao=composicao, componente=materia, quantidade=Decimal('2'))
+                for materia in self.materias
+            ])
+        return composicao
+
+    def contar_queries(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return len(contexto), resposta
+
+    def test_lista_com_numero_constante_de_queries(self):
+        self.criar_receitas(2)
+        poucas, _ = self.contar_queries('/api/composicoes/')
+
+        self.criar_receitas(20)
+        muitas, resposta = self.contar_queries('/api/composicoes/')
+
+        self.assertEqual(poucas, muitas)
+        self.assertLessEqual(muitas, 3)
+        self.assertEqual(len(resposta.data), 22)
+
+    def test_itens_trazem_dados_do_componente(self):
+        composicao = self.criar_receitas(1)
+        with self.assertNumQueries(3):
+            resposta = self.client.get(f'/api/composicoes/{composicao.id}/')
+
+        item = resposta.data['itens'][0]
+        self.assertEqual(resposta.data['produto_acabado_nome'], 'PA 1')
+        self.assertEqual(item['componente_nome'], 'MP 0')
+        self.assertEqual(item['componente_sku'], 'MP0')
+        self.assertEqual(item['componente_unidade'], 'kg')
+        self.assertEqual(item['componente_custo'], '1.5000')
+
+
+@override_settings(EMPRESA_CACHE_TTL=0)
+class CatalogoTestCase(APITestCase):
+    """
+    Catálogo pequeno com dois níveis de receita:
+    Armário = 3 Módulos + 4 Parafusos; Módulo = 2 Chapas + 8 Parafusos.
+    Custos: Módulo 24,00; Armário 74,00.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        self.chapa = self.produto('Chapa', 'MP', '10')
+        self.parafuso = self.produto('Parafuso', 'MP', '0.5')
+        self.modulo = self.produto('Módulo', 'SB')
+        self.armario = self.produto('Armário', 'PA')
+        self.receita_modulo = self.receita(self.modulo, [(self.chapa, '2'), (self.parafuso, '8')])
+        self.receita_armario = self.receita(self.armario, [(self.modulo, '3'), (self.parafuso, '4')])
+
+    def produto(self, nome, tipo, preco='0'):
+        return Produto.objects.create(
+            empresa=self.empresa, nome=nome, codigo_sku=nome.upper(), tipo=tipo, unidade_medida='un',
+            preco_custo=Decimal(preco), custo_calculado=Decimal(preco),
+        )
+
+    def receita(self, produto, itens):
+        resposta = self.client.post('/api/composicoes/', {
+            'produto_acabado': produto.id,
+            'itens': [{'componente': componente.id, 'quantidade': quantidade} for componente, quantidade in itens],
+        }, format='json')
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        return resposta.data['id']
+
+    def editar(self, receita_id, itens):
+        return self.client.patch(f'/api/composicoes/{receita_id}/', {
+            'itens': [{'componente': componente.id, 'quantidade': quantidade} for componente, quantidade in itens],
+        }, format='json')
+
+
+class PropagacaoCustosTests(CatalogoTestCase):
+    """O custo propagado só pelos afetados bate com o recálculo do catálogo inteiro."""
+
+    def assertIgualAoRecalculo(self):
+        gravados = dict(Produto.objects.filter(empresa=self.empresa).values_list('id', 'custo_calculado'))
+        self.assertEqual(gravados, calcular_custos_empresa(self.empresa))
+
+    def test_edicoes_de_preco_e_de_receita(self):
+        gaveta = self.produto('Gaveta', 'SB')
+        puxador = self.produto('Puxador', 'MP', '3.3333')
+        prateleira = self.produto('Prateleira', 'SB')
+        receita_gaveta = self.receita(gaveta, [(self.chapa, '0.75'), (puxador, '1')])
+        self.assertIgualAoRecalculo()
+
+        edicoes = [
+            lambda: self.client.patch(f'/api/produtos/{self.parafuso.id}/', {'preco_custo': '0.3333'}, format='json'),
+            lambda: self.client.patch(f'/api/produtos/{puxador.id}/', {'preco_custo': '4.4445'}, format='json'),
+            # Gaveta entra no Módulo: o Armário passa a depender dela por dois caminhos
+            lambda: self.editar(self.receita_modulo, [(self.chapa, '2'), (self.parafuso, '8'), (gaveta, '2')]),
+            lambda: self.editar(self.receita_armario, [(self.modulo, '3'), (gaveta, '1.5')]),
+            lambda: self.client.patch(
+                f'/api/composicoes/{receita_gaveta}/', {'custo_adicional_fixo': '7.25'}, format='json',
+            ),
+            lambda: self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': '12.5'}, format='json'),
+            # A receita passa para a Prateleira: a Gaveta volta ao próprio preco_custo
+            lambda: self.client.patch(
+                f'/api/composicoes/{receita_gaveta}/', {'produto_acabado': prateleira.id}, format='json',
+            ),
+            lambda: self.client.delete(f'/api/composicoes/{receita_gaveta}/'),
+        ]
+        for edicao in edicoes:
+            resposta = edicao()
+            self.assertLess(resposta.status_code, 300, resposta.data)
+            self.assertIgualAoRecalculo()
+
+    def test_endpoint_custos(self):
+        resposta = self.client.get('/api/produtos/custos/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json(), {
+            str(self.chapa.id): '10.0000', str(self.parafuso.id): '0.5000',
+            str(self.modulo.id): '24.0000', str(self.armario.id): '74.0000',
+        })
+
+        # Receita circular gravada por fora da API
+        composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=self.chapa)
+        ItemComposicao.objects.create(composicao=composicao, componente=self.armario, quantidade=Decimal('1'))
+        resposta = self.client.get('/api/produtos/custos/')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('Ciclo', resposta.data['error'])
+
+    def test_migracao_calcula_o_custo_das_receitas(self):
+        migracao = importlib.import_module('pricing.migrations.0003_produto_custo_calculado')
+        # Receita circular (gravada por fora da API): fica com o preco_custo
+        gaveta, tampo = self.produto('Gaveta', 'SB', '3'), self.produto('Tampo', 'SB', '5')
+        for produto, componente in ((gaveta, tampo), (tampo, gaveta)):
+            composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=produto)
+            ItemComposicao.objects.create(composicao=composicao, componente=componente, quantidade=Decimal('1'))
+        Produto.objects.update(custo_calculado=Decimal('0'))
+
+        migracao.inicializar_custo_calculado(django_apps, None)
+        self.assertEqual(
+            dict(Produto.objects.values_list('codigo_sku', 'custo_calculado')),
+            {'CHAPA': Decimal('10'), 'PARAFUSO': Decimal('0.5'), 'MÓDULO': Decimal('24'), 'ARMÁRIO': Decimal('74'),
+             'GAVETA': Decimal('3'), 'TAMPO': Decimal('5')},
+        )
+
+    def test_comando_desfaz_a_empresa_que_falhou(self):
+        Produto.objects.filter(pk=self.chapa.pk).update(preco_custo=Decimal('20'))
+        with mock.patch('pricing.custos.registrar_historico', side_effect=RuntimeError('falhou')), \
+                self.assertRaises(RuntimeError):
+            call_command('recalcular_custos', empresa=self.empresa.id, stdout=io.StringIO())
+        # Os custos gravados antes da falha voltaram junto
+        self.assertEqual(Produto.objects.get(pk=self.armario.pk).custo_calculado, Decimal('74'))
+
+        call_command('recalcular_custos', empresa=self.empresa.id, stdout=io.StringIO())
+        self.assertEqual(Produto.objects.get(pk=self.armario.pk).custo_calculado, Decimal('134'))
+
+
+class EdicaoReceitaTests(CatalogoTestCase):
+    """PATCH dos itens grava só a diferença (pelo componente) e mantém índice e custos em dia."""
+
+    def escritas(self, contexto):
+        """Quantas queries de cada tipo foram na tabela de itens."""
+        tabela = ItemComposicao._meta.db_table
+        contagem = {'INSERT': 0, 'UPDATE': 0, 'DELETE': 0}
+        for query in contexto.captured_queries:
+            comando = query['sql'].split(' ', 1)[0]
+            if comando in contagem and f'"{tabela}"' in query['sql'].split('WHERE')[0]:
+                contagem[comando] += 1
+        return contagem
+
+    def itens_do_modulo(self):
+        return dict(
+            ItemComposicao.objects.filter(composicao_id=self.receita_modulo).values_list('componente_id', 'id')
+        )
+
+    def test_altera_inclui_e_exclui_so_o_que_mudou(self):
+        cola = self.produto('Cola', 'MP', '4')
+        antes = self.itens_do_modulo()
+
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.editar(self.receita_modulo, [(self.chapa, '3'), (cola, '0.5')])
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        self.assertEqual(self.escritas(contexto), {'INSERT': 1, 'UPDATE': 1, 'DELETE': 1})
+
+        depois = self.itens_do_modulo()
+        self.assertEqual(set(depois), {self.chapa.id, cola.id})
+        # A linha da chapa continua a mesma (só mudou a quantidade)
+        self.assertEqual(depois[self.chapa.id], antes[self.chapa.id])
+        self.assertEqual(ItemComposicao.objects.get(pk=depois[self.chapa.id]).quantidade, Decimal('3'))
+
+    def test_itens_iguais_nao_gravam_nada(self):
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.editar(self.receita_modulo, [(self.parafuso, '8'), (self.chapa, '2')])
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        self.assertEqual(self.escritas(contexto), {'INSERT': 0, 'UPDATE': 0, 'DELETE': 0})
+
+    def test_rejeita_componente_repetido(self):
+        resposta = self.editar(self.receita_modulo, [(self.chapa, '2'), (self.chapa, '1')])
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('itens', resposta.data)
+        self.assertEqual(len(self.itens_do_modulo()), 2)
+
+    def test_indice_e_custos_acompanham_a_edicao(self):
+        cola = self.produto('Cola', 'MP', '4')
+        self.editar(self.receita_modulo, [(self.chapa, '3'), (cola, '0.5')])
+
+        # Módulo: 3 x 10 + 0,5 x 4 = 32; Armário: 3 x 32 + 4 x 0,5 = 98
+        self.armario.refresh_from_db()
+        self.assertEqual(self.armario.custo_calculado, Decimal('98'))
+        alcance = dict(
+            AlcanceComposicao.objects.filter(ancestral=self.armario).values_list('descendente_id', 'quantidade')
+        )
+        self.assertEqual(alcance, {self.modulo.id: 3, self.chapa.id: 9, cola.id: Decimal('1.5'), self.parafuso.id: 4})
+        indice = sorted(AlcanceComposicao.objects.values_list('ancestral_id', 'descendente_id', 'caminhos', 'quantidade'))
+        reconstruir_alcance(self.empresa)
+        self.assertEqual(
+            indice, sorted(AlcanceComposicao.objects.values_list('ancestral_id', 'descendente_id', 'caminhos', 'quantidade'))
+        )
+
+
+class AlcanceTests(CatalogoTestCase):
+    """Índice de alcance (fecho transitivo) mantido pelas edições de receita."""
+
+    def indice(self):
+        return sorted(AlcanceComposicao.objects.values_list(
+            'ancestral_id', 'descendente_id', 'profundidade', 'caminhos', 'quantidade',
+        ))
+
+    def assertIndiceIgualAReconstrucao(self):
+        incremental = self.indice()
+        reconstruir_alcance(self.empresa)
+        self.assertEqual(incremental, self.indice())
+
+    def test_rejeita_receitas_circulares(self):
+        # Armário -> Módulo -> Gaveta
+        gaveta = self.produto('Gaveta', 'SB')
+        receita_gaveta = self.receita(gaveta, [(self.chapa, '1')])
+        self.assertEqual(self.editar(self.receita_modulo, [(self.chapa, '2'), (gaveta, '2')]).status_code, 200)
+
+        casos = [
+            ('o próprio produto', self.receita_modulo, [(self.modulo, '1')]),
+            ('ciclo direto', self.receita_modulo, [(self.armario, '1')]),
+            ('ciclo indireto', receita_gaveta, [(self.armario, '1')]),
+        ]
+        for nome, receita_id, itens in casos:
+            with self.subTest(nome):
+                antes = self.indice()
+                resposta = self.editar(receita_id, itens)
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn('circular', str(resposta.data['itens']))
+                self.assertEqual(self.indice(), antes)
+
+    def test_edicoes_batem_com_a_reconstrucao(self):
+        # Quantidade 3 x 2 = 6 chapas por armário, por um caminho
+        self.assertIn((self.armario.id, self.chapa.id, 2, 1, Decimal('6')), self.indice())
+        # Parafuso: direto (4) e pelo módulo (3 x 8)
+        self.assertIn((self.armario.id, self.parafuso.id, 1, 1, Decimal('4')), self.indice())
+        self.assertIn((self.armario.id, self.parafuso.id, 2, 1, Decimal('24')), self.indice())
+        self.assertIndiceIgualAReconstrucao()
+
+        edicoes = [
+            ('inclusão', self.receita_modulo, [(self.chapa, '2'), (self.parafuso, '8'), (self.produto('Cola', 'MP', '3'), '0.25')]),
+            ('quantidade', self.receita_modulo, [(self.chapa, '2.5'), (self.parafuso, '8')]),
+            ('remoção', self.receita_armario, [(self.modulo, '3')]),
+            ('nível acima', self.receita_armario, [(self.modulo, '1.3333'), (self.chapa, '1')]),
+        ]
+        for nome, receita_id, itens in edicoes:
+            with self.subTest(nome):
+                self.assertEqual(self.editar(receita_id, itens).status_code, 200)
+                self.assertIndiceIgualAReconstrucao()
+
+        # Apagar a receita tira todos os caminhos que passavam por ela
+        self.client.delete(f'/api/composicoes/{self.receita_modulo}/')
+        self.assertFalse(AlcanceComposicao.objects.filter(ancestral=self.modulo).exists())
+        self.assertIndiceIgualAReconstrucao()
+
+    def test_indice_desatualizado_falha_em_vez_de_gravar_negativo(self):
+        AlcanceComposicao.objects.all().delete()
+        with self.assertRaises(AlcanceInconsistente):
+            self.editar(self.receita_modulo, [(self.chapa, '2')])
+        # Nada foi gravado: a transação da edição foi desfeita
+        self.assertEqual(ItemComposicao.objects.filter(composicao_id=self.receita_modulo).count(), 2)
+
+    def test_onde_usado(self):
+        def onde_usado(produto, **parametros):
+            resposta = self.client.get(f'/api/produtos/{produto.id}/onde_usado/', parametros)
+            self.assertEqual(resposta.status_code, 200)
+            return [
+                (linha['codigo_sku'], linha['quantidade'], linha['profundidade_minima'], linha['profundidade_maxima'])
+                for linha in resposta.data
+            ]
+
+        # Parafuso: 4 direto no Armário + 3 x 8 pelo Módulo
+        self.assertEqual(onde_usado(self.parafuso), [('ARMÁRIO', '28', 1, 2), ('MÓDULO', '8', 1, 1)])
+        # Chapa: só indireta no Armário (3 x 2)
+        self.assertEqual(onde_usado(self.chapa), [('ARMÁRIO', '6', 2, 2), ('MÓDULO', '2', 1, 1)])
+        self.assertEqual(onde_usado(self.chapa, tipo='PA'), [('ARMÁRIO', '6', 2, 2)])
+        self.assertEqual(onde_usado(self.armario), [])
+
+        # Outra empresa não enxerga onde os produtos desta são usados
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        Empresa.objects.create(owner=outro, nome_fantasia='Outra')
+        self.client.force_authenticate(outro)
+        self.assertEqual(onde_usado(self.parafuso), [])
+
+    def test_trava_a_empresa_antes_da_checagem_de_ciclo(self):
+        chamadas = []
+
+        def registrar(nome, funcao):
+            def chamar(*args, **kwargs):
+                chamadas.append(nome)
+                return funcao(*args, **kwargs)
+            return chamar
+
+        with mock.patch('pricing.views.travar_receitas', registrar('trava', alcance.travar_receitas)), \
+                mock.patch('pricing.serializers.componentes_que_criam_ciclo',
+                           registrar('ciclo', alcance.componentes_que_criam_ciclo)), \
+                mock.patch('pricing.serializers.sincronizar_receita',
+                           registrar('indice', alcance.sincronizar_receita)):
+            self.assertEqual(self.editar(self.receita_modulo, [(self.chapa, '3')]).status_code, 200)
+            self.assertEqual(self.client.delete(f'/api/composicoes/{self.receita_armario}/').status_code, 204)
+
+        self.assertEqual(chamadas, ['trava', 'ciclo', 'indice', 'trava'])
+
+    def test_migracao_de_carga_bate_com_calcular_alcance(self):
+        migracao = importlib.import_module('pricing.migrations.0010_preencher_alcance')
+        itens = ItemComposicao.objects.values_list('composicao__produto_acabado_id', 'componente_id', 'quantidade')
+        esperado = calcular_alcance(GrafoComposicao.carregar(self.empresa))
+        self.assertEqual(
+            {a: dict(d) for a, d in migracao._calcular_alcance(itens).items() if d},
+            {a: dict(d) for a, d in esperado.items() if d},
+        )
+
+
+class ContribuicoesTests(CatalogoTestCase):
+    """Pareto dos itens no custo: gravado, mantido e consultado pela API."""
+
+    def pareto(self, produto):
+        return list(
+            ContribuicaoCusto.objects.filter(produto=produto).order_by('posicao')
+            .values_list('componente_id', 'quantidade', 'valor', 'percentual')
+        )
+
+    def test_contribuicoes_achatam_os_sub_produtos(self):
+        # Chapa: 3 x 2 = 6 x 10; Parafuso: 4 + 3 x 8 = 28 x 0,50
+        self.assertEqual(self.pareto(self.armario), [
+            (self.chapa.id, Decimal('6'), Decimal('60'), Decimal('81.08')),
+            (self.parafuso.id, Decimal('28'), Decimal('14'), Decimal('18.92')),
+        ])
+
+    def test_mudanca_de_preco_atualiza_os_ancestrais(self):
+        self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': '20'}, format='json')
+        # 120 de 134
+        self.assertEqual(self.pareto(self.armario)[0][2:], (Decimal('120'), Decimal('89.55')))
+        self.assertEqual(self.pareto(self.modulo)[0][2:], (Decimal('40'), Decimal('90.91')))
+
+    def test_recalculo_completo_atualiza_as_contribuicoes(self):
+        # Preço alterado direto no banco: só o recálculo completo percebe
+        Produto.objects.filter(pk=self.chapa.pk).update(preco_custo=Decimal('20'))
+        recalcular_custos_empresa(self.empresa)
+        self.assertEqual(self.pareto(self.armario)[0][2:], (Decimal('120'), Decimal('89.55')))
+
+    def test_atualizar_contribuicoes_so_dos_produtos_informados(self):
+        ContribuicaoCusto.objects.all().delete()
+        atualizar_contribuicoes([self.modulo.id])
+        self.assertEqual(set(ContribuicaoCusto.objects.values_list('produto_id', flat=True)), {self.modulo.id})
+        self.assertEqual(len(self.pareto(self.modulo)), 2)
+
+    def test_endpoint_pareto(self):
+        resposta = self.client.get('/api/produtos/pareto/', {'componente': self.chapa.id})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(
+            [(linha['produto'], linha['percentual']) for linha in resposta.data],
+            [(self.modulo.id, '83.33'), (self.armario.id, '81.08')],
+        )
+
+        resposta = self.client.get('/api/produtos/pareto/', {'percentual_min': '82', 'limite': '1'})
+        self.assertEqual([linha['produto'] for linha in resposta.data], [self.modulo.id])
+        # Limite fora da faixa vira 1..1000
+        self.assertEqual(len(self.client.get('/api/produtos/pareto/', {'limite': '-1'}).data), 1)
+
+        for parametros in ({'componente': 'abc'}, {'limite': 'x'}, {'percentual_min': 'y'}):
+            with self.subTest(parametros):
+                self.assertEqual(self.client.get('/api/produtos/pareto/', parametros).status_code, 400)
+
+    def test_pareto_nao_mostra_outras_empresas(self):
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        Empresa.objects.create(owner=outro, nome_fantasia='Outra')
+        self.client.force_authenticate(outro)
+        self.assertEqual(self.client.get('/api/produtos/pareto/').data, [])
+
+
+class HistoricoCustoTests(CatalogoTestCase):
+    """O histórico só ganha linha quando o preço ou o custo mudam, venha de onde vier a mudança."""
+
+    def custo_agora(self, produto):
+        return custo_na_data(produto.id, timezone.now()).custo_calculado
+
+    def test_edicao_sem_mudanca_de_custo_nao_grava(self):
+        antes = HistoricoCusto.objects.count()
+        self.client.patch(f'/api/composicoes/{self.receita_armario}/', {'descricao': 'Nova descrição'}, format='json')
+        self.client.patch(f'/api/produtos/{self.chapa.id}/', {'nome': 'Chapa MDF'}, format='json')
+        self.assertEqual(HistoricoCusto.objects.count(), antes)
+
+    def test_mudanca_de_preco_grava_so_quem_mudou(self):
+        antes = timezone.now()
+        self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': '20'}, format='json')
+        self.assertEqual(custo_na_data(self.armario.id, antes).custo_calculado, Decimal('74'))
+        self.assertEqual(self.custo_agora(self.armario), Decimal('134'))
+        # O parafuso não mudou: nenhuma linha nova para ele
+        self.assertFalse(HistoricoCusto.objects.filter(produto=self.parafuso, vigente_desde__gt=antes).exists())
+
+    def test_recalculo_completo_grava_historico(self):
+        Produto.objects.filter(pk=self.chapa.pk).update(preco_custo=Decimal('20'))
+        recalcular_custos_empresa(self.empresa)
+        self.assertEqual(self.custo_agora(self.armario), Decimal('134'))
+        self.assertEqual(self.custo_agora(self.chapa), Decimal('20'))
+
+
+class ConsultaHistoricoTests(CatalogoTestCase):
+    """Custo numa data: vale a última linha com vigente_desde <= data, antes e depois da compactação."""
+
+    def setUp(self):
+        super().setUp()
+        self.cola = self.produto('Cola', 'MP', '12')
+        HistoricoCusto.objects.filter(produto=self.cola).delete()
+        self.agora = timezone.now()
+        self.dias = {}
+        # 10 dias atrás: 10; 8: 10 (repetida); 6: 12; 4: 12 (repetida); 2: 12,50
+        for dias, preco in ((10, '10'), (8, '10'), (6, '12'), (4, '12'), (2, '12.5')):
+            self.dias[dias] = self.agora - timedelta(days=dias)
+            HistoricoCusto.objects.create(
+                empresa=self.empresa, produto=self.cola, preco_custo=Decimal(preco),
+                custo_calculado=Decimal(preco), vigente_desde=self.dias[dias],
+            )
+
+    def custo(self, data):
+        linha = custo_na_data(self.cola.id, data)
+        return linha and linha.custo_calculado
+
+    def test_custo_na_data(self):
+        self.assertIsNone(self.custo(self.dias[10] - timedelta(seconds=1)))
+        self.assertEqual(self.custo(self.dias[10]), Decimal('10'))
+        self.assertEqual(self.custo(self.dias[6] - timedelta(hours=1)), Decimal('10'))
+        self.assertEqual(self.custo(self.agora - timedelta(days=3)), Decimal('12'))
+        self.assertEqual(self.custo(self.agora), Decimal('12.5'))
+
+    def test_compactacao_mantem_as_linhas_de_fronteira(self):
+        datas = [self.agora - timedelta(days=dias, hours=horas) for dias in range(11) for horas in (0, 12)]
+        antes = [self.custo(data) for data in datas]
+
+        self.assertEqual(compactar_historico(self.empresa), 2)
+        restantes = list(
+            HistoricoCusto.objects.filter(produto=self.cola).order_by('vigente_desde').values_list('vigente_desde', flat=True)
+        )
+        self.assertEqual(restantes, [self.dias[10], self.dias[6], self.dias[2]])
+        self.assertEqual([self.custo(data) for data in datas], antes)
+        # Rodar de novo não tem o que compactar
+        self.assertEqual(compactar_historico(self.empresa), 0)
+
+    def test_endpoint_historico(self):
+        url = f'/api/produtos/{self.cola.id}/historico/'
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(
+            [linha['custo_calculado'] for linha in resposta.data],
+            ['12.5000', '12.0000', '12.0000', '10.0000', '10.0000'],
+        )
+
+        resposta = self.client.get(url, {'data': (self.dias[6] - timedelta(hours=1)).isoformat()})
+        self.assertEqual((resposta.status_code, resposta.data['custo_calculado']), (200, '10.0000'))
+        self.assertEqual(self.client.get(url, {'data': (self.dias[10] - timedelta(days=1)).date().isoformat()}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'data': '31/12/2024'}).status_code, 400)
+
+    def test_endpoint_custos_na_data(self):
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        outra_empresa = Empresa.objects.create(owner=outro, nome_fantasia='Outra')
+        alheio = Produto.objects.create(
+            empresa=outra_empresa, nome='Alheio', codigo_sku='ALHEIO', tipo='MP', unidade_medida='un',
+        )
+        HistoricoCusto.objects.create(
+            empresa=outra_empresa, produto=alheio, preco_custo=Decimal('1'),
+            custo_calculado=Decimal('1'), vigente_desde=self.dias[10],
+        )
+
+        # Os outros produtos só têm histórico a partir de agora: ficam de fora
+        resposta = self.client.get('/api/produtos/custos_na_data/', {'data': (self.dias[4] + timedelta(hours=1)).isoformat()})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(
+            [(produto['codigo_sku'], produto['custo_calculado']) for produto in resposta.data],
+            [('COLA', '12.0000')],
+        )
+        self.assertEqual(self.client.get('/api/produtos/custos_na_data/').status_code, 400)
+
+        # Produto de outra empresa
+        self.assertEqual(self.client.get(f'/api/produtos/{alheio.id}/historico/').status_code, 404)
+
+
+class CustosVetorizadosTests(CatalogoTestCase):
+    """O modo lote tem de dar exatamente o mesmo custo do cálculo em Decimal."""
+
+    def assertIgualAoDecimal(self):
+        vetorizado = calcular_custos_empresa_vetorizado(self.empresa)
+        self.assertEqual(vetorizado, calcular_custos_empresa(self.empresa))
+        return vetorizado
+
+    def test_meio_exato_arredonda_como_o_decimal(self):
+        # 4,47 x 9,485 = 42,39795: em float dá 42,3979
+        peca = self.produto('Peça', 'MP', '4.47')
+        kit = self.produto('Kit', 'PA')
+        self.receita(kit, [(peca, '9.485')])
+        self.assertEqual(self.assertIgualAoDecimal()[kit.id], Decimal('42.3980'))
+
+    def test_catalogo_aleatorio(self):
+        rng = random.Random(7)
+        abaixo = [self.produto(f'MP {i}', 'MP', str(Decimal(rng.randint(1, 999_999)) / 10_000)) for i in range(30)]
+        for nivel in range(4):
+            camada = []
+            for i in range(10):
+                produto = self.produto(f'SB {nivel}.{i}', 'SB')
+                composicao = Composicao.objects.create(
+                    empresa=self.empresa, produto_acabado=produto,
+                    custo_adicional_fixo=Decimal(rng.randint(0, 9_999)) / 100,
+                )
+                ItemComposicao.objects.bulk_create([
+                    ItemComposicao(
+                        composicao=composicao, componente=componente,
+                        quantidade=Decimal(rng.randint(1, 99_999)) / 10_000,
+                    )
+                    for componente in rng.sample(abaixo, 5)
+                ])
+                camada.append(produto)
+            abaixo += camada
+        self.assertIgualAoDecimal()
+
+    def test_valores_fora_do_int64_usam_o_decimal(self):
+        caro = self.produto('Caro', 'MP', '999999.9999')
+        lote = self.produto('Lote', 'SB')
+        palete = self.produto('Palete', 'PA')
+        # Direto no banco: o custo do palete nem caberia no custo_calculado
+        for produto, componente in ((lote, caro), (palete, lote)):
+            composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=produto)
+            ItemComposicao.objects.create(composicao=composicao, componente=componente, quantidade=Decimal('999999.9999'))
+        self.assertEqual(self.assertIgualAoDecimal()[self.armario.id], Decimal('74'))
+
+    def test_recalculo_vetorizado_nao_muda_o_que_o_decimal_gravou(self):
+        peca = self.produto('Peça', 'MP', '4.47')
+        self.receita(self.produto('Kit', 'PA'), [(peca, '9.485')])
+        self.assertEqual(recalcular_custos_empresa(self.empresa, vetorizado=True), {})
+
+
+class ImportacaoProdutosTests(CatalogoTestCase):
+    """Importação em massa: upsert pelo SKU, relatório de erros e a propagação só no fim (em lotes)."""
+
+    def importar(self, nome, conteudo):
+        arquivo = SimpleUploadedFile(nome, conteudo.encode('utf-8'))
+        return self.client.post('/api/produtos/importar/', {'arquivo': arquivo}, format='multipart')
+
+    def test_csv_atualiza_pelo_sku_e_cria_os_novos(self):
+        resposta = self.importar('catalogo.csv', (
+            "nome;codigo_sku;tipo;unidade_medida;preco_custo\n"
+            "Chapa MDF;CHAPA;MP;m2;12,00\n"
+            "Cola;COLA;MP;kg;4.5\n"
+            "Sem tipo;ST;XX;un;1\n"
+            "Preço ruim;PR;MP;un;abc\n"
+            "Cola de novo;COLA;MP;kg;5\n"
+            ";SN;MP;un;1\n"
+        ))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual((resposta.data['criados'], resposta.data['atualizados']), (1, 1))
+        self.assertEqual(
+            {erro['linha']: set(erro['erros']) for erro in resposta.data['erros']},
+            {3: {'tipo'}, 4: {'preco_custo'}, 5: {'codigo_sku'}, 6: {'nome'}},
+        )
+
+        self.chapa.refresh_from_db()
+        self.assertEqual((self.chapa.nome, self.chapa.preco_custo), ('Chapa MDF', Decimal('12')))
+        self.assertEqual(Produto.objects.get(codigo_sku='COLA').custo_calculado, Decimal('4.5'))
+        self.assertFalse(Produto.objects.filter(codigo_sku__in=['ST', 'PR', 'SN']).exists())
+        # Módulo: 2 x 12 + 8 x 0,5 = 28; Armário: 3 x 28 + 4 x 0,5 = 86
+        self.armario.refresh_from_db()
+        self.assertEqual(self.armario.custo_calculado, Decimal('86'))
+
+    def test_jsonl_com_linhas_invalidas(self):
+        resposta = self.importar('catalogo.jsonl', (
+            '{"nome": "Parafuso", "codigo_sku": "PARAFUSO", "tipo": "MP", "unidade_medida": "un", "preco_custo": "0.75"}\n'
+            '\n'
+            '{"nome": "Quebrado"\n'
+            '{"nome": "Verniz", "codigo_sku": "VERNIZ", "tipo": "MP", "unidade_medida": "l", "is_active": "talvez"}\n'
+        ))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual((resposta.data['criados'], resposta.data['atualizados']), (0, 1))
+        # A linha em branco conta na numeração
+        self.assertEqual([(erro['linha'], list(erro['erros'])) for erro in resposta.data['erros']], [
+            (3, ['linha']), (4, ['is_active']),
+        ])
+        # Módulo: 2 x 10 + 8 x 0,75 = 26; Armário: 3 x 26 + 4 x 0,75 = 81
+        self.armario.refresh_from_db()
+        self.assertEqual(self.armario.custo_calculado, Decimal('81'))
+
+    def test_uma_propagacao_para_o_arquivo_inteiro(self):
+        linhas = [
+            {'nome': nome, 'codigo_sku': nome.upper(), 'tipo': 'MP', 'unidade_medida': 'un', 'preco_custo': preco}
+            for nome, preco in (('Chapa', '11'), ('Parafuso', '0.5'), ('Cola', '2'), ('Verniz', '3'), ('Lixa', '1'))
+        ]
+        with mock.patch('pricing.importacao.propagar_custos', wraps=propagar_custos) as propagar:
+            relatorio = importar_produtos(self.empresa, iter(linhas), tamanho_lote=2)
+        self.assertEqual((relatorio['criados'], relatorio['atualizados'], relatorio['erros']), (3, 2, []))
+        # Só a chapa mudou de preço
+        propagar.assert_called_once_with([self.chapa.id])
+
+    def test_propaga_em_lotes_e_historico_so_dos_skus_do_arquivo(self):
+        # Criado por outra tela durante a importação: não é desta importação
+        concorrente = self.produto('Concorrente', 'MP', '1')
+        Produto.objects.filter(pk=concorrente.pk).update(created_at=timezone.now() + timedelta(minutes=1))
+        HistoricoCusto.objects.filter(produto=concorrente).delete()
+
+        linhas = [
+            {'nome': nome, 'codigo_sku': nome.upper(), 'tipo': 'MP', 'unidade_medida': 'un', 'preco_custo': preco}
+            for nome, preco in (('Chapa', '11'), ('Parafuso', '1'), ('Cola', '2'))
+        ]
+        with mock.patch('pricing.importacao.propagar_custos', wraps=propagar_custos) as propagar:
+            importar_produtos(self.empresa, iter(linhas), tamanho_lote=1)
+        self.assertEqual(propagar.call_args_list, [mock.call([self.chapa.id]), mock.call([self.parafuso.id])])
+        # Módulo: 2 x 11 + 8 x 1 = 30; Armário: 3 x 30 + 4 x 1 = 94
+        self.assertEqual(Produto.objects.get(pk=self.armario.pk).custo_calculado, Decimal('94'))
+
+        self.assertTrue(HistoricoCusto.objects.filter(produto__codigo_sku='COLA').exists())
+        self.assertFalse(HistoricoCusto.objects.filter(produto=concorrente).exists())
+
+
+class AutocompleteTests(CatalogoTestCase):
+    """Busca do editor de receitas: prefixo fora do PostgreSQL, prioridades e só a empresa do usuário."""
+
+    def buscar(self, termo, **filtros):
+        resposta = self.client.get('/api/produtos/autocomplete/', {'q': termo, **filtros})
+        self.assertEqual(resposta.status_code, 200)
+        return [produto['nome'] for produto in resposta.data]
+
+    def test_sku_identico_antes_dos_nomes(self):
+        self.produto('Modelo', 'MP')
+        tampo = self.produto('Tampo', 'MP')
+        Produto.objects.filter(pk=tampo.pk).update(codigo_sku='MOD')
+        self.assertEqual(self.buscar('mod'), ['Tampo', 'Modelo'])
+
+    def test_filtros(self):
+        self.produto('Parafuso sextavado', 'SV')
+        inativo = self.produto('Parafuso velho', 'MP')
+        Produto.objects.filter(pk=inativo.pk).update(is_active=False)
+        self.assertEqual(self.buscar('parafuso'), ['Parafuso', 'Parafuso sextavado'])
+        self.assertEqual(self.buscar('parafuso', tipo='SV'), ['Parafuso sextavado'])
+        self.assertEqual(self.buscar('   '), [])
+
+    @skipIf(connection.vendor == 'postgresql', "No PostgreSQL a busca usa trigramas")
+    def test_fora_do_postgresql_busca_por_prefixo(self):
+        self.assertEqual(self.buscar('cha'), ['Chapa'])
+        self.assertEqual(self.buscar('PARAF'), ['Parafuso'])
+        # "Contém" só no PostgreSQL
+        self.assertEqual(self.buscar('hapa'), [])
+
+    def test_so_produtos_da_empresa_do_usuario(self):
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        outra_empresa = Empresa.objects.create(owner=outro, nome_fantasia='Outra Empresa')
+        Produto.objects.create(
+            empresa=outra_empresa, nome='Chapa de aço', codigo_sku='CHAPA', tipo='MP', unidade_medida='un',
+        )
+        self.assertEqual(self.buscar('chapa'), ['Chapa'])
+
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            username='sem-empresa', email='sem@teste.com', password='x',
+        ))
+        self.assertEqual(self.buscar('chapa'), [])
+
+
+class ListaProdutosTests(CatalogoTestCase):
+    """Lista de produtos: páginas por cursor em ordem (nome, id) e os filtros da listagem."""
+
+    def nomes(self, **parametros):
+        resposta = self.client.get('/api/produtos/', parametros)
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        return [produto['nome'] for produto in resposta.data['results']]
+
+    def test_cursor_percorre_em_ordem_de_nome_e_id(self):
+        # Nomes repetidos: o desempate é pelo id
+        for sku in ('B1', 'B2', 'B3'):
+            Produto.objects.create(empresa=self.empresa, nome='Bucha', codigo_sku=sku, tipo='MP', unidade_medida='un')
+        self.produto('Arruela', 'MP')
+        esperado = list(Produto.objects.filter(empresa=self.empresa).order_by('nome', 'id').values_list('id', flat=True))
+
+        paginas, url = [], '/api/produtos/?page_size=3'
+        while url:
+            resposta = self.client.get(url)
+            paginas.append(resposta.data)
+            url = resposta.data['next']
+        self.assertEqual([len(pagina['results']) for pagina in paginas], [3, 3, 2])
+        self.assertEqual([produto['id'] for pagina in paginas for produto in pagina['results']], esperado)
+
+        # 'previous' da última página volta exatamente para a do meio
+        self.assertIsNone(paginas[0]['previous'])
+        anterior = self.client.get(paginas[2]['previous']).data
+        self.assertEqual(anterior['results'], paginas[1]['results'])
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get('/api/produtos/', {'cursor': 'nao-e-um-cursor'}).status_code, 404)
+
+    def test_filtros(self):
+        inativo = self.produto('Chapa velha', 'MP')
+        Produto.objects.filter(pk=inativo.pk).update(is_active=False)
+        Produto.objects.filter(pk=self.chapa.pk).update(updated_at=timezone.now() - timedelta(days=10))
+
+        self.assertEqual(self.nomes(tipo='SB'), ['Módulo'])
+        self.assertEqual(self.nomes(is_active='false'), ['Chapa velha'])
+        self.assertEqual(self.nomes(q='chapa', is_active='true'), ['Chapa'])
+        self.assertEqual(self.nomes(q='PARAF'), ['Parafuso'])
+        ontem = (timezone.localdate() - timedelta(days=1)).isoformat()
+        self.assertEqual(self.nomes(updated_ate=ontem), ['Chapa'])
+        self.assertNotIn('Chapa', self.nomes(updated_desde=ontem))
+
+    def test_filtros_invalidos(self):
+        for parametros in ({'is_active': 'talvez'}, {'updated_desde': '31/12/2024'}):
+            resposta = self.client.get('/api/produtos/', parametros)
+            self.assertEqual(resposta.status_code, 400)
+            self.assertIn(next(iter(parametros)), resposta.data)
+
+
+class SimulacaoTests(CatalogoTestCase):
+    """Simulação de preços: só os afetados, sem gravar, com o grafo em cache por versão do catálogo."""
+
+    def setUp(self):
+        super().setUp()
+        simulacao._grafos_em_cache.clear()
+
+    def simular(self, cenario):
+        resposta = self.client.post('/api/produtos/simular/', cenario, format='json')
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        return {produto['codigo_sku']: produto['custo_simulado'] for produto in resposta.data['produtos']}
+
+    def test_reajuste_e_preco_pontual(self):
+        # Parafuso 1,00: Módulo 2 x 10 + 8 x 1 = 28; Armário 3 x 28 + 4 x 1 = 88
+        self.assertEqual(
+            self.simular({'precos': [{'codigo_sku': 'PARAFUSO', 'preco_custo': '1'}]}),
+            {'ARMÁRIO': '88.0000', 'MÓDULO': '28.0000', 'PARAFUSO': '1.0000'},
+        )
+        # +10% nas MPs, mas o preço pontual da Chapa tem a palavra final
+        self.assertEqual(
+            self.simular({
+                'reajustes': [{'percentual': '10', 'tipo': 'MP'}],
+                'precos': [{'produto': self.chapa.id, 'preco_custo': '12'}],
+                'tipo': 'PA',
+            }),
+            {'ARMÁRIO': '87.4000'},  # Módulo 2 x 12 + 8 x 0,55 = 28,40; 3 x 28,40 + 4 x 0,55
+        )
+        # Nada foi gravado
+        self.assertEqual(Produto.objects.get(pk=self.armario.id).custo_calculado, Decimal('74'))
+
+    def test_produto_de_outra_empresa(self):
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        alheio = Produto.objects.create(
+            empresa=Empresa.objects.create(owner=outro, nome_fantasia='Outra'),
+            nome='Alheio', codigo_sku='ALHEIO', tipo='MP', unidade_medida='un',
+        )
+        resposta = self.client.post(
+            '/api/produtos/simular/', {'precos': [{'produto': alheio.id, 'preco_custo': '1'}]}, format='json',
+        )
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_edicao_de_item_invalida_o_cache(self):
+        cenario = {'precos': [{'codigo_sku': 'CHAPA', 'preco_custo': '20'}], 'tipo': 'PA'}
+        # 3 x (2 x 20 + 4) + 2
+        self.assertEqual(self.simular(cenario), {'ARMÁRIO': '134.0000'})
+        grafo, _ = simulacao.grafo_em_cache(self.empresa.id)
+        self.assertIs(simulacao.grafo_em_cache(self.empresa.id)[0], grafo)
+
+        # Só o item muda (sem tocar no updated_at da receita nem do produto)
+        ItemComposicao.objects.filter(composicao_id=self.receita_modulo, componente=self.chapa).update(quantidade=3)
+        self.assertIsNot(simulacao.grafo_em_cache(self.empresa.id)[0], grafo)
+        # 3 x (3 x 20 + 4) + 2
+        self.assertEqual(self.simular(cenario), {'ARMÁRIO': '194.0000'})
+
+
+class ExplosaoTests(CatalogoTestCase):
+    """Explosão de receitas: quantidades multiplicadas por nível e somadas por item folha."""
+
+    def itens(self, resposta):
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        return [(item['codigo_sku'], item['quantidade'], item['custo_total']) for item in resposta.data['itens']]
+
+    def test_explosao_de_um_produto(self):
+        resposta = self.client.get(f'/api/produtos/{self.armario.id}/explosao/', {'quantidade': '2'})
+        # Parafuso por dois caminhos: 2 x 4 direto + 2 x 3 x 8 pelo Módulo
+        self.assertEqual(self.itens(resposta), [('CHAPA', '12', '120.00'), ('PARAFUSO', '56', '28.00')])
+        self.assertEqual(resposta.data['custo_total'], '148.00')
+
+        for quantidade in ('abc', '0', '-1'):
+            with self.subTest(quantidade=quantidade):
+                resposta = self.client.get(f'/api/produtos/{self.armario.id}/explosao/', {'quantidade': quantidade})
+                self.assertEqual(resposta.status_code, 400)
+
+    def test_plano_soma_os_itens_repetidos(self):
+        resposta = self.client.post('/api/produtos/explosao_plano/', {'itens': [
+            {'produto': self.armario.id, 'quantidade': '1'},
+            {'produto': self.modulo.id, 'quantidade': '2'},
+            {'produto': self.armario.id, 'quantidade': '1'},
+        ]}, format='json')
+        # Armário x 2 (12 chapas, 56 parafusos) + Módulo x 2 (4 chapas, 16 parafusos)
+        self.assertEqual(self.itens(resposta), [('CHAPA', '16', '160.00'), ('PARAFUSO', '72', '36.00')])
+        self.assertEqual(resposta.data['custo_total'], '196.00')
+
+    def test_produtos_de_outra_empresa(self):
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        alheio = Produto.objects.create(
+            empresa=Empresa.objects.create(owner=outro, nome_fantasia='Outra'),
+            nome='Alheio', codigo_sku='ALHEIO', tipo='PA', unidade_medida='un',
+        )
+        self.assertEqual(self.client.get(f'/api/produtos/{alheio.id}/explosao/').status_code, 404)
+
+        resposta = self.client.post('/api/produtos/explosao_plano/', {'itens': [
+            {'produto': self.armario.id, 'quantidade': '1'},
+            {'produto': alheio.id, 'quantidade': '1'},
+        ]}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn(str(alheio.id), resposta.data['error'])
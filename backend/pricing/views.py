@@ -1,7 +1,51 @@
 # Em backend/pricing/views.py
-from rest_framework import viewsets, permissions
-from .models import Produto, Composicao
-from .serializers import ProdutoSerializer, ComposicaoSerializer
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Sum, Min, Max, Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from users.tenancy import get_empresa
+from .models import Produto, Composicao, ItemComposicao, AlcanceComposicao, ContribuicaoCusto
+from .serializers import (
+    ProdutoSerializer, ComposicaoSerializer, ContribuicaoCustoSerializer,
+    PlanoProducaoSerializer, SimulacaoSerializer,
+)
+from .custos import arredondar_custo, calcular_custos_empresa, propagar_custos
+from .alcance import atualizar_alcance, travar_receitas
+from .busca import buscar_produtos
+from .importacao import ler_arquivo, importar_produtos
+from .paginacao import NomeIdCursorPagination
+from .explosao import explodir_empresa
+from .historico import registrar_historico, custo_na_data, catalogo_na_data
+from .simulacao import grafo_em_cache, simular, aplicar_reajuste
+from .grafo import GrafoComposicao, CicloNaComposicao
+
+def _ler_data(valor, fim_do_dia=True):
+    """
+    Converte ?data= em datetime com fuso. Só a data (AAAA-MM-DD) vale
+    como o FIM daquele dia (ou o começo, com fim_do_dia=False).
+    Retorna None se o valor for inválido.
+    """
+    try:
+        data_hora = parse_datetime(valor)
+        if data_hora is None:
+            dia = parse_date(valor)
+            if dia is None:
+                return None
+            data_hora = datetime.combine(dia, time.max if fim_do_dia else time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(data_hora):
+        data_hora = timezone.make_aware(data_hora)
+    return data_hora
+
 
 class ProdutoViewSet(viewsets.ModelViewSet):
     """
@@ -9,28 +53,76 @@ class ProdutoViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ProdutoSerializer
     permission_classes = [permissions.IsAuthenticated] # Só usuários logados
+    pagination_class = NomeIdCursorPagination # Lista paginada por (nome, id)
 
     def get_queryset(self):
         """
         Filtra a lista de produtos para mostrar APENAS
         os que pertencem à empresa do usuário logado.
         """
-        # Busca a primeira empresa ligada ao usuário
-        empresa = self.request.user.owned_empresas.first()
+        # Empresa do usuário logado (resolvida uma vez por request)
+        empresa = get_empresa(self.request)
         if not empresa:
             # Se não tem empresa, não retorna nada
             return Produto.objects.none()
         
         # Retorna só os produtos desta empresa
-        return Produto.objects.filter(empresa=empresa)
+        produtos = Produto.objects.filter(empresa=empresa)
+        if self.action == 'list':
+            produtos = self.filtrar_lista(produtos)
+        return produtos
+
+    def filtrar_lista(self, produtos):
+        """
+        Filtros da listagem: ?q= (nome contém ou SKU começa com),
+        ?tipo=MP, ?is_active=true/false e o intervalo ?updated_desde= /
+        ?updated_ate= (data ou data/hora ISO).
+        """
+        parametros = self.request.query_params
+        termo = parametros.get('q', '').strip()
+        if termo:
+            produtos = produtos.filter(Q(nome__icontains=termo) | Q(codigo_sku__istartswith=termo))
+        if parametros.get('tipo'):
+            produtos = produtos.filter(tipo=parametros['tipo'])
+        if parametros.get('is_active'):
+            ativo = parametros['is_active'].lower()
+            if ativo not in ('true', 'false', '1', '0'):
+                raise ValidationError({'is_active': "Use true ou false."})
+            produtos = produtos.filter(is_active=ativo in ('true', '1'))
+        for parametro, filtro, fim_do_dia in (
+            ('updated_desde', 'updated_at__gte', False),
+            ('updated_ate', 'updated_at__lte', True),
+        ):
+            if parametros.get(parametro):
+                data = _ler_data(parametros[parametro], fim_do_dia=fim_do_dia)
+                if data is None:
+                    raise ValidationError({parametro: "Data inválida."})
+                produtos = produtos.filter(**{filtro: data})
+        return produtos
 
     def perform_create(self, serializer):
         """
         Ao salvar um novo produto (POST), preenche automaticamente
         o campo 'empresa' com a empresa do usuário logado.
         """
-        empresa = self.request.user.owned_empresas.first()
-        serializer.save(empresa=empresa)
+        empresa = get_empresa(self.request)
+        # Um produto recém-criado ainda não tem receita:
+        # o custo calculado é o próprio preço de custo.
+        preco_custo = serializer.validated_data.get('preco_custo', 0)
+        with transaction.atomic():
+            produto = serializer.save(empresa=empresa, custo_calculado=preco_custo)
+            registrar_historico([produto.id])
+
+    def perform_update(self, serializer):
+        """
+        Se o preço de custo mudou, atualiza o custo calculado deste
+        produto e de todas as receitas que o usam.
+        """
+        preco_anterior = serializer.instance.preco_custo
+        with transaction.atomic():
+            produto = serializer.save()
+            if produto.preco_custo != preco_anterior:
+                propagar_custos([produto.id])
 
     def get_serializer_context(self):
         """
@@ -40,6 +132,332 @@ class ProdutoViewSet(viewsets.ModelViewSet):
         """
         return {'request': self.request}
 
+    @action(detail=False, methods=['get'])
+    def custos(self, request):
+        """
+        Calcula o custo unitário de todos os produtos da empresa,
+        resolvendo os sub-produtos (SB) em qualquer profundidade.
+        """
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response({})
+
+        try:
+            custos = calcular_custos_empresa(empresa)
+        except CicloNaComposicao as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({produto_id: str(custo) for produto_id, custo in custos.items()})
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Busca rápida por nome ou SKU para o editor de receitas:
+        ?q=parafu (obrigatório) e ?tipo=MP (opcional). Até 20 produtos ativos.
+        """
+        empresa = get_empresa(request)
+        termo = request.query_params.get('q', '')
+        if not empresa or not termo.strip():
+            return Response([])
+
+        produtos = buscar_produtos(empresa, termo, tipo=request.query_params.get('tipo'))
+        return Response([
+            {**produto, 'custo_calculado': str(produto['custo_calculado'])}
+            for produto in produtos
+        ])
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Importação em massa (CSV ou JSONL) no campo 'arquivo'.
+        Cria os SKUs novos e atualiza os existentes; devolve um
+        relatório com os erros de cada linha rejeitada.
+
+        Colunas: nome, codigo_sku, tipo, unidade_medida, preco_custo, is_active
+        """
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response({'error': 'Usuário não tem empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        arquivo = request.FILES.get('arquivo')
+        if not arquivo:
+            return Response({'error': "Envie o arquivo no campo 'arquivo'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        formato = request.data.get('formato') or ('jsonl' if arquivo.name.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+        try:
+            linhas = ler_arquivo(arquivo.file, formato)
+            relatorio = importar_produtos(empresa, linhas)
+        except (ValueError, UnicodeDecodeError) as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(relatorio)
+
+    @action(detail=True, methods=['get'])
+    def onde_usado(self, request, pk=None):
+        """
+        Lista os produtos que usam este item em QUALQUER nível da receita,
+        com a quantidade total consumida por unidade de cada um.
+        Filtro opcional: ?tipo=PA (só produtos acabados, por exemplo).
+
+        Uma única query no índice de alcance.
+        """
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response([])
+
+        alcance = AlcanceComposicao.objects.filter(empresa=empresa, descendente_id=pk)
+        tipo = request.query_params.get('tipo')
+        if tipo:
+            alcance = alcance.filter(ancestral__tipo=tipo)
+
+        linhas = (
+            alcance.values(
+                'ancestral_id', 'ancestral__nome', 'ancestral__codigo_sku',
+                'ancestral__tipo', 'ancestral__unidade_medida',
+            )
+            .annotate(
+                quantidade=Sum('quantidade'),
+                profundidade_minima=Min('profundidade'),
+                profundidade_maxima=Max('profundidade'),
+            )
+            .order_by('ancestral__nome', 'ancestral_id')
+        )
+        return Response([
+            {
+                'id': linha['ancestral_id'],
+                'nome': linha['ancestral__nome'],
+                'codigo_sku': linha['ancestral__codigo_sku'],
+                'tipo': linha['ancestral__tipo'],
+                'unidade_medida': linha['ancestral__unidade_medida'],
+                'quantidade': f"{linha['quantidade'].normalize():f}",
+                'profundidade_minima': linha['profundidade_minima'],
+                'profundidade_maxima': linha['profundidade_maxima'],
+            }
+            for linha in linhas
+        ])
+
+    @action(detail=True, methods=['get'])
+    def contribuicoes(self, request, pk=None):
+        """
+        Os itens (MP, SV...) que mais pesam no custo deste produto,
+        já com os sub-produtos "achatados", do maior para o menor.
+        """
+        contribuicoes = (
+            ContribuicaoCusto.objects.filter(produto=self.get_object())
+            .select_related('produto', 'componente')
+            .order_by('posicao')
+        )
+        return Response(ContribuicaoCustoSerializer(contribuicoes, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def pareto(self, request):
+        """
+        Produtos ordenados pelo peso de um item no custo.
+        Filtros: ?componente=<id> ou ?componente_sku=, ?percentual_min=40,
+        ?tipo=PA e ?limite= (padrão 100, máximo 1000).
+        """
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response([])
+
+        contribuicoes = ContribuicaoCusto.objects.filter(empresa=empresa)
+        parametros = request.query_params
+        if parametros.get('componente_sku'):
+            contribuicoes = contribuicoes.filter(componente__codigo_sku=parametros['componente_sku'])
+        if parametros.get('tipo'):
+            contribuicoes = contribuicoes.filter(produto__tipo=parametros['tipo'])
+        try:
+            if parametros.get('componente'):
+                contribuicoes = contribuicoes.filter(componente_id=int(parametros['componente']))
+            if parametros.get('percentual_min'):
+                contribuicoes = contribuicoes.filter(percentual__gte=Decimal(parametros['percentual_min']))
+            limite = max(1, min(int(parametros.get('limite', 100)), 1000))
+        except (InvalidOperation, ValueError):
+            return Response({'error': 'Filtro inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        contribuicoes = (
+            contribuicoes.select_related('produto', 'componente')
+            .order_by('-percentual', 'produto_id', 'componente_id')[:limite]
+        )
+        return Response(ContribuicaoCustoSerializer(contribuicoes, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def historico(self, request, pk=None):
+        """
+        Histórico de custos do produto. Com ?data= (AAAA-MM-DD ou data/hora
+        ISO) devolve só a linha vigente naquele momento.
+        """
+        produto = self.get_object()
+        if 'data' not in request.query_params:
+            linhas = produto.historico_custos.order_by('-vigente_desde', '-id')
+            return Response([self._linha_historico(linha) for linha in linhas])
+
+        data = _ler_data(request.query_params['data'])
+        if data is None:
+            return Response({'error': 'Data inválida.'}, status=status.HTTP_400_BAD_REQUEST)
+        linha = custo_na_data(produto.id, data)
+        if linha is None:
+            return Response({'error': 'Sem custo registrado até esta data.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._linha_historico(linha))
+
+    @action(detail=False, methods=['get'])
+    def custos_na_data(self, request):
+        """Catálogo inteiro com o preço e o custo vigentes em ?data= (uma query)."""
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response([])
+
+        data = _ler_data(request.query_params.get('data', ''))
+        if data is None:
+            return Response({'error': 'Informe uma data válida em ?data='}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([
+            {
+                'id': produto['id'],
+                'nome': produto['nome'],
+                'codigo_sku': produto['codigo_sku'],
+                'tipo': produto['tipo'],
+                'preco_custo': str(arredondar_custo(produto['preco_na_data'])),
+                'custo_calculado': str(arredondar_custo(produto['custo_na_data'])),
+            }
+            for produto in catalogo_na_data(empresa, data)
+        ])
+
+    def _linha_historico(self, linha):
+        return {
+            'vigente_desde': linha.vigente_desde,
+            'preco_custo': str(linha.preco_custo),
+            'custo_calculado': str(linha.custo_calculado),
+        }
+
+    @action(detail=True, methods=['get'])
+    def explosao(self, request, pk=None):
+        """
+        Explode a receita deste produto: quanto de cada matéria-prima
+        e serviço é preciso para produzir ?quantidade= unidades (padrão 1).
+        """
+        produto = self.get_object()
+        try:
+            quantidade = Decimal(request.query_params.get('quantidade', '1'))
+        except InvalidOperation:
+            return Response({'error': 'Quantidade inválida.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not quantidade.is_finite() or quantidade <= 0:
+            return Response({'error': 'A quantidade deve ser maior que zero.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return self._responder_explosao(produto.empresa_id, {produto.id: quantidade})
+
+    @action(detail=False, methods=['post'])
+    def explosao_plano(self, request):
+        """
+        Explode um plano de produção inteiro numa chamada só.
+        Corpo: {"itens": [{"produto": 1, "quantidade": "10"}, ...]}
+
+        Produtos repetidos no plano têm as quantidades somadas.
+        """
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response({'error': 'Usuário não tem empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = PlanoProducaoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        demandas = defaultdict(Decimal)
+        for item in serializer.validated_data['itens']:
+            demandas[item['produto']] += item['quantidade']
+
+        return self._responder_explosao(empresa.id, demandas)
+
+    @action(detail=False, methods=['post'])
+    def simular(self, request):
+        """
+        Simula novos preços de custo SEM gravar nada e devolve o novo
+        custo unitário de todo produto afetado (e a diferença).
+
+        Corpo (exemplo):
+            {"reajustes": [{"percentual": "12", "tipo": "MP", "codigo_sku_prefixo": "ACO-"}],
+             "precos": [{"codigo_sku": "PARAF-10", "preco_custo": "0.35"}],
+             "tipo": "PA"}
+        """
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response({'error': 'Usuário não tem empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = SimulacaoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cenario = serializer.validated_data
+        grafo, custos = grafo_em_cache(empresa.id)
+        produtos = Produto.objects.filter(empresa=empresa)
+
+        precos_novos = {}
+        for reajuste in cenario.get('reajustes', []):
+            selecionados = produtos
+            if 'tipo' in reajuste:
+                selecionados = selecionados.filter(tipo=reajuste['tipo'])
+            if 'codigo_sku_prefixo' in reajuste:
+                selecionados = selecionados.filter(codigo_sku__startswith=reajuste['codigo_sku_prefixo'])
+            if 'produtos' in reajuste:
+                selecionados = selecionados.filter(id__in=reajuste['produtos'])
+            ids = selecionados.values_list('id', flat=True)
+            precos_novos.update(aplicar_reajuste(grafo, ids, reajuste['percentual']))
+
+        precos = cenario.get('precos', [])
+        skus = {preco['codigo_sku'] for preco in precos if not preco.get('produto')}
+        ids_por_sku = dict(produtos.filter(codigo_sku__in=skus).values_list('codigo_sku', 'id')) if skus else {}
+        desconhecidos = sorted(skus - set(ids_por_sku))
+        desconhecidos += sorted(
+            preco['produto'] for preco in precos if preco.get('produto') and preco['produto'] not in grafo.precos
+        )
+        if desconhecidos:
+            return Response(
+                {'error': f"Produtos não encontrados na sua empresa: {desconhecidos}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        for preco in precos:
+            produto_id = preco.get('produto') or ids_por_sku[preco['codigo_sku']]
+            precos_novos[produto_id] = preco['preco_custo']
+
+        try:
+            simulados = simular(grafo, custos, precos_novos)
+        except CicloNaComposicao as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
+        alterados = {produto_id: custo for produto_id, custo in simulados.items() if custo != custos.get(produto_id)}
+        detalhes = produtos.filter(id__in=alterados)
+        if 'tipo' in cenario:
+            detalhes = detalhes.filter(tipo=cenario['tipo'])
+
+        resultado = []
+        for produto in detalhes.values('id', 'nome', 'codigo_sku', 'tipo').order_by('nome', 'id'):
+            custo_atual, custo_simulado = custos[produto['id']], alterados[produto['id']]
+            diferenca = custo_simulado - custo_atual
+            resultado.append({
+                **produto,
+                'custo_atual': str(custo_atual),
+                'custo_simulado': str(custo_simulado),
+                'diferenca': str(diferenca),
+                'diferenca_percentual': str((diferenca * 100 / custo_atual).quantize(Decimal('0.01'))) if custo_atual else None,
+            })
+        return Response({'precos_alterados': len(precos_novos), 'produtos': resultado})
+
+    def _responder_explosao(self, empresa_id, demandas):
+        grafo = GrafoComposicao.carregar(empresa_id)
+        desconhecidos = sorted(set(demandas) - set(grafo.precos))
+        if desconhecidos:
+            return Response(
+                {'error': f"Produtos não encontrados na sua empresa: {desconhecidos}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            necessidades = explodir_empresa(empresa_id, demandas, grafo=grafo)
+        except CicloNaComposicao as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
+        custo_total = sum((necessidade['custo_total'] for necessidade in necessidades), Decimal('0.00'))
+        for necessidade in necessidades:
+            necessidade['quantidade'] = f"{necessidade['quantidade'].normalize():f}"
+            necessidade['custo_unitario'] = str(necessidade['custo_unitario'])
+            necessidade['custo_total'] = str(necessidade['custo_total'])
+        return Response({'itens': necessidades, 'custo_total': str(custo_total)})
+
 
 class ComposicaoViewSet(viewsets.ModelViewSet):
     """
@@ -53,15 +471,69 @@ class ComposicaoViewSet(viewsets.ModelViewSet):
         Filtra a lista de receitas para mostrar APENAS
         as que pertencem à empresa do usuário logado.
         """
-        empresa = self.request.user.owned_empresas.first()
+        empresa = get_empresa(self.request)
         if not empresa:
             return Composicao.objects.none()
-        return Composicao.objects.filter(empresa=empresa)
+        # Produto e itens (com o componente) vêm em 2 queries extras,
+        # seja qual for o número de receitas: nada de N+1 no serializer.
+        return (
+            Composicao.objects.filter(empresa=empresa)
+            .select_related('produto_acabado')
+            .prefetch_related(
+                Prefetch('itens', queryset=ItemComposicao.objects.select_related('componente').order_by('id'))
+            )
+            .order_by('produto_acabado__nome', 'id')
+        )
+
+    # Checagem de ciclo (no serializer) e gravação do índice de alcance
+    # ficam na MESMA transação, com a empresa travada: edições
+    # concorrentes de receitas da empresa passam uma de cada vez.
+    def create(self, request, *args, **kwargs):
+        with transaction.atomic():
+            travar_receitas(getattr(get_empresa(request), 'id', None))
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            travar_receitas(getattr(get_empresa(request), 'id', None))
+            return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            travar_receitas(getattr(get_empresa(request), 'id', None))
+            return super().destroy(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """
         Ao salvar uma nova receita (POST), preenche automaticamente
         o campo 'empresa' com a empresa do usuário logado.
         """
-        empresa = self.request.user.owned_empresas.first()
-        serializer.save(empresa=empresa)
\ No newline at end of file
+        empresa = get_empresa(self.request)
+        with transaction.atomic():
+            composicao = serializer.save(empresa=empresa)
+            propagar_custos([composicao.produto_acabado_id])
+        # Recarrega com o prefetch para a resposta (e o custo já propagado)
+        serializer.instance = self.get_queryset().get(pk=composicao.pk)
+
+    def perform_update(self, serializer):
+        """
+        Ao alterar uma receita, recalcula o custo do produto e de
+        tudo o que o usa (inclusive o produto antigo, se ele mudou).
+        """
+        produto_anterior_id = serializer.instance.produto_acabado_id
+        with transaction.atomic():
+            composicao = serializer.save()
+            propagar_custos({produto_anterior_id, composicao.produto_acabado_id})
+        serializer.instance = self.get_queryset().get(pk=composicao.pk)
+
+    def perform_destroy(self, instance):
+        """
+        Sem receita o produto volta a custar o seu preco_custo,
+        então os custos dele e de quem o usa são recalculados.
+        """
+        produto_id = instance.produto_acabado_id
+        with transaction.atomic():
+            itens = dict(instance.itens.values_list('componente_id', 'quantidade'))
+            atualizar_alcance(instance.empresa_id, produto_id, removidos=itens)
+            instance.delete()
+            propagar_custos([produto_id])
\ No newline at end of file
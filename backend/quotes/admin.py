@@ -1,3 +1,66 @@
 from django.contrib import admin
+from .models import NecessidadeCompra, ItemNecessidadeCompra, Reprecificacao, ItemReprecificacao, DocumentoOrcamento
 
-# Register your models here.
+
+class ItemNecessidadeCompraInline(admin.TabularInline):
+    model = ItemNecessidadeCompra
+    extra = 0
+    can_delete = False
+    fields = ('codigo_sku', 'descricao', 'unidade_medida', 'quantidade', 'custo_unitario', 'custo_total')
+    readonly_fields = fields
+
+
+@admin.register(NecessidadeCompra)
+class NecessidadeCompraAdmin(admin.ModelAdmin):
+    """A necessidade de compras é só leitura: é gerada pela task."""
+    list_display = ('__str__', 'empresa', 'status', 'total_orcamentos', 'custo_total', 'created_at')
+    list_select_related = ('empresa',)
+    list_filter = ('empresa', 'status')
+    readonly_fields = ('empresa', 'status', 'total_orcamentos', 'custo_total', 'erro', 'concluido_em')
+    inlines = [ItemNecessidadeCompraInline]
+
+    def has_add_permission(self, request):
+        return False
+
+
+class ItemReprecificacaoInline(admin.TabularInline):
+    model = ItemReprecificacao
+    extra = 0
+    can_delete = False
+    fields = (
+        'orcamento', 'linhas_alteradas', 'custo_producao_anterior', 'custo_producao_novo',
+        'preco_venda_anterior', 'preco_venda_novo',
+    )
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        # O __str__ do orçamento usa o nome do produto base
+        return super().get_queryset(request).select_related('orcamento__produto_base')
+
+
+@admin.register(Reprecificacao)
+class ReprecificacaoAdmin(admin.ModelAdmin):
+    """Histórico das reprecificações (só leitura: são geradas pela task)."""
+    list_display = ('__str__', 'empresa', 'status', 'total_produtos', 'total_orcamentos', 'total_linhas', 'created_at')
+    list_select_related = ('empresa',)
+    list_filter = ('empresa', 'status')
+    readonly_fields = (
+        'empresa', 'status', 'ultima_alteracao', 'total_produtos', 'total_orcamentos', 'total_linhas',
+        'erro', 'concluido_em',
+    )
+    inlines = [ItemReprecificacaoInline]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DocumentoOrcamento)
+class DocumentoOrcamentoAdmin(admin.ModelAdmin):
+    """Documentos gerados pela task (só leitura)."""
+    list_display = ('__str__', 'orcamento', 'status', 'created_at', 'concluido_em')
+    list_select_related = ('orcamento__produto_base',)
+    list_filter = ('status',)
+    readonly_fields = ('orcamento', 'hash_conteudo', 'status', 'arquivo', 'erro', 'concluido_em')
+
+    def has_add_permission(self, request):
+        return False
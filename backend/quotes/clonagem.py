@@ -0,0 +1,79 @@
+# Em backend/quotes/clonagem.py
+"""
+Cópia de um orçamento inteiro (cabeçalho + as três abas).
+
+As linhas são copiadas no próprio banco, com um INSERT ... SELECT por
+aba: o número de idas ao banco não depende do número de linhas. Em
+bancos sem suporte testado ao INSERT ... SELECT, cai para leitura em
+lotes + bulk_create (ainda sem um INSERT por linha).
+"""
+from django.db import connection, transaction
+
+from . import indicadores
+from .models import Orcamento
+from .totais import MODELOS_ITENS
+
+# Bancos em que o INSERT ... SELECT é usado
+BANCOS_INSERT_SELECT = ('postgresql', 'sqlite')
+
+TAMANHO_LOTE = 1000
+
+
+def _campos_copiados(modelo):
+    """Campos concretos da linha, menos o id e o orçamento (que muda)."""
+    return [campo for campo in modelo._meta.concrete_fields if not campo.primary_key and campo.name != 'orcamento']
+
+
+def _copiar_insert_select(modelo, origem_id, destino_id):
+    """Copia as linhas de uma aba com um único comando SQL."""
+    nome = connection.ops.quote_name
+    colunas = [nome(campo.column) for campo in _campos_copiados(modelo)]
+    tabela = nome(modelo._meta.db_table)
+    coluna_orcamento = nome(modelo._meta.get_field('orcamento').column)
+    sql = (
+        f"INSERT INTO {tabela} ({coluna_orcamento}, {', '.join(colunas)}) "
+        f"SELECT %s, {', '.join(colunas)} FROM {tabela} WHERE {coluna_orcamento} = %s ORDER BY {nome('id')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [destino_id, origem_id])
+
+
+def _copiar_em_lotes(modelo, origem_id, destino_id):
+    """Alternativa genérica: lê em lotes e grava com bulk_create."""
+    campos = [campo.attname for campo in _campos_copiados(modelo)]
+    linhas = modelo.objects.filter(orcamento_id=origem_id).order_by('id').values_list(*campos)
+    lote = []
+    for valores in linhas.iterator(chunk_size=TAMANHO_LOTE):
+        lote.append(modelo(orcamento_id=destino_id, **dict(zip(campos, valores))))
+        if len(lote) >= TAMANHO_LOTE:
+            modelo.objects.bulk_create(lote)
+            lote = []
+    modelo.objects.bulk_create(lote)
+
+
+@transaction.atomic
+def clonar_orcamento(orcamento_id, descricao=None):
+    """
+    Cria um rascunho igual ao orçamento informado (mesmos itens e
+    totais). Retorna o novo Orcamento.
+
+    O original fica travado durante a cópia: uma edição simultânea não
+    deixa os totais copiados diferentes das linhas copiadas.
+    """
+    original = Orcamento.objects.select_for_update().get(pk=orcamento_id)
+
+    automaticos = {'id', 'status', 'created_at', 'updated_at'}
+    copia = Orcamento(**{
+        campo.attname: getattr(original, campo.attname)
+        for campo in Orcamento._meta.concrete_fields
+        if campo.name not in automaticos
+    })
+    copia.status = 'draft'
+    copia.descricao = descricao if descricao is not None else f"{original.descricao} (cópia)".strip()[:255]
+    copia.save()
+    indicadores.registrar(depois=[indicadores.contribuicao(copia)])
+
+    copiar = _copiar_insert_select if connection.vendor in BANCOS_INSERT_SELECT else _copiar_em_lotes
+    for modelo in MODELOS_ITENS:
+        copiar(modelo, original.id, copia.id)
+    return copia
@@ -0,0 +1,81 @@
+# Em backend/quotes/compras.py
+"""
+Necessidade de compras (MRP) a partir dos orçamentos aprovados.
+
+Os itens de produto de um orçamento descrevem UMA unidade do
+produto_base (são a cópia da receita), então o consumo de cada linha é
+item.quantidade x orcamento.quantidade. A soma por componente é feita
+pelo próprio banco, numa única passada agregada (GROUP BY), e os
+sub-produtos (SB) são explodidos até as matérias-primas/serviços pelo
+grafo de receitas em memória.
+"""
+from decimal import Decimal, ROUND_CEILING
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+
+from pricing.grafo import GrafoComposicao
+from pricing.explosao import explodir
+from pricing.models import Produto
+from .models import Orcamento, OrcamentoItemProduto, NecessidadeCompra, ItemNecessidadeCompra
+
+CASAS_QUANTIDADE = Decimal('0.0001')
+
+
+def demandas_aprovadas(empresa_id):
+    """
+    {componente_id: quantidade total} somada em todos os orçamentos
+    aprovados da empresa. Uma query, sem carregar as linhas no Python.
+    """
+    linhas = (
+        OrcamentoItemProduto.objects
+        .filter(orcamento__empresa_id=empresa_id, orcamento__status='approved')
+        .values('componente_id')
+        .annotate(total=Sum(
+            F('quantidade') * F('orcamento__quantidade'),
+            output_field=DecimalField(max_digits=24, decimal_places=6),
+        ))
+        .order_by()
+    )
+    return {linha['componente_id']: linha['total'] for linha in linhas if linha['total']}
+
+
+def gerar_necessidades_compra(empresa_id, necessidade=None):
+    """
+    Calcula e grava a necessidade de compras da empresa.
+
+    'necessidade' é o cabeçalho já criado (status 'processando'), quando
+    quem pediu quer acompanhar o andamento; senão um novo é criado.
+    Retorna o NecessidadeCompra concluído.
+    """
+    if necessidade is None:
+        necessidade = NecessidadeCompra.objects.create(empresa_id=empresa_id)
+
+    demandas = demandas_aprovadas(empresa_id)
+    folhas = explodir(GrafoComposicao.carregar(empresa_id), demandas) if demandas else {}
+    produtos = Produto.objects.filter(id__in=folhas).values_list(
+        'id', 'nome', 'codigo_sku', 'unidade_medida', 'custo_calculado'
+    )
+
+    itens = []
+    for produto_id, nome, codigo_sku, unidade_medida, custo_unitario in produtos:
+        # Arredonda para cima: melhor sobrar do que faltar na compra
+        quantidade = folhas[produto_id].quantize(CASAS_QUANTIDADE, rounding=ROUND_CEILING)
+        itens.append(ItemNecessidadeCompra(
+            necessidade=necessidade, produto_id=produto_id, descricao=nome,
+            codigo_sku=codigo_sku, unidade_medida=unidade_medida, quantidade=quantidade,
+            custo_unitario=custo_unitario,
+            custo_total=(quantidade * custo_unitario).quantize(Decimal('0.01')),
+        ))
+
+    with transaction.atomic():
+        ItemNecessidadeCompra.objects.bulk_create(itens, batch_size=1000)
+        necessidade.total_orcamentos = Orcamento.objects.filter(
+            empresa_id=empresa_id, status='approved'
+        ).count()
+        necessidade.custo_total = sum((item.custo_total for item in itens), Decimal('0.00'))
+        necessidade.status = 'concluido'
+        necessidade.concluido_em = timezone.now()
+        necessidade.save(update_fields=['total_orcamentos', 'custo_total', 'status', 'concluido_em'])
+    return necessidade
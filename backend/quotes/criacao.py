@@ -0,0 +1,120 @@
+# Em backend/quotes/criacao.py
+"""
+Criação de um orçamento a partir da receita do produto_base.
+
+A receita é copiada ("foto") para a aba de composição do orçamento:
+descrição, quantidade e custo unitário saem do custo já calculado de
+cada componente (Produto.custo_calculado), sem recalcular o catálogo.
+Mudanças posteriores na receita não mexem no orçamento.
+
+Duas formas de copiar:
+- direta: os itens da receita como estão (sub-produtos SB viram uma
+  linha, com o custo deles);
+- achatada: só as matérias-primas/serviços de todos os níveis, com as
+  quantidades já multiplicadas (vem pronta do índice de alcance).
+
+O custo_adicional_fixo das receitas vira uma linha na aba de processos.
+Tudo numa transação e em número fixo de queries, qualquer que seja o
+tamanho ou a profundidade da receita.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from pricing.models import Composicao, ItemComposicao, AlcanceComposicao
+from . import indicadores
+from .models import Orcamento, OrcamentoItemProduto, OrcamentoItemProcesso
+from .totais import arredondar, recalcular_derivados
+
+CASAS_QUANTIDADE = Decimal('0.0001')
+
+DESCRICAO_CUSTO_FIXO = "Custos adicionais da receita"
+
+
+class ProdutoSemReceita(Exception):
+    """O produto_base não tem receita para copiar."""
+
+
+def _itens_diretos(produto):
+    """
+    [(componente_id, descricao, quantidade, custo_unitario)] da receita
+    do produto (1 query); sem custos fixos de sub-produtos.
+    """
+    itens = list(
+        ItemComposicao.objects.filter(composicao__produto_acabado=produto)
+        .values_list('componente_id', 'componente__nome', 'quantidade', 'componente__custo_calculado')
+        .order_by('id')
+    )
+    return itens, Decimal(0)
+
+
+def _itens_achatados(produto):
+    """
+    Itens sem receita de todos os níveis, com a quantidade por unidade
+    do produto, e a soma dos custos fixos dos sub-produtos (1 query).
+    """
+    linhas = (
+        AlcanceComposicao.objects.filter(ancestral=produto)
+        .values('descendente_id')
+        .annotate(quantidade=Sum('quantidade'))
+        .values_list(
+            'descendente_id', 'descendente__nome', 'quantidade',
+            'descendente__custo_calculado', 'descendente__composicao__custo_adicional_fixo',
+        )
+        .order_by('descendente__nome', 'descendente_id')
+    )
+    itens, custo_fixo = [], Decimal(0)
+    for componente_id, nome, quantidade, custo, custo_fixo_receita in linhas:
+        if custo_fixo_receita is None:
+            itens.append((componente_id, nome, quantidade, custo))
+        else:
+            custo_fixo += quantidade * custo_fixo_receita
+    return itens, custo_fixo
+
+
+@transaction.atomic
+def criar_orcamento(produto, quantidade=1, margem_lucro_percentual=None, descricao='', achatar=False):
+    """
+    Cria o Orcamento do 'produto' com a receita copiada e os totais
+    já calculados. Levanta ProdutoSemReceita se não houver receita.
+
+    Queries: receita (1) + itens (1) + INSERT do orçamento (1) +
+    INSERT dos itens (1 a cada 500 linhas) + INSERT do custo fixo (0 ou 1) +
+    indicadores do mês (1).
+    """
+    receita = Composicao.objects.filter(produto_acabado=produto).values_list('custo_adicional_fixo', flat=True).first()
+    if receita is None:
+        raise ProdutoSemReceita(f"O produto '{produto.nome}' não tem receita.")
+    itens, custo_fixo = _itens_achatados(produto) if achatar else _itens_diretos(produto)
+    custo_fixo = arredondar(custo_fixo + receita)
+
+    linhas = []
+    for componente_id, nome, quantidade_item, custo_unitario in itens:
+        quantidade_item = quantidade_item.quantize(CASAS_QUANTIDADE)
+        linhas.append(OrcamentoItemProduto(
+            componente_id=componente_id, descricao=nome, quantidade=quantidade_item,
+            custo_unitario=custo_unitario, custo_total_item=arredondar(quantidade_item * custo_unitario),
+        ))
+
+    # Os totais saem das linhas ainda em memória: nada de reler o que acabou de ser gravado
+    orcamento = Orcamento(
+        empresa_id=produto.empresa_id, produto_base=produto, quantidade=Decimal(quantidade), descricao=descricao,
+        custo_total_materias_primas=sum((linha.custo_total_item for linha in linhas), Decimal(0)),
+        custo_total_processos=custo_fixo,
+    )
+    if margem_lucro_percentual is not None:
+        orcamento.margem_lucro_percentual = Decimal(margem_lucro_percentual)
+    recalcular_derivados(orcamento)
+    orcamento.save()
+    indicadores.registrar(depois=[indicadores.contribuicao(orcamento)])
+
+    for linha in linhas:
+        linha.orcamento = orcamento
+    OrcamentoItemProduto.objects.bulk_create(linhas, batch_size=500)
+    if custo_fixo:
+        OrcamentoItemProcesso.objects.create(
+            orcamento=orcamento, descricao=DESCRICAO_CUSTO_FIXO, horas=1, custo_hora=custo_fixo,
+            custo_total_item=custo_fixo,
+        )
+    return orcamento
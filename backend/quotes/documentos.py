@@ -0,0 +1,128 @@
+# Em backend/quotes/documentos.py
+"""
+Documento do orçamento para o cliente (HTML), gerado em segundo plano.
+
+Cada documento fica guardado pelo hash do conteúdo do orçamento
+(cabeçalho + as três abas + updated_at, na forma da API): pedir o
+documento de um orçamento que não mudou devolve o arquivo já gerado,
+sem renderizar de novo. A requisição só calcula o hash e, se ainda não
+existe documento para ele, agenda a task (quotes.tasks).
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Orcamento, DocumentoOrcamento
+from .serializers import OrcamentoSerializer
+from .totais import ABAS, arredondar
+
+# Mude ao alterar o template: os documentos antigos deixam de valer
+VERSAO_LAYOUT = 1
+TEMPLATE = 'quotes/orcamento_documento.html'
+
+
+def carregar_orcamento(orcamento_id):
+    """Orçamento com tudo o que o hash e o documento usam."""
+    return (
+        Orcamento.objects.select_related('produto_base', 'empresa')
+        .prefetch_related(*ABAS).get(pk=orcamento_id)
+    )
+
+
+def hash_do_conteudo(orcamento):
+    """SHA-256 do orçamento serializado (cabeçalho + abas) e da versão do layout."""
+    conteudo = json.dumps(
+        {'layout': VERSAO_LAYOUT, 'orcamento': OrcamentoSerializer(orcamento).data},
+        sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def solicitar_documento(orcamento):
+    """
+    Documento do conteúdo atual do orçamento (com as abas já
+    carregadas). Se ainda não existe, se a última tentativa deu erro
+    ou se está 'processando' há mais de DOCUMENTO_TIMEOUT segundos (a
+    task se perdeu), agenda a renderização (depois do commit).
+    """
+    documento, criado = DocumentoOrcamento.objects.get_or_create(
+        orcamento=orcamento, hash_conteudo=hash_do_conteudo(orcamento),
+    )
+    agora = timezone.now()
+    limite = agora - timedelta(seconds=settings.DOCUMENTO_TIMEOUT)
+    parado = documento.status == 'processando' and documento.iniciado_em < limite
+    if not criado and (documento.status == 'erro' or parado):
+        # Nova tentativa (só uma requisição consegue reabrir)
+        criado = bool(
+            DocumentoOrcamento.objects.filter(pk=documento.pk)
+            .filter(Q(status='erro') | Q(status='processando', iniciado_em__lt=limite))
+            .update(status='processando', erro='', iniciado_em=agora)
+        )
+        documento.status = 'processando'
+    if criado:
+        transaction.on_commit(lambda: _agendar(documento.id))
+    return documento
+
+
+def _agendar(documento_id):
+    # Import tardio: quotes.tasks importa este módulo
+    from .tasks import gerar_documento_orcamento
+    gerar_documento_orcamento.delay(documento_id)
+
+
+def renderizar_documento(documento_id):
+    """
+    Gera e grava o arquivo de um documento 'processando'. Retorna o
+    DocumentoOrcamento, ou None se não há o que fazer (já gerado, ou o
+    orçamento mudou antes da renderização: a próxima consulta pede o
+    documento do conteúdo novo).
+    """
+    documento = DocumentoOrcamento.objects.filter(pk=documento_id, status='processando').first()
+    if documento is None:
+        return None
+    orcamento = carregar_orcamento(documento.orcamento_id)
+    if hash_do_conteudo(orcamento) != documento.hash_conteudo:
+        documento.delete()
+        return None
+
+    try:
+        html = render_to_string(TEMPLATE, {
+            'orcamento': orcamento,
+            'empresa': orcamento.empresa,
+            'valor_total': arredondar(orcamento.preco_venda_final * orcamento.quantidade),
+            'gerado_em': timezone.now(),
+        })
+        nome = f"{orcamento.empresa_id}/{orcamento.id}/{documento.hash_conteudo}.html"
+        documento.arquivo.save(nome, ContentFile(html.encode('utf-8')), save=False)
+    except Exception as erro:
+        documento.status = 'erro'
+        documento.erro = str(erro)
+        documento.save(update_fields=['status', 'erro'])
+        raise
+
+    documento.status = 'concluido'
+    documento.concluido_em = timezone.now()
+    # Uma task reenfileirada (DOCUMENTO_TIMEOUT) pode ter terminado antes: só uma grava
+    concluiu = DocumentoOrcamento.objects.filter(pk=documento.pk, status='processando').update(
+        arquivo=documento.arquivo.name, status='concluido', concluido_em=documento.concluido_em,
+    )
+    if not concluiu:
+        documento.arquivo.delete(save=False)
+        return None
+
+    # Só o conteúdo atual é servido: os documentos anteriores saem do storage.
+    # Os que ainda estão 'processando' ficam: a task deles se apaga ao ver
+    # que o orçamento mudou.
+    antigos = DocumentoOrcamento.objects.filter(orcamento_id=orcamento.id).exclude(pk=documento.pk)
+    for antigo in antigos.exclude(status='processando'):
+        if antigo.arquivo:
+            antigo.arquivo.delete(save=False)
+        antigo.delete()
+    return documento
@@ -0,0 +1,188 @@
+# Em backend/quotes/indicadores.py
+"""
+Indicadores dos orçamentos por empresa, mês e status (IndicadorMensal):
+taxa de conversão, margem média e receita, sem GROUP BY na tabela de
+orçamentos a cada consulta.
+
+Cada orçamento CONTRIBUI com uma linha (empresa, mês de criação,
+status): 1 orçamento, a margem, o valor do pedido e o custo do pedido.
+Quem grava o cabeçalho (quotes.totais, criação, cópia, exclusão) pega a
+contribuição antes e depois e chama registrar(): só a diferença vai
+para os indicadores, com UPDATE ... SET campo = campo + delta.
+
+As escritas de uma empresa são serializadas pela trava na linha da
+Empresa (select_for_update): uma reconstrução não se cruza com um
+registrar() da mesma empresa, nem com a criação de uma linha nova.
+
+Se os indicadores divergirem (ex.: UPDATE feito direto no banco),
+reconstruir_indicadores() refaz tudo lendo os orçamentos em lotes
+(comando reconstruir_indicadores).
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import Empresa
+from .models import Orcamento, IndicadorMensal
+from .precificacao import CENTAVOS
+
+# Somas guardadas em cada IndicadorMensal, na ordem das contribuições
+CAMPOS = ('quantidade', 'soma_margem', 'valor_total', 'custo_total')
+
+# Campos do orçamento usados na contribuição (na ordem de _contribuicao)
+CAMPOS_ORCAMENTO = (
+    'empresa_id', 'created_at', 'status', 'margem_lucro_percentual', 'preco_venda_final', 'quantidade',
+    'custo_total_producao', 'custo_total_despesas_impostos',
+)
+
+# Orçamentos lidos por vez na reconstrução
+TAMANHO_LOTE = 2000
+
+
+def mes_de(data):
+    """Primeiro dia do mês de 'data' (no fuso do sistema)."""
+    return timezone.localtime(data).date().replace(day=1)
+
+
+def _centavos(valor):
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def _contribuicao(empresa_id, criado_em, status, margem, preco_final, quantidade, custo_producao, despesas):
+    chave = (empresa_id, mes_de(criado_em), status)
+    return chave, (
+        1,
+        Decimal(margem),
+        _centavos(Decimal(preco_final) * Decimal(quantidade)),
+        _centavos((Decimal(custo_producao) + Decimal(despesas)) * Decimal(quantidade)),
+    )
+
+
+def contribuicao(orcamento):
+    """(chave, valores) do orçamento nos indicadores, no estado atual da instância."""
+    return _contribuicao(*(getattr(orcamento, campo) for campo in CAMPOS_ORCAMENTO))
+
+
+def _travar_empresas(empresa_ids):
+    """Trava as Empresas (em ordem de id) até o fim da transação."""
+    list(Empresa.objects.select_for_update().filter(pk__in=empresa_ids).order_by('pk').values_list('pk', flat=True))
+
+
+@transaction.atomic
+def registrar(antes=(), depois=()):
+    """
+    Troca as contribuições 'antes' pelas 'depois' nos indicadores
+    (None é ignorado: orçamento novo ou excluído). Uma query por
+    (empresa, mês, status) que realmente mudou, depois de travar as
+    empresas envolvidas.
+    """
+    variacoes = defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+    for sinal, contribuicoes in ((-1, antes), (1, depois)):
+        for item in contribuicoes:
+            if item is None:
+                continue
+            chave, valores = item
+            for posicao, valor in enumerate(valores):
+                variacoes[chave][posicao] += sinal * valor
+
+    # Ordem fixa: duas transações não travam as mesmas linhas em ordem inversa
+    mudaram = [chave for chave in sorted(variacoes) if any(variacoes[chave])]
+    if not mudaram:
+        return
+    _travar_empresas({empresa_id for empresa_id, _, _ in mudaram})
+    for chave in mudaram:
+        _somar(chave, variacoes[chave])
+
+
+def _somar(chave, valores):
+    empresa_id, mes, status = chave
+    linhas = IndicadorMensal.objects.filter(empresa_id=empresa_id, mes=mes, status=status)
+    incrementos = {campo: F(campo) + valor for campo, valor in zip(CAMPOS, valores)}
+    if linhas.update(**incrementos, atualizado_em=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            IndicadorMensal.objects.create(empresa_id=empresa_id, mes=mes, status=status, **dict(zip(CAMPOS, valores)))
+    except IntegrityError:
+        # Outra transação criou a linha agora
+        linhas.update(**incrementos, atualizado_em=timezone.now())
+
+
+@transaction.atomic
+def reconstruir_indicadores(empresa, tamanho_lote=TAMANHO_LOTE):
+    """
+    Refaz do zero os indicadores da empresa, lendo os orçamentos em
+    lotes (sem carregar a tabela inteira). A empresa fica travada até
+    o fim da transação, então os registrar() feitos enquanto isso
+    esperam e entram depois, sobre os valores novos. Retorna quantos
+    orçamentos leu.
+    """
+    _travar_empresas([getattr(empresa, 'pk', empresa)])
+
+    somas = defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+    total = 0
+    orcamentos = Orcamento.objects.filter(empresa=empresa).order_by().values_list(*CAMPOS_ORCAMENTO)
+    for linha in orcamentos.iterator(chunk_size=tamanho_lote):
+        chave, valores = _contribuicao(*linha)
+        for posicao, valor in enumerate(valores):
+            somas[chave][posicao] += valor
+        total += 1
+
+    IndicadorMensal.objects.filter(empresa=empresa).delete()
+    IndicadorMensal.objects.bulk_create(
+        [
+            IndicadorMensal(empresa_id=empresa_id, mes=mes, status=status, **dict(zip(CAMPOS, valores)))
+            for (empresa_id, mes, status), valores in sorted(somas.items())
+        ],
+        batch_size=1000,
+    )
+    return total
+
+
+def _percentual(parte, todo):
+    return _centavos(Decimal(parte) * 100 / todo) if todo else None
+
+
+def resumo_mensal(empresa, de=None, ate=None):
+    """
+    Indicadores por mês (só lê IndicadorMensal). 'de' e 'ate' são
+    datas (qualquer dia do mês). Taxa de conversão = aprovados /
+    (aprovados + rejeitados); receita e margem realizada são dos
+    aprovados.
+    """
+    indicadores = IndicadorMensal.objects.filter(empresa=empresa, quantidade__gt=0).order_by('mes', 'status')
+    if de:
+        indicadores = indicadores.filter(mes__gte=de.replace(day=1))
+    if ate:
+        indicadores = indicadores.filter(mes__lte=ate.replace(day=1))
+
+    meses = {}
+    for indicador in indicadores:
+        meses.setdefault(indicador.mes, {})[indicador.status] = indicador
+
+    resumo = []
+    for mes, por_status in meses.items():
+        aprovados = por_status.get('approved')
+        decididos = sum(por_status[status].quantidade for status in ('approved', 'rejected') if status in por_status)
+        quantidade = sum(indicador.quantidade for indicador in por_status.values())
+        receita = aprovados.valor_total if aprovados else Decimal(0)
+        resumo.append({
+            'mes': mes.strftime('%Y-%m'),
+            'orcamentos': quantidade,
+            'taxa_conversao': _percentual(aprovados.quantidade if aprovados else 0, decididos),
+            'receita': receita,
+            'margem_media': _centavos(sum(indicador.soma_margem for indicador in por_status.values()) / quantidade),
+            'margem_realizada': _percentual(receita - aprovados.custo_total, receita) if aprovados else None,
+            'por_status': {
+                status: {
+                    'quantidade': indicador.quantidade,
+                    'valor_total': indicador.valor_total,
+                    'margem_media': _centavos(indicador.soma_margem / indicador.quantidade),
+                }
+                for status, indicador in por_status.items()
+            },
+        })
+    return resumo
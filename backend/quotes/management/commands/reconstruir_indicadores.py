@@ -0,0 +1,23 @@
+# Em backend/quotes/management/commands/reconstruir_indicadores.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.models import Empresa
+from quotes.indicadores import reconstruir_indicadores, TAMANHO_LOTE
+
+
+class Command(BaseCommand):
+    help = "Reconstrói (do zero) os indicadores mensais dos orçamentos, lendo o histórico em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Orçamentos lidos por vez")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.all()
+        if options['empresa']:
+            empresas = empresas.filter(id=options['empresa'])
+
+        for empresa in empresas.iterator():
+            with transaction.atomic():
+                total = reconstruir_indicadores(empresa, tamanho_lote=options['lote'])
+            self.stdout.write(f"{empresa}: indicadores reconstruídos ({total} orçamentos)")
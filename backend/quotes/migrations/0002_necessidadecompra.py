@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_empresa'),
+        ('pricing', '0005_alcancecomposicao_quantidade'),
+        ('quotes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemNecessidadeCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descricao', models.CharField(max_length=255)),
+                ('codigo_sku', models.CharField(blank=True, max_length=100)),
+                ('unidade_medida', models.CharField(max_length=20)),
+                ('quantidade', models.DecimalField(decimal_places=4, max_digits=18)),
+                ('custo_unitario', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('custo_total', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Item da Necessidade de Compra',
+                'verbose_name_plural': 'Itens da Necessidade de Compra',
+                'ordering': ['descricao', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NecessidadeCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='processando', max_length=12)),
+                ('total_orcamentos', models.PositiveIntegerField(default=0, verbose_name='Orçamentos Considerados')),
+                ('custo_total', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('erro', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Necessidade de Compra',
+                'verbose_name_plural': 'Necessidades de Compra',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orcamento',
+            index=models.Index(fields=['empresa', 'status'], name='orcamento_empresa_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='necessidadecompra',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='necessidades_compra', to='users.empresa'),
+        ),
+        migrations.AddField(
+            model_name='itemnecessidadecompra',
+            name='necessidade',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='quotes.necessidadecompra'),
+        ),
+        migrations.AddField(
+            model_name='itemnecessidadecompra',
+            name='produto',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='pricing.produto', verbose_name='Produto'),
+        ),
+    ]
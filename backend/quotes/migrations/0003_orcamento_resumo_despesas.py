@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:58
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def resumo_despesas(apps, schema_editor):
+    # Preenche o resumo da aba de despesas com o que já existe nas linhas
+    # (os totais e preços já gravados não são mexidos).
+    Orcamento = apps.get_model('quotes', 'Orcamento')
+    OrcamentoItemDespesaImposto = apps.get_model('quotes', 'OrcamentoItemDespesaImposto')
+    campos = {
+        ('fixo', 'custo'): 'despesas_fixas',
+        ('fixo', 'venda'): 'despesas_fixas',
+        ('percentual', 'custo'): 'percentual_despesas_custo',
+        ('percentual', 'venda'): 'percentual_despesas_venda',
+    }
+    resumos = {}
+    linhas = (
+        OrcamentoItemDespesaImposto.objects
+        .values('orcamento_id', 'tipo', 'base_calculo').annotate(total=Sum('valor')).order_by()
+    )
+    for linha in linhas:
+        resumo = resumos.setdefault(linha['orcamento_id'], {campo: 0 for campo in set(campos.values())})
+        resumo[campos[(linha['tipo'], linha['base_calculo'])]] += linha['total']
+    for orcamento_id, resumo in resumos.items():
+        Orcamento.objects.filter(pk=orcamento_id).update(**resumo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0002_necessidadecompra'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orcamento',
+            name='despesas_fixas',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='orcamento',
+            name='percentual_despesas_custo',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=7),
+        ),
+        migrations.AddField(
+            model_name='orcamento',
+            name='percentual_despesas_venda',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=7),
+        ),
+        migrations.RunPython(resumo_despesas, migrations.RunPython.noop),
+    ]
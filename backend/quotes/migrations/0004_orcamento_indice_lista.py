@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0003_orcamento_resumo_despesas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orcamento',
+            index=models.Index(fields=['empresa', '-created_at', '-id'], name='orcamento_empresa_criado_idx'),
+        ),
+    ]
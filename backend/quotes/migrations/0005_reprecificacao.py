@@ -0,0 +1,99 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0009_produto_busca_trigram'),
+        ('users', '0002_empresa'),
+        ('quotes', '0004_orcamento_indice_lista'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustoAlterado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('custo_anterior', models.DecimalField(decimal_places=4, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Custo Alterado',
+                'verbose_name_plural': 'Custos Alterados',
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemReprecificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('linhas_alteradas', models.PositiveIntegerField(default=0)),
+                ('custo_producao_anterior', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('custo_producao_novo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('preco_venda_anterior', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('preco_venda_novo', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Orçamento Reprecificado',
+                'verbose_name_plural': 'Orçamentos Reprecificados',
+                'ordering': ['orcamento_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Reprecificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('aguardando', 'Aguardando'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='aguardando', max_length=12)),
+                ('ultima_alteracao', models.DateTimeField(verbose_name='Última Alteração de Custo')),
+                ('total_produtos', models.PositiveIntegerField(default=0, verbose_name='Produtos Alterados')),
+                ('total_orcamentos', models.PositiveIntegerField(default=0, verbose_name='Orçamentos Reprecificados')),
+                ('total_linhas', models.PositiveIntegerField(default=0, verbose_name='Linhas Reprecificadas')),
+                ('erro', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Reprecificação',
+                'verbose_name_plural': 'Reprecificações',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orcamentoitemproduto',
+            index=models.Index(fields=['componente', 'orcamento'], name='orc_item_componente_idx'),
+        ),
+        migrations.AddField(
+            model_name='reprecificacao',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reprecificacoes', to='users.empresa'),
+        ),
+        migrations.AddField(
+            model_name='itemreprecificacao',
+            name='orcamento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reprecificacoes', to='quotes.orcamento'),
+        ),
+        migrations.AddField(
+            model_name='itemreprecificacao',
+            name='reprecificacao',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='quotes.reprecificacao'),
+        ),
+        migrations.AddField(
+            model_name='custoalterado',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pricing.produto'),
+        ),
+        migrations.AddField(
+            model_name='custoalterado',
+            name='reprecificacao',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custos', to='quotes.reprecificacao'),
+        ),
+        migrations.AddConstraint(
+            model_name='reprecificacao',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'aguardando')), fields=('empresa',), name='reprecificacao_uma_aguardando'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='custoalterado',
+            unique_together={('reprecificacao', 'produto')},
+        ),
+    ]
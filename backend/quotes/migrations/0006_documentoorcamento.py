@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0005_reprecificacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoOrcamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash_conteudo', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='processando', max_length=12)),
+                ('arquivo', models.FileField(blank=True, upload_to='orcamentos/')),
+                ('erro', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('orcamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documentos', to='quotes.orcamento')),
+            ],
+            options={
+                'verbose_name': 'Documento do Orçamento',
+                'verbose_name_plural': 'Documentos dos Orçamentos',
+                'ordering': ['-created_at'],
+                'unique_together': {('orcamento', 'hash_conteudo')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_empresa'),
+        ('quotes', '0006_documentoorcamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicadorMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mês')),
+                ('status', models.CharField(choices=[('draft', 'Rascunho'), ('sent', 'Enviado'), ('approved', 'Aprovado'), ('rejected', 'Rejeitado')], max_length=10)),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Orçamentos')),
+                ('soma_margem', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0.0, max_digits=18)),
+                ('custo_total', models.DecimalField(decimal_places=2, default=0.0, max_digits=18)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indicadores_mensais', to='users.empresa')),
+            ],
+            options={
+                'verbose_name': 'Indicador Mensal',
+                'verbose_name_plural': 'Indicadores Mensais',
+                'ordering': ['empresa', 'mes', 'status'],
+                'unique_together': {('empresa', 'mes', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0007_indicadormensal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orcamentoitemproduto',
+            name='custo_unitario',
+            field=models.DecimalField(decimal_places=4, max_digits=14),
+        ),
+    ]
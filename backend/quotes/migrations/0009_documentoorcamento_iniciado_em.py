@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0008_item_produto_custo_unitario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentoorcamento',
+            name='iniciado_em',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0010_preencher_alcance'),
+        ('quotes', '0009_documentoorcamento_iniciado_em'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='custoalterado',
+            unique_together={('reprecificacao', 'produto', 'custo_anterior')},
+        ),
+    ]
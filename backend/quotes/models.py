@@ -1,5 +1,6 @@
 # Em backend/quotes/models.py
 from django.db import models
+from django.utils import timezone
 from users.models import Empresa
 from pricing.models import Produto
 
@@ -24,7 +25,9 @@ class Orcamento(models.Model):
 
     # --- ABA DE TOTAIS (Calculados) ---
     # Estes campos são atualizados pelo seu "serviço"
-    # sempre que um item nas outras abas é salvo.
+    # sempre que um item nas outras abas é salvo (quotes.totais).
+    # Os itens e os totais valem para UMA unidade do produto_base;
+    # o valor do pedido é preco_venda_final x quantidade.
     custo_total_materias_primas = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
     custo_total_processos = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
     custo_total_despesas_impostos = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
@@ -35,6 +38,12 @@ class Orcamento(models.Model):
     preco_venda_calculado = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
     preco_venda_final = models.DecimalField(max_digits=12, decimal_places=2, default=0.0) # Preço final (pode ser ajustado manualmente)
 
+    # Resumo da aba de despesas/impostos, mantido junto com os totais:
+    # com ele os totais são recalculados sem somar as linhas de novo.
+    despesas_fixas = models.DecimalField(max_digits=12, decimal_places=2, default=0.0) # R$ por pedido
+    percentual_despesas_custo = models.DecimalField(max_digits=7, decimal_places=2, default=0.0) # % sobre o custo
+    percentual_despesas_venda = models.DecimalField(max_digits=7, decimal_places=2, default=0.0) # % sobre o preço de venda
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -42,6 +51,12 @@ class Orcamento(models.Model):
         verbose_name = "Orçamento"
         verbose_name_plural = "Orçamentos"
         ordering = ['-created_at']
+        indexes = [
+            # Orçamentos de uma empresa por status (ex.: todos os aprovados)
+            models.Index(fields=['empresa', 'status'], name='orcamento_empresa_status_idx'),
+            # Lista da API: mais recentes primeiro, paginada por (created_at, id)
+            models.Index(fields=['empresa', '-created_at', '-id'], name='orcamento_empresa_criado_idx'),
+        ]
 
     def __str__(self):
         return f"Orçamento #{self.id} - {self.produto_base.nome}"
@@ -60,7 +75,7 @@ class OrcamentoItemProduto(models.Model):
     # Campos copiados E EDITÁVEIS
     descricao = models.CharField(max_length=255) # Copiado de Produto.nome
     quantidade = models.DecimalField(max_digits=10, decimal_places=4) # Copiado de ItemComposicao.quantidade
-    custo_unitario = models.DecimalField(max_digits=10, decimal_places=4) # Copiado de Produto.preco_custo
+    custo_unitario = models.DecimalField(max_digits=14, decimal_places=4) # Copiado de Produto.custo_calculado
 
     # Campo calculado
     custo_total_item = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
@@ -68,6 +83,10 @@ class OrcamentoItemProduto(models.Model):
     class Meta:
         verbose_name = "Item de Produto do Orçamento"
         ordering = ['id']
+        indexes = [
+            # Reprecificação: de um componente para os orçamentos que o usam
+            models.Index(fields=['componente', 'orcamento'], name='orc_item_componente_idx'),
+        ]
 
 
 class OrcamentoItemProcesso(models.Model):
@@ -112,4 +131,194 @@ class OrcamentoItemDespesaImposto(models.Model):
 
     class Meta:
         verbose_name = "Item de Despesa/Imposto do Orçamento"
-        ordering = ['id']
\ No newline at end of file
+        ordering = ['id']
+
+class NecessidadeCompra(models.Model):
+    """
+    "Foto" (snapshot) do que precisa ser comprado para atender todos
+    os orçamentos aprovados de uma empresa, num dado momento.
+    Gerada em segundo plano por quotes.tasks.calcular_necessidades_compra.
+    """
+    STATUS_CHOICES = [
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='necessidades_compra')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='processando')
+
+    total_orcamentos = models.PositiveIntegerField(default=0, verbose_name="Orçamentos Considerados")
+    custo_total = models.DecimalField(max_digits=14, decimal_places=2, default=0.0)
+    erro = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Necessidade de Compra"
+        verbose_name_plural = "Necessidades de Compra"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Necessidade de compra #{self.id} ({self.get_status_display()})"
+
+
+class ItemNecessidadeCompra(models.Model):
+    """Um item (MP, SV...) da necessidade de compra, já somado entre todos os orçamentos."""
+
+    necessidade = models.ForeignKey(NecessidadeCompra, on_delete=models.CASCADE, related_name='itens')
+
+    # Referência ao produto + cópia dos dados (a foto não muda se o cadastro mudar)
+    produto = models.ForeignKey(Produto, on_delete=models.SET_NULL, null=True, verbose_name="Produto")
+    descricao = models.CharField(max_length=255)
+    codigo_sku = models.CharField(max_length=100, blank=True)
+    unidade_medida = models.CharField(max_length=20)
+
+    quantidade = models.DecimalField(max_digits=18, decimal_places=4)
+    custo_unitario = models.DecimalField(max_digits=14, decimal_places=4)
+    custo_total = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Item da Necessidade de Compra"
+        verbose_name_plural = "Itens da Necessidade de Compra"
+        ordering = ['descricao', 'id']
+
+
+class Reprecificacao(models.Model):
+    """
+    Uma rodada de reprecificação dos orçamentos em aberto (rascunho e
+    enviados) depois que custos de produtos mudaram.
+
+    Enquanto está 'aguardando', junta todas as alterações de custo da
+    empresa (no máximo uma rodada aguardando por empresa); só roda
+    depois de um tempo sem novas alterações (quotes.reprecificacao).
+    """
+    STATUS_CHOICES = [
+        ('aguardando', 'Aguardando'),
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='reprecificacoes')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='aguardando')
+    ultima_alteracao = models.DateTimeField(verbose_name="Última Alteração de Custo")
+
+    total_produtos = models.PositiveIntegerField(default=0, verbose_name="Produtos Alterados")
+    total_orcamentos = models.PositiveIntegerField(default=0, verbose_name="Orçamentos Reprecificados")
+    total_linhas = models.PositiveIntegerField(default=0, verbose_name="Linhas Reprecificadas")
+    erro = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Reprecificação"
+        verbose_name_plural = "Reprecificações"
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa'], condition=models.Q(status='aguardando'),
+                name='reprecificacao_uma_aguardando',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Reprecificação #{self.id} ({self.get_status_display()})"
+
+
+class CustoAlterado(models.Model):
+    """
+    Produto cujo custo mudou, à espera da reprecificação. Guarda cada
+    custo ANTERIOR (uma linha por valor): só as linhas de orçamento que
+    ainda têm um desses custos (cópias, não valores ajustados à mão)
+    são atualizadas.
+    """
+    reprecificacao = models.ForeignKey(Reprecificacao, on_delete=models.CASCADE, related_name='custos')
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    custo_anterior = models.DecimalField(max_digits=14, decimal_places=4)
+
+    class Meta:
+        verbose_name = "Custo Alterado"
+        verbose_name_plural = "Custos Alterados"
+        # Várias alterações do mesmo produto na rodada: um registro por custo anterior
+        unique_together = ('reprecificacao', 'produto', 'custo_anterior')
+
+
+class ItemReprecificacao(models.Model):
+    """O que mudou em UM orçamento numa reprecificação."""
+
+    reprecificacao = models.ForeignKey(Reprecificacao, on_delete=models.CASCADE, related_name='itens')
+    orcamento = models.ForeignKey(Orcamento, on_delete=models.CASCADE, related_name='reprecificacoes')
+
+    linhas_alteradas = models.PositiveIntegerField(default=0)
+    custo_producao_anterior = models.DecimalField(max_digits=12, decimal_places=2)
+    custo_producao_novo = models.DecimalField(max_digits=12, decimal_places=2)
+    preco_venda_anterior = models.DecimalField(max_digits=12, decimal_places=2)
+    preco_venda_novo = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Orçamento Reprecificado"
+        verbose_name_plural = "Orçamentos Reprecificados"
+        ordering = ['orcamento_id']
+
+
+class DocumentoOrcamento(models.Model):
+    """
+    Documento (HTML) de um orçamento, gerado em segundo plano e guardado
+    pelo hash do conteúdo do orçamento (quotes.documentos): enquanto o
+    orçamento não muda, o mesmo arquivo é servido de novo.
+    """
+    STATUS_CHOICES = [
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    orcamento = models.ForeignKey(Orcamento, on_delete=models.CASCADE, related_name='documentos')
+    hash_conteudo = models.CharField(max_length=64)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='processando')
+    arquivo = models.FileField(upload_to='orcamentos/', blank=True)
+    erro = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Início da tentativa atual (uma task perdida é reenfileirada depois de DOCUMENTO_TIMEOUT)
+    iniciado_em = models.DateTimeField(default=timezone.now)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Documento do Orçamento"
+        verbose_name_plural = "Documentos dos Orçamentos"
+        ordering = ['-created_at']
+        unique_together = ('orcamento', 'hash_conteudo')
+
+    def __str__(self):
+        return f"Documento do orçamento #{self.orcamento_id} ({self.get_status_display()})"
+
+
+class IndicadorMensal(models.Model):
+    """
+    Resumo dos orçamentos de uma empresa por mês (de criação) e status,
+    mantido por deltas a cada mudança de status ou de totais
+    (quotes.indicadores). Os painéis leem só daqui.
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='indicadores_mensais')
+    mes = models.DateField(verbose_name="Mês")  # Sempre o dia 1
+    status = models.CharField(max_length=10, choices=Orcamento.STATUS_CHOICES)
+
+    quantidade = models.IntegerField(default=0, verbose_name="Orçamentos")
+    soma_margem = models.DecimalField(max_digits=14, decimal_places=2, default=0.0)  # Soma das margens (%)
+    valor_total = models.DecimalField(max_digits=18, decimal_places=2, default=0.0)  # Soma de preço final x quantidade
+    custo_total = models.DecimalField(max_digits=18, decimal_places=2, default=0.0)  # Soma de (custo + despesas) x quantidade
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Indicador Mensal"
+        verbose_name_plural = "Indicadores Mensais"
+        ordering = ['empresa', 'mes', 'status']
+        unique_together = ('empresa', 'mes', 'status')
+
+    def __str__(self):
+        return f"{self.mes:%m/%Y} - {self.get_status_display()}"
@@ -0,0 +1,157 @@
+# Em backend/quotes/precificacao.py
+"""
+Preço de venda "por dentro" (gross-up).
+
+Impostos sobre a venda (base_calculo='venda') incidem sobre o próprio
+preço, que por sua vez precisa cobri-los junto com a margem:
+
+    P = custo + fixas + % custo + P * (margem + % venda) / 100
+
+A solução é fechada, sem iterar:
+
+    P = (custo + fixas + % custo) / (1 - (margem + % venda) / 100)
+
+Todos os valores de entrada têm 2 casas, então a conta é feita em
+inteiros (centavos e centésimos de %): P vira uma fração exata N / D e
+o arredondamento para centavos (meio para cima) não depende de
+precisão de Decimal nem de float. A mesma fórmula roda sobre inteiros
+Python (um orçamento) ou sobre arrays do NumPy (muitos de uma vez).
+"""
+from decimal import Decimal
+
+import numpy as np
+
+CENTAVOS = Decimal('0.01')
+
+# Acima disto os produtos intermediários podem estourar o int64
+LIMITE_INT64 = 2 ** 62
+
+
+class MargemInviavel(Exception):
+    """Margem + impostos sobre a venda chegam a 100%: não existe preço que os cubra."""
+
+
+def _centesimos(valor):
+    """Decimal com até 2 casas -> inteiro em centésimos (R$ -> centavos, % -> centésimos de %)."""
+    return int(Decimal(valor).quantize(CENTAVOS).scaleb(2))
+
+
+def _fracao(custo, fixas, quantidade, pct_custo, pct_venda, margem):
+    """
+    Numerador e denominador do preço em centavos (tudo em centésimos).
+
+    Só usa +, * e -: serve igual para int e para arrays do NumPy.
+    """
+    numerador = custo * quantidade * 10000 + fixas * 1000000 + custo * pct_custo * quantidade
+    denominador = quantidade * (10000 - margem - pct_venda)
+    return numerador, denominador
+
+
+def _arredondar(numerador, denominador):
+    """round(N / D) meio para cima, só com inteiros (N >= 0, D > 0)."""
+    return (2 * numerador + denominador) // (2 * denominador)
+
+
+def preco_de_venda(custo, despesas_fixas, quantidade, percentual_custo, percentual_venda, margem):
+    """
+    Preço de venda unitário (Decimal, 2 casas) de um orçamento.
+
+    'custo' é o custo de produção unitário (MP + processos) e
+    'despesas_fixas' o total em R$ do pedido, rateado pela quantidade.
+    Levanta MargemInviavel se margem + % sobre venda >= 100.
+    """
+    quantidade = _centesimos(quantidade) if Decimal(quantidade) > 0 else 100
+    numerador, denominador = _fracao(
+        _centesimos(custo), _centesimos(despesas_fixas), quantidade,
+        _centesimos(percentual_custo), _centesimos(percentual_venda), _centesimos(margem),
+    )
+    if denominador <= 0:
+        raise MargemInviavel("Margem + impostos sobre a venda precisam somar menos de 100%.")
+    return Decimal(_arredondar(numerador, denominador)).scaleb(-2)
+
+
+def _coluna(valores):
+    """Sequência -> lista de inteiros em centésimos; valor único -> um inteiro (vale para todas as posições)."""
+    if isinstance(valores, (list, tuple, range, np.ndarray)):
+        return [_centesimos(valor) for valor in valores]
+    return _centesimos(valores)
+
+
+def precos_de_venda(custos, despesas_fixas, quantidades, percentuais_custo, percentuais_venda, margens):
+    """
+    Versão em lote do preco_de_venda: cada argumento é uma sequência
+    (uma posição por orçamento) ou um valor único, que vale para todas
+    as posições (ex.: o mesmo orçamento com várias margens). Retorna
+    uma lista de Decimal, com None onde a margem é inviável.
+
+    Roda em int64; se algum valor for grande demais para isso, cai
+    para inteiros Python (dtype=object), com o mesmo resultado.
+    """
+    colunas = [
+        _coluna(valores)
+        for valores in (custos, despesas_fixas, quantidades, percentuais_custo, percentuais_venda, margens)
+    ]
+    if isinstance(colunas[2], list):
+        colunas[2] = [quantidade if quantidade > 0 else 100 for quantidade in colunas[2]]
+    elif colunas[2] <= 0:
+        colunas[2] = 100
+    tamanhos = {len(coluna) for coluna in colunas if isinstance(coluna, list)}
+    if len(tamanhos) > 1:
+        raise ValueError("As sequências precisam ter o mesmo tamanho.")
+    tamanho = tamanhos.pop() if tamanhos else 1
+    if not tamanho:
+        return []
+
+    maior = [max(map(abs, coluna)) if isinstance(coluna, list) else abs(coluna) for coluna in colunas]
+    pior_caso = maior[0] * maior[2] * (10000 + maior[3]) + maior[1] * 1000000
+    pior_caso = max(pior_caso, maior[2] * (10000 + maior[4] + maior[5]))
+    tipo = np.int64 if 2 * pior_caso < LIMITE_INT64 else object
+    custo, fixas, quantidade, pct_custo, pct_venda, margem = (np.array(coluna, dtype=tipo) for coluna in colunas)
+
+    numerador, denominador = _fracao(custo, fixas, quantidade, pct_custo, pct_venda, margem)
+    numerador, denominador = np.broadcast_to(numerador, tamanho), np.broadcast_to(denominador, tamanho)
+    viaveis = denominador > 0
+    centavos = _arredondar(numerador, np.where(viaveis, denominador, 1))
+    return [
+        Decimal(int(valor)).scaleb(-2) if viavel else None
+        for valor, viavel in zip(centavos.tolist(), viaveis.tolist())
+    ]
+
+
+def faixa(inicio, fim, passo):
+    """Valores de 'inicio' a 'fim' (inclusive) de 'passo' em 'passo', exatos em 2 casas."""
+    valores = np.arange(_centesimos(inicio), _centesimos(fim) + 1, _centesimos(passo), dtype=np.int64)
+    return [Decimal(int(valor)).scaleb(-2) for valor in valores.tolist()]
+
+
+def curva_de_precos(orcamento, margens=None, quantidades=None):
+    """
+    Preço de venda do orçamento para cada margem OU cada quantidade
+    (o outro parâmetro fica com o valor atual do orçamento), numa
+    única conta vetorizada sobre os totais do cabeçalho.
+
+    Retorna [{'margem_lucro_percentual', 'quantidade', 'preco_venda',
+    'valor_total'}], com preço/valor None onde a margem é inviável.
+    """
+    margens = margens if margens is not None else [Decimal(orcamento.margem_lucro_percentual)]
+    quantidades = quantidades if quantidades is not None else [Decimal(orcamento.quantidade)]
+    if len(margens) > 1 and len(quantidades) > 1:
+        raise ValueError("Varie a margem ou a quantidade, não as duas.")
+    tamanho = max(len(margens), len(quantidades))
+    margens = margens * tamanho if len(margens) == 1 else margens
+    quantidades = quantidades * tamanho if len(quantidades) == 1 else quantidades
+
+    custo = Decimal(orcamento.custo_total_materias_primas) + Decimal(orcamento.custo_total_processos)
+    precos = precos_de_venda(
+        custo, orcamento.despesas_fixas, quantidades, orcamento.percentual_despesas_custo,
+        orcamento.percentual_despesas_venda, margens,
+    )
+    return [
+        {
+            'margem_lucro_percentual': margem,
+            'quantidade': quantidade,
+            'preco_venda': preco,
+            'valor_total': (preco * quantidade).quantize(CENTAVOS) if preco is not None else None,
+        }
+        for margem, quantidade, preco in zip(margens, quantidades, precos)
+    ]
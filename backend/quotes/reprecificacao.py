@@ -0,0 +1,244 @@
+# Em backend/quotes/reprecificacao.py
+"""
+Reprecificação dos orçamentos em aberto depois de mudanças de custo.
+
+Os orçamentos guardam uma CÓPIA do custo de cada componente
+(OrcamentoItemProduto.custo_unitario). Quando o custo_calculado de um
+produto muda (pricing.signals.custos_alterados), os orçamentos em
+rascunho/enviados que o usam ficam desatualizados.
+
+Fluxo:
+1. Cada alteração entra numa rodada (Reprecificacao) 'aguardando' da
+   empresa, com os custos ANTERIORES de cada produto (CustoAlterado:
+   o de antes da primeira alteração e os intermediários). Só
+   existe uma rodada aguardando por empresa: uma importação de 5.000
+   preços (ou 5.000 edições seguidas) cai toda na mesma rodada.
+2. A task só processa a rodada depois de REPRECIFICACAO_ESPERA
+   segundos sem novas alterações (debounce), limitado a
+   REPRECIFICACAO_ESPERA_MAXIMA desde a primeira. Uma varredura
+   periódica (Celery beat) reenfileira as rodadas que passaram da
+   hora, caso a task agendada tenha se perdido.
+3. Os orçamentos afetados saem do índice (componente, orcamento) e são
+   processados em lotes: linhas com bulk_update, totais com deltas e o
+   que mudou em cada orçamento fica em ItemReprecificacao.
+
+Só são atualizadas as linhas que ainda têm um dos custos anteriores
+(inclusive uma linha copiada no meio da rodada, com o custo
+intermediário): um custo ajustado à mão no orçamento não é sobrescrito.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from pricing.models import Produto
+from .models import Orcamento, OrcamentoItemProduto, Reprecificacao, CustoAlterado, ItemReprecificacao
+from .totais import arredondar, aplicar_deltas_em_lote
+
+# Só orçamentos ainda em negociação são reprecificados
+STATUS_EM_ABERTO = ('draft', 'sent')
+
+# Orçamentos por transação (cada lote trava só os seus cabeçalhos)
+TAMANHO_LOTE = 200
+
+logger = logging.getLogger(__name__)
+
+
+def registrar_custos_alterados(empresa_id, anteriores):
+    """
+    Junta as alterações ({produto_id: custo_anterior}) à rodada que
+    está aguardando na empresa, ou abre uma nova e agenda a task
+    (depois do commit). Retorna a Reprecificacao.
+
+    Cada custo anterior de um produto fica registrado (A -> B -> C na
+    mesma rodada guarda A e B): uma linha copiada com B também é
+    reprecificada.
+    """
+    if not anteriores:
+        return None
+    agora = timezone.now()
+    while True:
+        with transaction.atomic():
+            rodada, criada = Reprecificacao.objects.get_or_create(
+                empresa_id=empresa_id, status='aguardando', defaults={'ultima_alteracao': agora},
+            )
+            # A trava impede a task de começar a rodada no meio da inclusão
+            rodada = Reprecificacao.objects.select_for_update().filter(pk=rodada.pk, status='aguardando').first()
+            if rodada is None:
+                # Começou a rodar agora: as alterações vão para uma nova rodada
+                continue
+            CustoAlterado.objects.bulk_create(
+                [
+                    CustoAlterado(reprecificacao=rodada, produto_id=produto_id, custo_anterior=custo)
+                    for produto_id, custo in anteriores.items()
+                ],
+                ignore_conflicts=True,  # o mesmo custo anterior já está na rodada
+                batch_size=1000,
+            )
+            if criada:
+                transaction.on_commit(lambda: _agendar(rodada.id, settings.REPRECIFICACAO_ESPERA))
+            else:
+                rodada.ultima_alteracao = agora
+                rodada.save(update_fields=['ultima_alteracao'])
+            return rodada
+
+
+def _agendar(reprecificacao_id, segundos):
+    # Import tardio: quotes.tasks importa este módulo
+    from .tasks import reprecificar_orcamentos
+    try:
+        reprecificar_orcamentos.apply_async((reprecificacao_id,), countdown=segundos)
+    except Exception:
+        # Roda no on_commit: a alteração de custo já foi gravada e não pode
+        # falhar por causa do broker. A varredura (reagendar_atrasadas)
+        # enfileira a rodada depois.
+        logger.exception("Não foi possível agendar a reprecificação %s", reprecificacao_id)
+
+
+def espera_restante(rodada, agora=None):
+    """Segundos até a rodada poder rodar (0 se já pode)."""
+    agora = agora or timezone.now()
+    pronta_em = min(
+        rodada.ultima_alteracao + timedelta(seconds=settings.REPRECIFICACAO_ESPERA),
+        rodada.created_at + timedelta(seconds=settings.REPRECIFICACAO_ESPERA_MAXIMA),
+    )
+    return max((pronta_em - agora).total_seconds(), 0)
+
+
+def reagendar_atrasadas(agora=None):
+    """
+    Reenfileira as rodadas 'aguardando' que já podiam ter rodado (a task
+    agendada se perdeu: worker reiniciado, broker limpo...). Retorna
+    quantas foram reenfileiradas.
+
+    Uma task duplicada não tem efeito: iniciar_rodada só começa a rodada
+    que ainda está aguardando.
+    """
+    agora = agora or timezone.now()
+    atrasadas = list(
+        Reprecificacao.objects.filter(status='aguardando')
+        .filter(
+            Q(ultima_alteracao__lte=agora - timedelta(seconds=settings.REPRECIFICACAO_ESPERA))
+            | Q(created_at__lte=agora - timedelta(seconds=settings.REPRECIFICACAO_ESPERA_MAXIMA))
+        )
+        .values_list('id', flat=True)
+    )
+    for reprecificacao_id in atrasadas:
+        _agendar(reprecificacao_id, 0)
+    return len(atrasadas)
+
+
+def iniciar_rodada(reprecificacao_id, aguardar=True):
+    """
+    Passa a rodada de 'aguardando' para 'processando'.
+
+    Retorna (rodada, 0) se começou; (None, segundos) se ainda chegam
+    alterações e é preciso esperar mais; (None, 0) se a rodada não
+    está mais aguardando (já rodou ou foi apagada).
+    """
+    with transaction.atomic():
+        rodada = Reprecificacao.objects.select_for_update().filter(pk=reprecificacao_id, status='aguardando').first()
+        if rodada is None:
+            return None, 0
+        espera = espera_restante(rodada) if aguardar else 0
+        if espera:
+            return None, espera
+        rodada.status = 'processando'
+        rodada.save(update_fields=['status'])
+    return rodada, 0
+
+
+def executar_rodada(rodada, tamanho_lote=TAMANHO_LOTE):
+    """Reprecifica os orçamentos em aberto afetados pela rodada (já 'processando')."""
+    try:
+        produtos = rodada.custos.values('produto_id')
+        anteriores = defaultdict(set)
+        for produto_id, custo in rodada.custos.values_list('produto_id', 'custo_anterior'):
+            anteriores[produto_id].add(custo)
+        novos = {
+            produto_id: custo
+            for produto_id, custo in Produto.objects.filter(id__in=produtos).values_list('id', 'custo_calculado')
+            if anteriores[produto_id] - {custo}
+        }
+        orcamento_ids = list(
+            OrcamentoItemProduto.objects.filter(
+                componente_id__in=produtos,
+                orcamento__empresa_id=rodada.empresa_id, orcamento__status__in=STATUS_EM_ABERTO,
+            ).values_list('orcamento_id', flat=True).distinct().order_by('orcamento_id')
+        )
+
+        total_orcamentos = total_linhas = 0
+        for inicio in range(0, len(orcamento_ids), tamanho_lote):
+            orcamentos, linhas = _reprecificar_lote(
+                rodada, orcamento_ids[inicio:inicio + tamanho_lote], produtos, anteriores, novos,
+            )
+            total_orcamentos += orcamentos
+            total_linhas += linhas
+    except Exception as erro:
+        rodada.status = 'erro'
+        rodada.erro = str(erro)
+        rodada.concluido_em = timezone.now()
+        rodada.save(update_fields=['status', 'erro', 'concluido_em'])
+        raise
+
+    rodada.status = 'concluido'
+    rodada.total_produtos = len(novos)
+    rodada.total_orcamentos = total_orcamentos
+    rodada.total_linhas = total_linhas
+    rodada.concluido_em = timezone.now()
+    rodada.save(update_fields=['status', 'total_produtos', 'total_orcamentos', 'total_linhas', 'concluido_em'])
+    return rodada
+
+
+@transaction.atomic
+def _reprecificar_lote(rodada, orcamento_ids, produtos, anteriores, novos):
+    """
+    Um lote de orçamentos: trava os cabeçalhos, lê as linhas (depois
+    da trava), regrava as que ainda têm um custo anterior e aplica os
+    deltas nos totais. Número fixo de queries por lote.
+    Retorna (orçamentos alterados, linhas alteradas).
+    """
+    orcamentos = {
+        orcamento.id: orcamento
+        for orcamento in Orcamento.objects.select_for_update()
+        .filter(pk__in=orcamento_ids, status__in=STATUS_EM_ABERTO).order_by('id')
+    }
+    linhas = (
+        OrcamentoItemProduto.objects.filter(orcamento_id__in=orcamentos, componente_id__in=produtos)
+        .only('id', 'orcamento_id', 'componente_id', 'quantidade', 'custo_unitario', 'custo_total_item')
+    )
+
+    alteradas = []
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    contagem = defaultdict(int)
+    for linha in linhas:
+        novo = novos.get(linha.componente_id)
+        if novo is None or linha.custo_unitario == novo or linha.custo_unitario not in anteriores[linha.componente_id]:
+            continue
+        total = arredondar(linha.quantidade * novo)
+        deltas[linha.orcamento_id]['custo_total_materias_primas'] += total - linha.custo_total_item
+        linha.custo_unitario, linha.custo_total_item = novo, total
+        alteradas.append(linha)
+        contagem[linha.orcamento_id] += 1
+    if not alteradas:
+        return 0, 0
+    OrcamentoItemProduto.objects.bulk_update(alteradas, ['custo_unitario', 'custo_total_item'], batch_size=1000)
+
+    reprecificados = [orcamentos[orcamento_id] for orcamento_id in sorted(contagem)]
+    antes = {orcamento.id: (orcamento.custo_total_producao, orcamento.preco_venda_calculado) for orcamento in reprecificados}
+    aplicar_deltas_em_lote(reprecificados, deltas)
+
+    ItemReprecificacao.objects.bulk_create([
+        ItemReprecificacao(
+            reprecificacao=rodada, orcamento=orcamento, linhas_alteradas=contagem[orcamento.id],
+            custo_producao_anterior=antes[orcamento.id][0], custo_producao_novo=orcamento.custo_total_producao,
+            preco_venda_anterior=antes[orcamento.id][1], preco_venda_novo=orcamento.preco_venda_calculado,
+        )
+        for orcamento in reprecificados
+    ])
+    return len(reprecificados), len(alteradas)
@@ -0,0 +1,228 @@
+# Em backend/quotes/serializers.py
+from decimal import Decimal
+from rest_framework import serializers
+from pricing.models import Produto
+from .models import Orcamento, OrcamentoItemProduto, OrcamentoItemProcesso, OrcamentoItemDespesaImposto
+from .totais import ABAS
+
+
+class OrcamentoItemProdutoSerializer(serializers.ModelSerializer):
+    """Linha da aba de composição"""
+    class Meta:
+        model = OrcamentoItemProduto
+        fields = ['id', 'componente', 'descricao', 'quantidade', 'custo_unitario', 'custo_total_item']
+        read_only_fields = ['custo_total_item']
+
+
+class OrcamentoItemProcessoSerializer(serializers.ModelSerializer):
+    """Linha da aba de processos"""
+    class Meta:
+        model = OrcamentoItemProcesso
+        fields = ['id', 'descricao', 'horas', 'custo_hora', 'custo_total_item']
+        read_only_fields = ['custo_total_item']
+
+
+class OrcamentoItemDespesaImpostoSerializer(serializers.ModelSerializer):
+    """Linha da aba de despesas e impostos"""
+    class Meta:
+        model = OrcamentoItemDespesaImposto
+        fields = ['id', 'descricao', 'tipo', 'base_calculo', 'valor', 'custo_total_item']
+        read_only_fields = ['custo_total_item']
+
+
+class OrcamentoSerializer(serializers.ModelSerializer):
+    """Cabeçalho + "Aba de Totais" + as três abas de itens"""
+    produto_base_nome = serializers.CharField(source='produto_base.nome', read_only=True)
+    itens_produto = OrcamentoItemProdutoSerializer(many=True, read_only=True)
+    itens_processo = OrcamentoItemProcessoSerializer(many=True, read_only=True)
+    itens_despesa_imposto = OrcamentoItemDespesaImpostoSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Orcamento
+        fields = [
+            'id', 'empresa', 'produto_base', 'produto_base_nome', 'quantidade', 'descricao', 'status',
+            'custo_total_materias_primas', 'custo_total_processos', 'custo_total_despesas_impostos',
+            'custo_total_producao', 'margem_lucro_percentual', 'preco_venda_calculado', 'preco_venda_final',
+            'despesas_fixas', 'percentual_despesas_custo', 'percentual_despesas_venda',
+            'itens_produto', 'itens_processo', 'itens_despesa_imposto', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class NovoOrcamentoSerializer(serializers.Serializer):
+    """Parâmetros para criar um orçamento a partir da receita do produto"""
+    quantidade = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0.01'), default=Decimal('1')
+    )
+    margem_lucro_percentual = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=Decimal('0'), max_value=Decimal('99.99'), required=False
+    )
+    descricao = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    achatar = serializers.BooleanField(
+        default=False, help_text="Copiar só as matérias-primas/serviços de todos os níveis"
+    )
+
+
+class CriarOrcamentoSerializer(NovoOrcamentoSerializer):
+    """POST /orcamentos/: o produto_base e os mesmos parâmetros"""
+    produto_base = serializers.IntegerField()
+
+    def validate_produto_base(self, value):
+        produto = Produto.objects.filter(empresa=self.context['empresa'], id=value).first()
+        if produto is None:
+            raise serializers.ValidationError("Produto não encontrado na sua empresa.")
+        return produto
+
+
+class ClonarOrcamentoSerializer(serializers.Serializer):
+    """Descrição da cópia (padrão: a do original + "(cópia)")"""
+    descricao = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+
+class OrcamentoListaSerializer(serializers.ModelSerializer):
+    """Linha da lista de orçamentos (sem as abas; nome e valor vêm anotados na query)"""
+    produto_base_nome = serializers.CharField(read_only=True)
+    valor_total = serializers.DecimalField(max_digits=22, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Orcamento
+        fields = [
+            'id', 'produto_base', 'produto_base_nome', 'quantidade', 'descricao', 'status',
+            'custo_total_producao', 'margem_lucro_percentual', 'preco_venda_final', 'valor_total',
+            'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class CabecalhoOrcamentoSerializer(serializers.ModelSerializer):
+    """Campos editáveis do cabeçalho (os totais são sempre recalculados)"""
+    class Meta:
+        model = Orcamento
+        fields = ['quantidade', 'descricao', 'status', 'margem_lucro_percentual', 'preco_venda_final']
+        extra_kwargs = {
+            'quantidade': {'min_value': Decimal('0.01')},
+            'margem_lucro_percentual': {'min_value': Decimal('0'), 'max_value': Decimal('99.99')},
+            'preco_venda_final': {'min_value': Decimal('0')},
+        }
+
+
+# --- Edição em lote (várias abas numa requisição) ---
+
+class LinhaLoteMixin:
+    """Com 'id' altera só os campos enviados; sem 'id' cria a linha (e exige os campos básicos)."""
+    obrigatorios_na_criacao = ()
+
+    def validate(self, data):
+        if 'id' not in data:
+            faltando = [campo for campo in self.obrigatorios_na_criacao if campo not in data]
+            if faltando:
+                raise serializers.ValidationError({campo: "Obrigatório para criar uma linha." for campo in faltando})
+        return data
+
+
+class ItemProdutoLoteSerializer(LinhaLoteMixin, OrcamentoItemProdutoSerializer):
+    id = serializers.IntegerField(required=False)
+    # Validado em lote (uma query para todas as linhas) no EdicaoLoteSerializer
+    componente = serializers.IntegerField(required=False)
+    obrigatorios_na_criacao = ('componente', 'descricao', 'quantidade', 'custo_unitario')
+
+
+class ItemProcessoLoteSerializer(LinhaLoteMixin, OrcamentoItemProcessoSerializer):
+    id = serializers.IntegerField(required=False)
+    obrigatorios_na_criacao = ('descricao',)
+
+
+class ItemDespesaImpostoLoteSerializer(LinhaLoteMixin, OrcamentoItemDespesaImpostoSerializer):
+    id = serializers.IntegerField(required=False)
+    obrigatorios_na_criacao = ('descricao', 'valor')
+
+
+class ExclusoesLoteSerializer(serializers.Serializer):
+    """Ids das linhas a excluir, por aba"""
+    itens_produto = serializers.ListField(child=serializers.IntegerField(), required=False)
+    itens_processo = serializers.ListField(child=serializers.IntegerField(), required=False)
+    itens_despesa_imposto = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class EdicaoLoteSerializer(serializers.Serializer):
+    """
+    Várias edições de um orçamento numa requisição só (ex.: tudo o que o
+    usuário mudou na tela desde o último salvamento):
+
+        {"cabecalho": {"margem_lucro_percentual": "25"},
+         "itens_produto": [{"id": 10, "quantidade": "3"}, {"componente": 7, "descricao": "...", ...}],
+         "itens_processo": [...], "itens_despesa_imposto": [...],
+         "excluir": {"itens_produto": [11, 12]}}
+
+    Use com partial=True: nas linhas existentes só vão os campos mudados.
+    """
+    cabecalho = CabecalhoOrcamentoSerializer(required=False)
+    itens_produto = ItemProdutoLoteSerializer(many=True, required=False)
+    itens_processo = ItemProcessoLoteSerializer(many=True, required=False)
+    itens_despesa_imposto = ItemDespesaImpostoLoteSerializer(many=True, required=False)
+    excluir = ExclusoesLoteSerializer(required=False)
+
+    def validate(self, data):
+        excluir = data.get('excluir', {})
+        for aba in ABAS:
+            ids = [linha['id'] for linha in data.get(aba, []) if 'id' in linha]
+            if len(ids) != len(set(ids)):
+                raise serializers.ValidationError({aba: "A mesma linha aparece mais de uma vez."})
+            if set(ids) & set(excluir.get(aba, [])):
+                raise serializers.ValidationError({aba: "Uma linha não pode ser alterada e excluída ao mesmo tempo."})
+
+        # Componentes: todos da empresa, conferidos numa query só
+        componentes = {linha['componente'] for linha in data.get('itens_produto', []) if 'componente' in linha}
+        if componentes:
+            encontrados = set(
+                Produto.objects.filter(empresa=self.context['empresa'], id__in=componentes).values_list('id', flat=True)
+            )
+            if componentes - encontrados:
+                raise serializers.ValidationError(
+                    {'itens_produto': f"Componentes não encontrados na sua empresa: {sorted(componentes - encontrados)}"}
+                )
+            for linha in data['itens_produto']:
+                if 'componente' in linha:
+                    linha['componente_id'] = linha.pop('componente')
+        return data
+
+
+class CurvaPrecoSerializer(serializers.Serializer):
+    """
+    Parâmetros da curva de preços: ?variar=margem (padrão, de 5% a 60%
+    de 0,5 em 0,5) ou ?variar=quantidade (padrão de 1 a 100, de 1 em 1).
+    """
+    PADROES = {
+        'margem': (Decimal('5'), Decimal('60'), Decimal('0.5')),
+        'quantidade': (Decimal('1'), Decimal('100'), Decimal('1')),
+    }
+    MAX_PONTOS = 2000
+
+    variar = serializers.ChoiceField(choices=['margem', 'quantidade'], default='margem')
+    de = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    ate = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    passo = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'), required=False)
+
+    def validate(self, data):
+        de, ate, passo = self.PADROES[data['variar']]
+        data.setdefault('de', de)
+        data.setdefault('ate', ate)
+        data.setdefault('passo', passo)
+        if data['ate'] < data['de']:
+            raise serializers.ValidationError({'ate': "Deve ser maior ou igual a 'de'."})
+        if data['variar'] == 'quantidade' and data['de'] <= 0:
+            raise serializers.ValidationError({'de': "A quantidade deve ser maior que zero."})
+        if (data['ate'] - data['de']) / data['passo'] >= self.MAX_PONTOS:
+            raise serializers.ValidationError(f"No máximo {self.MAX_PONTOS} pontos por curva.")
+        return data
+
+
+class IndicadoresSerializer(serializers.Serializer):
+    """Período dos indicadores: ?de=2026-01&ate=2026-06 (meses inclusive)."""
+    de = serializers.DateField(input_formats=['%Y-%m', '%Y-%m-%d'], required=False)
+    ate = serializers.DateField(input_formats=['%Y-%m', '%Y-%m-%d'], required=False)
+
+    def validate(self, data):
+        if data.get('de') and data.get('ate') and data['ate'] < data['de']:
+            raise serializers.ValidationError({'ate': "Deve ser maior ou igual a 'de'."})
+        return data
@@ -0,0 +1,11 @@
+# Em backend/quotes/signals.py
+from django.dispatch import receiver
+
+from pricing.signals import custos_alterados
+from .reprecificacao import registrar_custos_alterados
+
+
+@receiver(custos_alterados)
+def agendar_reprecificacao(sender, empresa_id, anteriores, **kwargs):
+    """Custos mudaram: os orçamentos em aberto da empresa entram na fila de reprecificação."""
+    registrar_custos_alterados(empresa_id, anteriores)
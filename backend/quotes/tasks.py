@@ -0,0 +1,65 @@
+# Em backend/quotes/tasks.py
+from celery import shared_task
+from django.utils import timezone
+
+from .compras import gerar_necessidades_compra
+from .documentos import renderizar_documento
+from .reprecificacao import iniciar_rodada, executar_rodada, reagendar_atrasadas
+from .models import NecessidadeCompra
+
+
+@shared_task
+def calcular_necessidades_compra(empresa_id, necessidade_id=None):
+    """
+    Gera (em segundo plano) a necessidade de compras de todos os
+    orçamentos aprovados da empresa. Retorna o id do NecessidadeCompra.
+    """
+    # O cabeçalho existe antes do cálculo: se algo falhar, ele fica com 'erro'
+    if necessidade_id:
+        necessidade = NecessidadeCompra.objects.get(id=necessidade_id)
+    else:
+        necessidade = NecessidadeCompra.objects.create(empresa_id=empresa_id)
+
+    try:
+        gerar_necessidades_compra(empresa_id, necessidade)
+    except Exception as erro:
+        necessidade.status = 'erro'
+        necessidade.erro = str(erro)
+        necessidade.concluido_em = timezone.now()
+        necessidade.save(update_fields=['status', 'erro', 'concluido_em'])
+        raise
+    return necessidade.id
+
+
+@shared_task
+def reprecificar_orcamentos(reprecificacao_id):
+    """
+    Processa uma rodada de reprecificação (quotes.reprecificacao).
+    Enquanto chegam alterações de custo, só se reagenda (debounce).
+    Retorna o id da rodada processada, ou None.
+    """
+    rodada, espera = iniciar_rodada(reprecificacao_id)
+    if espera:
+        reprecificar_orcamentos.apply_async((reprecificacao_id,), countdown=espera)
+    if rodada is None:
+        return None
+    return executar_rodada(rodada).id
+
+
+@shared_task
+def reagendar_reprecificacoes():
+    """
+    Varredura periódica (CELERY_BEAT_SCHEDULE): reenfileira as rodadas
+    de reprecificação que passaram da hora. Retorna quantas.
+    """
+    return reagendar_atrasadas()
+
+
+@shared_task
+def gerar_documento_orcamento(documento_id):
+    """
+    Renderiza e grava o documento de um orçamento (quotes.documentos).
+    Retorna o id do DocumentoOrcamento, ou None se não precisou gerar.
+    """
+    documento = renderizar_documento(documento_id)
+    return documento.id if documento else None
@@ -1,3 +1,707 @@
-from django.test import TestCase
+from decimal import Decimal
+from fractions import Fraction
+import io
+import random
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from users.models import Empresa
+from pricing.grafo import CicloNaComposicao
+from pricing.alcance import reconstruir_alcance
+from pricing.custos import recalcular_custos_empresa
+from pricing.models import Produto, Composicao, ItemComposicao
+from .criacao import criar_orcamento
+from .documentos import renderizar_documento
+from .models import (
+    Orcamento, OrcamentoItemProduto, OrcamentoItemProcesso, OrcamentoItemDespesaImposto, Reprecificacao, DocumentoOrcamento, IndicadorMensal, NecessidadeCompra,
+)
+from .precificacao import MargemInviavel, preco_de_venda, precos_de_venda
+from .reprecificacao import iniciar_rodada, executar_rodada, reagendar_atrasadas
+from .tasks import calcular_necessidades_compra, gerar_documento_orcamento, reprecificar_orcamentos
+from .totais import CAMPOS_DELTA, CAMPOS_DERIVADOS, aplicar_alteracoes, reconstruir_totais
+
+
+def preco_exato(custo, fixas, quantidade, pct_custo, pct_venda, margem):
+    """Referência: a mesma fórmula com frações exatas."""
+    custo, quantidade = Fraction(custo), Fraction(quantidade)
+    base = custo + Fraction(fixas) / quantidade + custo * Fraction(pct_custo) / 100
+    preco = base / (1 - (Fraction(margem) + Fraction(pct_venda)) / 100)
+    centavos = preco * 100
+    inteiro = centavos.numerator // centavos.denominator
+    if centavos - inteiro >= Fraction(1, 2):
+        inteiro += 1
+    return Decimal(inteiro).scaleb(-2)
+
+
+class PrecificacaoTests(SimpleTestCase):
+    """O preço "por dentro" tem que bater no centavo com a conta exata, um a um ou em lote."""
+
+    def test_exemplo(self):
+        # 131,50 / 0,62 = 212,0967...
+        preco = preco_de_venda(Decimal('115'), Decimal('50'), Decimal('10'), Decimal('10'), Decimal('18'), Decimal('20'))
+        self.assertEqual(preco, Decimal('212.10'))
+
+    def test_meio_centavo_arredonda_para_cima(self):
+        # 0,03 / 0,8 = 0,0375 -> 0,04; 0,01 / 0,8 = 0,0125 -> 0,01
+        self.assertEqual(preco_de_venda(Decimal('0.03'), 0, 1, 0, 0, Decimal('20')), Decimal('0.04'))
+        self.assertEqual(preco_de_venda(Decimal('0.01'), 0, 1, 0, 0, Decimal('20')), Decimal('0.01'))
+        # 0,05 / 0,4 = 0,125 -> 0,13
+        self.assertEqual(preco_de_venda(Decimal('0.05'), 0, 1, 0, Decimal('30'), Decimal('30')), Decimal('0.13'))
+
+    def test_margem_inviavel(self):
+        with self.assertRaises(MargemInviavel):
+            preco_de_venda(Decimal('10'), 0, 1, 0, Decimal('30'), Decimal('70'))
+        self.assertEqual(precos_de_venda([10, 10], [0, 0], [1, 1], [0, 0], [30, 0], [70, 20]), [None, Decimal('12.50')])
+
+    def test_lote_igual_ao_exato(self):
+        sorteio = random.Random(42)
+        linhas = [
+            (
+                Decimal(sorteio.randint(0, 10 ** 7)).scaleb(-2), Decimal(sorteio.randint(0, 10 ** 6)).scaleb(-2),
+                Decimal(sorteio.randint(1, 10 ** 5)).scaleb(-2), Decimal(sorteio.randint(0, 3000)).scaleb(-2),
+                Decimal(sorteio.randint(0, 4000)).scaleb(-2), Decimal(sorteio.randint(0, 5000)).scaleb(-2),
+            )
+            for _ in range(2000)
+        ]
+        esperado = [preco_exato(*linha) for linha in linhas]
+        self.assertEqual(precos_de_venda(*zip(*linhas)), esperado)
+        self.assertEqual([preco_de_venda(*linha) for linha in linhas], esperado)
+
+    def test_valores_grandes_nao_estouram(self):
+        linha = (Decimal('9999999999.99'), Decimal('9999999999.99'), Decimal('99999999.99'), Decimal('99.99'), 0, 0)
+        self.assertEqual(precos_de_venda(*([valor] for valor in linha)), [preco_exato(*linha)])
+
+
+@override_settings(EMPRESA_CACHE_TTL=0)
+class OrcamentoApiTests(APITestCase):
+    """Detalhe com número fixo de queries e edição em lote com UM recálculo."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        self.chapa = Produto.objects.create(
+            empresa=self.empresa, nome='Chapa', codigo_sku='CH', tipo='MP', unidade_medida='m2',
+            preco_custo=Decimal('10'), custo_calculado=Decimal('10'),
+        )
+        self.parafuso = Produto.objects.create(
+            empresa=self.empresa, nome='Parafuso', codigo_sku='PF', tipo='MP', unidade_medida='un',
+            preco_custo=Decimal('0.5'), custo_calculado=Decimal('0.5'),
+        )
+        self.armario = Produto.objects.create(
+            empresa=self.empresa, nome='Armário', codigo_sku='AR', tipo='PA', unidade_medida='un',
+        )
+        composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=self.armario)
+        ItemComposicao.objects.bulk_create([
+            ItemComposicao(composicao=composicao, componente=self.chapa, quantidade=Decimal('6')),
+            ItemComposicao(composicao=composicao, componente=self.parafuso, quantidade=Decimal('20')),
+        ])
+        resposta = self.client.post(
+            '/api/orcamentos/', {'produto_base': self.armario.id, 'quantidade': '10'}, format='json'
+        )
+        self.assertEqual(resposta.status_code, 201)
+        self.orcamento = resposta.data
+
+    def test_criado_a_partir_da_receita(self):
+        self.assertEqual(len(self.orcamento['itens_produto']), 2)
+        self.assertEqual(self.orcamento['custo_total_materias_primas'], '70.00')
+        # 70 / (1 - 20%)
+        self.assertEqual(self.orcamento['preco_venda_final'], '87.50')
+
+    def test_detalhe_em_numero_fixo_de_queries(self):
+        # empresa + orçamento (com o produto) + as 3 abas
+        with self.assertNumQueries(5):
+            resposta = self.client.get(f"/api/orcamentos/{self.orcamento['id']}/")
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_lista_anotada(self):
+        resposta = self.client.get('/api/orcamentos/')
+        linha = resposta.data['results'][0]
+        self.assertEqual(linha['produto_base_nome'], 'Armário')
+        self.assertEqual(linha['valor_total'], '875.00')
+
+    def test_edicao_em_lote_recalcula_uma_vez(self):
+        chapa, parafuso = self.orcamento['itens_produto']
+        corpo = {
+            'cabecalho': {'margem_lucro_percentual': '25'},
+            'itens_produto': [{'id': chapa['id'], 'quantidade': '7'}],
+            'itens_processo': [{'descricao': 'Montagem', 'horas': '1.5', 'custo_hora': '30'}],
+            'itens_despesa_imposto': [
+                {'descricao': 'Frete', 'tipo': 'fixo', 'valor': '50'},
+                {'descricao': 'ICMS', 'tipo': 'percentual', 'base_calculo': 'venda', 'valor': '18'},
+            ],
+            'excluir': {'itens_produto': [parafuso['id']]},
+        }
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.patch(f"/api/orcamentos/{self.orcamento['id']}/itens/", corpo, format='json')
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        atualizacoes = [q for q in contexto.captured_queries if q['sql'].startswith('UPDATE "quotes_orcamento" ')]
+        self.assertEqual(len(atualizacoes), 1)
+
+        # (70 + 45 + 50/10) / (1 - 43%) = 210,526...
+        self.assertEqual(resposta.data['preco_venda_calculado'], '210.53')
+        self.assertEqual([item['descricao'] for item in resposta.data['itens_produto']], ['Chapa'])
+        self.assertEqual(resposta.data['itens_despesa_imposto'][0]['custo_total_item'], '5.00')
+
+        # O resultado por deltas é o mesmo de somar tudo de novo
+        reconstruido = reconstruir_totais(self.orcamento['id'])
+        self.assertEqual(str(reconstruido.preco_venda_calculado), resposta.data['preco_venda_calculado'])
+        self.assertEqual(str(reconstruido.custo_total_despesas_impostos), resposta.data['custo_total_despesas_impostos'])
+
+    def test_despesas_regravadas_arredondam_como_as_novas(self):
+        url = f"/api/orcamentos/{self.orcamento['id']}/itens/"
+        # Frete de 50,25 rateado em 10 unidades: 5,025 -> 5,03 (meio para cima)
+        corpo = {'itens_despesa_imposto': [
+            {'descricao': 'Frete', 'tipo': 'fixo', 'valor': '50.25'},
+            {'descricao': 'Taxa', 'tipo': 'percentual', 'base_calculo': 'custo', 'valor': '1.5'},
+        ]}
+        resposta = self.client.patch(url, corpo, format='json')
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        novas = {linha['descricao']: linha['custo_total_item'] for linha in resposta.data['itens_despesa_imposto']}
+        self.assertEqual(novas['Frete'], '5.03')
+
+        # Regravadas (todas as bases) a partir do cabeçalho: mesmo valor
+        reconstruir_totais(self.orcamento['id'])
+        regravadas = dict(OrcamentoItemDespesaImposto.objects.values_list('descricao', 'custo_total_item'))
+        self.assertEqual({descricao: str(valor) for descricao, valor in regravadas.items()}, novas)
+
+    def test_lote_rejeita_linha_de_outro_orcamento(self):
+        resposta = self.client.patch(
+            f"/api/orcamentos/{self.orcamento['id']}/itens/",
+            {'itens_processo': [{'id': 999, 'horas': '2'}]}, format='json',
+        )
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_clonar_em_numero_fixo_de_queries(self):
+        url = f"/api/orcamentos/{self.orcamento['id']}/"
+        linhas = [{'descricao': f'Processo {i}', 'horas': '1', 'custo_hora': '10'} for i in range(30)]
+        self.client.patch(url + 'itens/', {'itens_processo': linhas[:2]}, format='json')
+        with CaptureQueriesContext(connection) as poucas:
+            self.client.post(url + 'clonar/', {}, format='json')
+
+        original = self.client.patch(url + 'itens/', {'itens_processo': linhas[2:]}, format='json').data
+        with CaptureQueriesContext(connection) as muitas:
+            resposta = self.client.post(url + 'clonar/', {'descricao': 'Modelo'}, format='json')
+        self.assertEqual(len(poucas), len(muitas))
+
+        copia = resposta.data
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual((copia['descricao'], copia['status']), ('Modelo', 'draft'))
+        self.assertEqual(copia['preco_venda_final'], original['preco_venda_final'])
+        for aba in ('itens_produto', 'itens_processo', 'itens_despesa_imposto'):
+            sem_id = lambda linhas: [{**linha, 'id': None} for linha in linhas]
+            self.assertEqual(sem_id(copia[aba]), sem_id(original[aba]))
+        self.assertEqual(len(copia['itens_processo']), 30)
+
+    def test_clonar_sem_insert_select(self):
+        # Bancos fora de BANCOS_INSERT_SELECT copiam em lotes (aqui de 7 linhas)
+        url = f"/api/orcamentos/{self.orcamento['id']}/"
+        linhas = [{'descricao': f'Processo {i}', 'horas': '1', 'custo_hora': '10'} for i in range(30)]
+        original = self.client.patch(url + 'itens/', {'itens_processo': linhas}, format='json').data
+        with mock.patch('quotes.clonagem.BANCOS_INSERT_SELECT', ()), mock.patch('quotes.clonagem.TAMANHO_LOTE', 7), \
+                mock.patch('quotes.clonagem._copiar_insert_select') as insert_select:
+            resposta = self.client.post(url + 'clonar/', {}, format='json')
+        insert_select.assert_not_called()
+
+        copia = resposta.data
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(copia['preco_venda_final'], original['preco_venda_final'])
+        for aba in ('itens_produto', 'itens_processo', 'itens_despesa_imposto'):
+            sem_id = lambda linhas: [{**linha, 'id': None} for linha in linhas]
+            self.assertEqual(sem_id(copia[aba]), sem_id(original[aba]))
+        self.assertEqual(len(copia['itens_processo']), 30)
+
+    def test_curva_de_margens(self):
+        self.client.patch(
+            f"/api/orcamentos/{self.orcamento['id']}/itens/",
+            {'itens_despesa_imposto': [{'descricao': 'ICMS', 'tipo': 'percentual', 'base_calculo': 'venda', 'valor': '18'}]},
+            format='json',
+        )
+        with self.assertNumQueries(2):
+            resposta = self.client.get(f"/api/orcamentos/{self.orcamento['id']}/curva/")
+        pontos = resposta.data['pontos']
+        self.assertEqual(len(pontos), 111)
+        self.assertEqual((pontos[0]['margem_lucro_percentual'], pontos[-1]['margem_lucro_percentual']), ('5.00', '60.00'))
+        # A margem atual (20%) bate com o preço gravado
+        atual = next(ponto for ponto in pontos if ponto['margem_lucro_percentual'] == '20.00')
+        self.assertEqual(atual['preco_venda'], resposta.data['preco_venda_atual'])
+
+    def test_curva_de_quantidades(self):
+        self.client.patch(
+            f"/api/orcamentos/{self.orcamento['id']}/itens/",
+            {'itens_despesa_imposto': [{'descricao': 'Frete', 'tipo': 'fixo', 'valor': '100'}]}, format='json',
+        )
+        resposta = self.client.get(f"/api/orcamentos/{self.orcamento['id']}/curva/?variar=quantidade&de=1&ate=10&passo=9")
+        # (70 + 100/q) / 0,8
+        self.assertEqual([ponto['preco_venda'] for ponto in resposta.data['pontos']], ['212.50', '100.00'])
+        self.assertEqual(resposta.data['pontos'][1]['valor_total'], '1000.00')
+
+
+@override_settings(EMPRESA_CACHE_TTL=0, REPRECIFICACAO_ESPERA=60)
+class ReprecificacaoTests(APITestCase):
+    """Alterações de custo se juntam numa rodada só e atualizam só as cópias (não os ajustes manuais)."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        self.chapa = Produto.objects.create(
+            empresa=self.empresa, nome='Chapa', codigo_sku='CH', tipo='MP', unidade_medida='m2',
+            preco_custo=Decimal('10'), custo_calculado=Decimal('10'),
+        )
+        self.armario = Produto.objects.create(
+            empresa=self.empresa, nome='Armário', codigo_sku='AR', tipo='PA', unidade_medida='un',
+        )
+        composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=self.armario)
+        ItemComposicao.objects.create(composicao=composicao, componente=self.chapa, quantidade=Decimal('6'))
+        self.orcamentos = [
+            self.client.post('/api/orcamentos/', {'produto_base': self.armario.id}, format='json').data['id']
+            for _ in range(3)
+        ]
+        Orcamento.objects.filter(pk=self.orcamentos[2]).update(status='approved')
+        # Custo ajustado à mão no segundo orçamento
+        linha = OrcamentoItemProduto.objects.get(orcamento_id=self.orcamentos[1])
+        self.client.patch(
+            f'/api/orcamentos/{self.orcamentos[1]}/itens/',
+            {'itens_produto': [{'id': linha.id, 'custo_unitario': '9'}]}, format='json',
+        )
+
+    def test_alteracoes_seguidas_viram_uma_rodada(self):
+        for preco in ('11', '12', '13'):
+            self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': preco}, format='json')
+
+        rodada = Reprecificacao.objects.get()
+        self.assertEqual(rodada.status, 'aguardando')
+        # O custo de ANTES da primeira alteração e os intermediários
+        self.assertEqual(
+            sorted(rodada.custos.values_list('custo_anterior', flat=True)),
+            [Decimal('10'), Decimal('11'), Decimal('12')],
+        )
+        # Ainda dentro da espera: não roda
+        iniciada, espera = iniciar_rodada(rodada.id)
+        self.assertIsNone(iniciada)
+        self.assertGreater(espera, 0)
+
+        rodada, _ = iniciar_rodada(rodada.id, aguardar=False)
+        executar_rodada(rodada)
+
+        rodada.refresh_from_db()
+        self.assertEqual((rodada.status, rodada.total_orcamentos, rodada.total_linhas), ('concluido', 1, 1))
+        custos = dict(OrcamentoItemProduto.objects.values_list('orcamento_id', 'custo_unitario'))
+        self.assertEqual(custos[self.orcamentos[0]], Decimal('13'))
+        self.assertEqual(custos[self.orcamentos[1]], Decimal('9'))   # ajuste manual
+        self.assertEqual(custos[self.orcamentos[2]], Decimal('10'))  # aprovado
+        # 6 x 13 / 0,8
+        self.assertEqual(Orcamento.objects.get(pk=self.orcamentos[0]).preco_venda_calculado, Decimal('97.50'))
+        item = rodada.itens.get()
+        self.assertEqual((item.preco_venda_anterior, item.preco_venda_novo), (Decimal('75.00'), Decimal('97.50')))
+
+    def test_linha_copiada_no_meio_da_rodada_tambem_e_reprecificada(self):
+        self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': '11'}, format='json')
+        # Orçamento criado com o custo intermediário (11), antes da rodada rodar
+        novo = self.client.post('/api/orcamentos/', {'produto_base': self.armario.id}, format='json').data['id']
+        self.assertEqual(OrcamentoItemProduto.objects.get(orcamento_id=novo).custo_unitario, Decimal('11'))
+        self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': '12'}, format='json')
+
+        rodada, _ = iniciar_rodada(Reprecificacao.objects.get().id, aguardar=False)
+        executar_rodada(rodada)
+
+        rodada.refresh_from_db()
+        self.assertEqual((rodada.total_orcamentos, rodada.total_linhas), (2, 2))
+        custos = dict(OrcamentoItemProduto.objects.values_list('orcamento_id', 'custo_unitario'))
+        self.assertEqual(custos[self.orcamentos[0]], Decimal('12'))
+        self.assertEqual(custos[novo], Decimal('12'))
+        self.assertEqual(custos[self.orcamentos[1]], Decimal('9'))   # ajuste manual
+
+    def test_falha_no_broker_fica_para_a_varredura(self):
+        with mock.patch.object(reprecificar_orcamentos, 'apply_async', side_effect=ConnectionError('broker fora')), \
+                self.assertLogs('quotes.reprecificacao', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': '13'}, format='json')
+
+        # A alteração de custo foi gravada mesmo sem o agendamento
+        self.assertEqual(resposta.status_code, 200)
+        self.chapa.refresh_from_db()
+        self.assertEqual(self.chapa.custo_calculado, Decimal('13'))
+        rodada = Reprecificacao.objects.get()
+        self.assertEqual(rodada.status, 'aguardando')
+
+        Reprecificacao.objects.filter(pk=rodada.pk).update(ultima_alteracao=rodada.ultima_alteracao - timedelta(seconds=61))
+        with mock.patch.object(reprecificar_orcamentos, 'apply_async') as enfileirar:
+            self.assertEqual(reagendar_atrasadas(), 1)
+        enfileirar.assert_called_once_with((rodada.id,), countdown=0)
+
+    def test_varredura_reenfileira_so_as_rodadas_atrasadas(self):
+        self.client.patch(f'/api/produtos/{self.chapa.id}/', {'preco_custo': '13'}, format='json')
+        rodada = Reprecificacao.objects.get()
+
+        with mock.patch.object(reprecificar_orcamentos, 'apply_async') as enfileirar:
+            self.assertEqual(reagendar_atrasadas(), 0)
+            # A task agendada se perdeu e a espera já passou
+            Reprecificacao.objects.filter(pk=rodada.pk).update(ultima_alteracao=rodada.ultima_alteracao - timedelta(seconds=61))
+            self.assertEqual(reagendar_atrasadas(), 1)
+        enfileirar.assert_called_once_with((rodada.id,), countdown=0)
+
+        self.assertEqual(reprecificar_orcamentos(rodada.id), rodada.id)
+        rodada.refresh_from_db()
+        self.assertEqual((rodada.status, rodada.total_orcamentos), ('concluido', 1))
+        self.assertEqual(reagendar_atrasadas(), 0)
+
+
+@override_settings(EMPRESA_CACHE_TTL=0)
+class DocumentoOrcamentoTests(APITestCase):
+    """O documento é gerado uma vez por conteúdo e servido do storage nas repetições."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        chapa = Produto.objects.create(
+            empresa=self.empresa, nome='Chapa', codigo_sku='CH', tipo='MP', unidade_medida='m2',
+            preco_custo=Decimal('10'), custo_calculado=Decimal('10'),
+        )
+        armario = Produto.objects.create(
+            empresa=self.empresa, nome='Armário', codigo_sku='AR', tipo='PA', unidade_medida='un',
+        )
+        composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=armario)
+        ItemComposicao.objects.create(composicao=composicao, componente=chapa, quantidade=Decimal('6'))
+        self.orcamento_id = self.client.post('/api/orcamentos/', {'produto_base': armario.id}, format='json').data['id']
+        self.url = f'/api/orcamentos/{self.orcamento_id}/documento/'
+
+    def test_gera_uma_vez_por_conteudo(self):
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 202)
+        self.client.get(self.url)
+        documento = DocumentoOrcamento.objects.get()
+        renderizar_documento(documento.id)
+
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('Armário', b''.join(resposta.streaming_content).decode())
+        self.assertEqual(DocumentoOrcamento.objects.count(), 1)
+
+        # Mudou o orçamento: novo documento; o antigo sai quando o novo fica pronto
+        self.client.patch(f'/api/orcamentos/{self.orcamento_id}/', {'margem_lucro_percentual': '30'}, format='json')
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        novo = DocumentoOrcamento.objects.get(status='processando')
+        self.assertNotEqual(novo.hash_conteudo, documento.hash_conteudo)
+        renderizar_documento(novo.id)
+        self.assertEqual(list(DocumentoOrcamento.objects.values_list('id', flat=True)), [novo.id])
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(DOCUMENTO_TIMEOUT=300)
+    def test_processando_ha_muito_tempo_e_agendado_de_novo(self):
+        with mock.patch.object(gerar_documento_orcamento, 'delay') as agendar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(self.url)
+            documento = DocumentoOrcamento.objects.get()
+            # Dentro do prazo: a task original ainda pode rodar
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.get(self.url).status_code, 202)
+            self.assertEqual(agendar.call_count, 1)
+
+            DocumentoOrcamento.objects.filter(pk=documento.pk).update(
+                iniciado_em=documento.iniciado_em - timedelta(seconds=301),
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.get(self.url).status_code, 202)
+        self.assertEqual(agendar.call_args_list, [mock.call(documento.id)] * 2)
+
+        # As duas tasks rodam: só a primeira grava
+        self.assertEqual(renderizar_documento(documento.id), documento)
+        self.assertIsNone(renderizar_documento(documento.id))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_limpeza_nao_apaga_documento_em_processamento(self):
+        self.client.get(self.url)
+        primeiro = DocumentoOrcamento.objects.get()
+        renderizar_documento(primeiro.id)
+        for margem in ('30', '35'):
+            self.client.patch(f'/api/orcamentos/{self.orcamento_id}/', {'margem_lucro_percentual': margem}, format='json')
+            self.client.get(self.url)
+        intermediario, atual = DocumentoOrcamento.objects.filter(status='processando').order_by('id')
+
+        renderizar_documento(atual.id)
+        self.assertEqual(
+            sorted(DocumentoOrcamento.objects.values_list('id', 'status')),
+            [(intermediario.id, 'processando'), (atual.id, 'concluido')],
+        )
+        # A task do intermediário vê que o orçamento mudou e se apaga
+        self.assertIsNone(renderizar_documento(intermediario.id))
+        self.assertEqual(list(DocumentoOrcamento.objects.values_list('id', flat=True)), [atual.id])
+
+
+@override_settings(EMPRESA_CACHE_TTL=0)
+class IndicadoresTests(APITestCase):
+    """Os indicadores acompanham criação, edição e exclusão e batem com a reconstrução."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        chapa = Produto.objects.create(
+            empresa=self.empresa, nome='Chapa', codigo_sku='CH', tipo='MP', unidade_medida='m2',
+            preco_custo=Decimal('10'), custo_calculado=Decimal('10'),
+        )
+        armario = Produto.objects.create(
+            empresa=self.empresa, nome='Armário', codigo_sku='AR', tipo='PA', unidade_medida='un',
+        )
+        composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=armario)
+        ItemComposicao.objects.create(composicao=composicao, componente=chapa, quantidade=Decimal('6'))
+        # Custo 60; margem 20% -> 75,00 por unidade
+        self.orcamentos = [
+            self.client.post('/api/orcamentos/', {'produto_base': armario.id, 'quantidade': '2'}, format='json').data['id']
+            for _ in range(4)
+        ]
+
+    def indicadores(self):
+        return {
+            status: (quantidade, soma_margem, valor_total, custo_total)
+            for status, quantidade, soma_margem, valor_total, custo_total in IndicadorMensal.objects.filter(
+                empresa=self.empresa, quantidade__gt=0,
+            ).values_list('status', 'quantidade', 'soma_margem', 'valor_total', 'custo_total')
+        }
+
+    def test_incremental_igual_a_reconstrucao(self):
+        url = '/api/orcamentos/{}/'
+        self.client.patch(url.format(self.orcamentos[0]), {'status': 'approved', 'margem_lucro_percentual': '40'}, format='json')
+        self.client.patch(url.format(self.orcamentos[1]), {'status': 'approved'}, format='json')
+        self.client.patch(url.format(self.orcamentos[2]), {'status': 'rejected'}, format='json')
+        self.client.post(url.format(self.orcamentos[3]) + 'clonar/', {}, format='json')
+        self.client.delete(url.format(self.orcamentos[3]))
+
+        incremental = self.indicadores()
+        self.assertEqual(incremental['approved'], (2, Decimal('60'), Decimal('350.00'), Decimal('240.00')))
+        self.assertEqual(set(incremental), {'approved', 'rejected', 'draft'})
+
+        call_command('reconstruir_indicadores', empresa=self.empresa.id, lote=2, stdout=io.StringIO())
+        self.assertEqual(self.indicadores(), incremental)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get('/api/orcamentos/indicadores/')
+        # Só os resumos: nada de ler a tabela de orçamentos
+        self.assertFalse([q for q in consultas.captured_queries if 'FROM "quotes_orcamento"' in q['sql']])
+        mes = resposta.data['meses'][0]
+        self.assertEqual(mes['orcamentos'], 4)
+        self.assertEqual(mes['taxa_conversao'], '66.67')
+        self.assertEqual(mes['receita'], '350.00')
+        # (350 - 240) / 350
+        self.assertEqual(mes['margem_realizada'], '31.43')
+
+
+@override_settings(EMPRESA_CACHE_TTL=0)
+class NecessidadeCompraTests(APITestCase):
+    """Necessidade de compras: soma dos aprovados explodida até as matérias-primas."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        produto = lambda nome, tipo, preco='0': Produto.objects.create(
+            empresa=self.empresa, nome=nome, codigo_sku=nome.upper(), tipo=tipo, unidade_medida='un',
+            preco_custo=Decimal(preco), custo_calculado=Decimal(preco),
+        )
+        self.chapa, self.parafuso = produto('Chapa', 'MP', '10'), produto('Parafuso', 'MP', '0.5')
+        self.modulo, self.armario = produto('Módulo', 'SB'), produto('Armário', 'PA')
+        self.receita_modulo = Composicao.objects.create(empresa=self.empresa, produto_acabado=self.modulo)
+        receita_armario = Composicao.objects.create(empresa=self.empresa, produto_acabado=self.armario)
+        ItemComposicao.objects.bulk_create([
+            ItemComposicao(composicao=self.receita_modulo, componente=self.chapa, quantidade=Decimal('2')),
+            ItemComposicao(composicao=self.receita_modulo, componente=self.parafuso, quantidade=Decimal('8')),
+            ItemComposicao(composicao=receita_armario, componente=self.modulo, quantidade=Decimal('3')),
+            ItemComposicao(composicao=receita_armario, componente=self.parafuso, quantidade=Decimal('4')),
+        ])
+        for quantidade, status in (('2', 'approved'), ('1', 'approved'), ('10', 'draft')):
+            orcamento = self.client.post(
+                '/api/orcamentos/', {'produto_base': self.armario.id, 'quantidade': quantidade}, format='json',
+            ).data
+            self.client.patch(f"/api/orcamentos/{orcamento['id']}/", {'status': status}, format='json')
+
+    def test_soma_os_aprovados_e_explode_os_sub_produtos(self):
+        necessidade = NecessidadeCompra.objects.get(pk=calcular_necessidades_compra(self.empresa.id))
+
+        self.assertEqual((necessidade.status, necessidade.total_orcamentos), ('concluido', 2))
+        # 3 armários: 9 módulos -> 18 chapas e 72 parafusos, mais 12 parafusos diretos
+        self.assertEqual(
+            dict(necessidade.itens.values_list('produto_id', 'quantidade')),
+            {self.chapa.id: Decimal('18'), self.parafuso.id: Decimal('84')},
+        )
+        self.assertEqual(necessidade.custo_total, Decimal('222.00'))
+
+    def test_falha_deixa_o_cabecalho_com_erro(self):
+        # Ciclo gravado direto no banco (a API não deixaria)
+        ItemComposicao.objects.create(composicao=self.receita_modulo, componente=self.armario, quantidade=1)
+
+        with self.assertRaises(CicloNaComposicao):
+            calcular_necessidades_compra(self.empresa.id)
+        necessidade = NecessidadeCompra.objects.get()
+        self.assertEqual(necessidade.status, 'erro')
+        self.assertIn('Ciclo', necessidade.erro)
+
+
+class CriacaoOrcamentoTests(APITestCase):
+    """Cópia da receita para o orçamento: direta ou achatada, em número fixo de queries."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.produto = lambda nome, tipo, preco='0': Produto.objects.create(
+            empresa=self.empresa, nome=nome, codigo_sku=nome.upper(), tipo=tipo, unidade_medida='un',
+            preco_custo=Decimal(preco), custo_calculado=Decimal(preco),
+        )
+        self.chapa, self.parafuso = self.produto('Chapa', 'MP', '10'), self.produto('Parafuso', 'MP', '0.5')
+        self.modulo, self.armario = self.produto('Módulo', 'SB'), self.produto('Armário', 'PA')
+        receita_modulo = Composicao.objects.create(empresa=self.empresa, produto_acabado=self.modulo)
+        self.receita_armario = Composicao.objects.create(empresa=self.empresa, produto_acabado=self.armario)
+        ItemComposicao.objects.bulk_create([
+            ItemComposicao(composicao=receita_modulo, componente=self.chapa, quantidade=Decimal('2')),
+            ItemComposicao(composicao=receita_modulo, componente=self.parafuso, quantidade=Decimal('8')),
+            ItemComposicao(composicao=self.receita_armario, componente=self.modulo, quantidade=Decimal('3')),
+            ItemComposicao(composicao=self.receita_armario, componente=self.parafuso, quantidade=Decimal('4')),
+        ])
+        self._atualizar_catalogo()
+
+    def _atualizar_catalogo(self):
+        reconstruir_alcance(self.empresa)
+        recalcular_custos_empresa(self.empresa)
+        self.armario.refresh_from_db()
+
+    def _queries(self, achatar):
+        with CaptureQueriesContext(connection) as contexto:
+            criar_orcamento(self.armario, achatar=achatar)
+        return len(contexto.captured_queries)
+
+    def test_achatado_soma_as_materias_primas_de_todos_os_niveis(self):
+        orcamento = criar_orcamento(self.armario, achatar=True)
+
+        # 3 módulos -> 6 chapas e 24 parafusos, mais 4 parafusos diretos
+        self.assertEqual(
+            list(orcamento.itens_produto.order_by('descricao').values_list('componente_id', 'quantidade')),
+            [(self.chapa.id, Decimal('6')), (self.parafuso.id, Decimal('28'))],
+        )
+        self.assertEqual(orcamento.custo_total_materias_primas, self.armario.custo_calculado)
+        self.assertEqual(orcamento.custo_total_materias_primas, Decimal('74.00'))
+
+    def test_direto_copia_os_sub_produtos_como_uma_linha(self):
+        orcamento = criar_orcamento(self.armario)
+
+        self.assertEqual(
+            list(orcamento.itens_produto.order_by('id').values_list('componente_id', 'custo_unitario')),
+            [(self.modulo.id, Decimal('24')), (self.parafuso.id, Decimal('0.5'))],
+        )
+        self.assertEqual(orcamento.custo_total_materias_primas, Decimal('74.00'))
+
+    def test_numero_de_queries_nao_depende_do_tamanho_da_receita(self):
+        # O primeiro orçamento do mês também cria a linha de indicadores
+        criar_orcamento(self.armario)
+        direto, achatado = self._queries(achatar=False), self._queries(achatar=True)
+
+        # Mais um nível e vários componentes novos
+        gaveta = self.produto('Gaveta', 'SB')
+        receita_gaveta = Composicao.objects.create(empresa=self.empresa, produto_acabado=gaveta)
+        novos = [self.produto(f'Insumo {i}', 'MP', '1') for i in range(10)]
+        ItemComposicao.objects.bulk_create(
+            [ItemComposicao(composicao=receita_gaveta, componente=insumo, quantidade=1) for insumo in novos]
+            + [ItemComposicao(composicao=self.receita_armario, componente=gaveta, quantidade=2)]
+            + [ItemComposicao(composicao=self.receita_armario, componente=insumo, quantidade=1) for insumo in novos[:5]]
+        )
+        self._atualizar_catalogo()
+
+        self.assertEqual(self._queries(achatar=False), direto)
+        self.assertEqual(self._queries(achatar=True), achatado)
+
+
+@override_settings(EMPRESA_CACHE_TTL=0)
+class TotaisIncrementaisTests(APITestCase):
+    """Os totais mantidos por delta batem com a soma de todas as linhas, a cada edição."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.chapa = Produto.objects.create(
+            empresa=self.empresa, nome='Chapa', codigo_sku='CH', tipo='MP', unidade_medida='m2',
+            preco_custo=Decimal('10'), custo_calculado=Decimal('10'),
+        )
+        armario = Produto.objects.create(
+            empresa=self.empresa, nome='Armário', codigo_sku='AR', tipo='PA', unidade_medida='un',
+        )
+        composicao = Composicao.objects.create(empresa=self.empresa, produto_acabado=armario)
+        ItemComposicao.objects.create(composicao=composicao, componente=self.chapa, quantidade=Decimal('6'))
+        self.orcamento = criar_orcamento(armario, quantidade=7)
+
+    def estado(self):
+        """Cabeçalho (campos mantidos por delta e derivados) e o custo_total_item de cada linha."""
+        orcamento = Orcamento.objects.values(*CAMPOS_DELTA, *CAMPOS_DERIVADOS).get(pk=self.orcamento.pk)
+        linhas = [
+            sorted(modelo.objects.filter(orcamento=self.orcamento).values_list('id', 'custo_total_item'))
+            for modelo in (OrcamentoItemProduto, OrcamentoItemProcesso, OrcamentoItemDespesaImposto)
+        ]
+        return orcamento, linhas
+
+    def aplicar(self, salvar=(), excluir=()):
+        aplicar_alteracoes(self.orcamento.pk, salvar=salvar, excluir=excluir)
+        incremental = self.estado()
+        reconstruir_totais(self.orcamento.pk)
+        self.assertEqual(incremental, self.estado())
+
+    def linha(self, modelo, **campos):
+        return modelo(orcamento_id=self.orcamento.pk, **campos)
+
+    def test_produtos(self):
+        parafuso = self.linha(
+            OrcamentoItemProduto, componente=self.chapa, descricao='Parafuso',
+            quantidade=Decimal('13.3333'), custo_unitario=Decimal('0.3333'),
+        )
+        self.aplicar(salvar=[parafuso])
+        parafuso.quantidade = Decimal('7.7777')
+        self.aplicar(salvar=[parafuso])
+        self.aplicar(excluir=[OrcamentoItemProduto.objects.get(descricao='Chapa')])
+        self.aplicar(excluir=[parafuso])
+
+    def test_processos(self):
+        montagem = self.linha(OrcamentoItemProcesso, descricao='Montagem', horas=Decimal('1.5'), custo_hora=Decimal('33.33'))
+        pintura = self.linha(OrcamentoItemProcesso, descricao='Pintura', horas=Decimal('0.25'), custo_hora=Decimal('41'))
+        self.aplicar(salvar=[montagem, pintura])
+        montagem.custo_hora = Decimal('35.55')
+        self.aplicar(salvar=[montagem])
+        self.aplicar(excluir=[pintura])
+        self.assertEqual(list(self.orcamento.itens_processo.values_list('descricao', 'custo_total_item')), [('Montagem', Decimal('53.33'))])
+
+    def test_despesas_de_todos_os_tipos(self):
+        frete = self.linha(OrcamentoItemDespesaImposto, descricao='Frete', tipo='fixo', valor=Decimal('50'))
+        seguro = self.linha(
+            OrcamentoItemDespesaImposto, descricao='Seguro', tipo='percentual', base_calculo='custo', valor=Decimal('2.5'),
+        )
+        icms = self.linha(
+            OrcamentoItemDespesaImposto, descricao='ICMS', tipo='percentual', base_calculo='venda', valor=Decimal('18'),
+        )
+        self.aplicar(salvar=[frete, seguro, icms])
+        icms.valor = Decimal('12')
+        self.aplicar(salvar=[icms])
+        # Troca de base: sai do % sobre custo e entra no % sobre venda
+        seguro.base_calculo = 'venda'
+        self.aplicar(salvar=[seguro])
+        frete.valor = Decimal('75.50')
+        self.aplicar(salvar=[frete])
+        # Uma linha de produto muda as bases (custo e venda) das despesas já gravadas
+        self.aplicar(salvar=[self.linha(
+            OrcamentoItemProduto, componente=self.chapa, descricao='Verniz', quantidade=1, custo_unitario=Decimal('9.99'),
+        )])
+        self.aplicar(excluir=[icms])
+        self.aplicar(excluir=[seguro, frete])
+        self.assertFalse(self.orcamento.itens_despesa_imposto.exists())
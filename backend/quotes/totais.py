@@ -0,0 +1,381 @@
+# Em backend/quotes/totais.py
+"""
+Serviço da "Aba de Totais" do Orçamento.
+
+Cada linha salva ou excluída vira um DELTA nos totais do cabeçalho
+(custo_total_materias_primas, custo_total_processos e o resumo da aba
+de despesas: despesas_fixas e os percentuais sobre custo e sobre
+venda). Os demais totais saem só do cabeçalho, então editar uma linha
+de um orçamento com 1000 linhas não soma as outras 999 de novo.
+
+Concorrência: o cabeçalho é travado (SELECT ... FOR UPDATE) antes de
+ler o estado anterior das linhas, então duas edições simultâneas no
+mesmo orçamento são aplicadas uma depois da outra, sem perder deltas.
+Toda escrita nas abas deve passar por aqui. Cada gravação do cabeçalho
+também leva a diferença para os indicadores mensais (quotes.indicadores).
+"""
+import copy
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from . import indicadores
+from .models import Orcamento, OrcamentoItemProduto, OrcamentoItemProcesso, OrcamentoItemDespesaImposto
+from .precificacao import preco_de_venda
+
+CENTAVOS = Decimal('0.01')
+
+MODELOS_ITENS = (OrcamentoItemProduto, OrcamentoItemProcesso, OrcamentoItemDespesaImposto)
+
+# Aba (related_name no Orcamento) -> modelo das linhas
+ABAS = {
+    'itens_produto': OrcamentoItemProduto,
+    'itens_processo': OrcamentoItemProcesso,
+    'itens_despesa_imposto': OrcamentoItemDespesaImposto,
+}
+
+# Campos do cabeçalho mantidos por delta
+CAMPOS_DELTA = (
+    'custo_total_materias_primas', 'custo_total_processos',
+    'despesas_fixas', 'percentual_despesas_custo', 'percentual_despesas_venda',
+)
+# Campos do cabeçalho derivados dos de cima (e de quantidade/margem)
+CAMPOS_DERIVADOS = (
+    'custo_total_producao', 'custo_total_despesas_impostos',
+    'preco_venda_calculado', 'preco_venda_final',
+)
+# Campos de cada linha que entram no cálculo (o resto é só descritivo)
+CAMPOS_CALCULO = {
+    OrcamentoItemProduto: ('quantidade', 'custo_unitario'),
+    OrcamentoItemProcesso: ('horas', 'custo_hora'),
+    OrcamentoItemDespesaImposto: ('tipo', 'base_calculo', 'valor'),
+}
+
+
+def arredondar(valor):
+    """Arredonda para centavos (meio para cima)."""
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def _contribuicao(item):
+    """Quanto UMA linha soma em cada campo do cabeçalho mantido por delta."""
+    if isinstance(item, OrcamentoItemProduto):
+        return {'custo_total_materias_primas': arredondar(item.quantidade * item.custo_unitario)}
+    if isinstance(item, OrcamentoItemProcesso):
+        return {'custo_total_processos': arredondar(item.horas * item.custo_hora)}
+    if item.tipo == 'fixo':
+        return {'despesas_fixas': Decimal(item.valor)}
+    if item.base_calculo == 'venda':
+        return {'percentual_despesas_venda': Decimal(item.valor)}
+    return {'percentual_despesas_custo': Decimal(item.valor)}
+
+
+def _bases_despesas(orcamento):
+    """
+    Multiplicadores do 'valor' de cada tipo de despesa por unidade:
+    fixo é rateado pela quantidade; percentuais incidem sobre o custo
+    de produção ou sobre o preço de venda.
+    """
+    quantidade = orcamento.quantidade if orcamento.quantidade > 0 else Decimal(1)
+    return {
+        'fixo': 1 / Decimal(quantidade),
+        'custo': Decimal(orcamento.custo_total_producao) / 100,
+        'venda': Decimal(orcamento.preco_venda_calculado) / 100,
+    }
+
+
+def _base_da_despesa(item):
+    return 'fixo' if item.tipo == 'fixo' else item.base_calculo
+
+
+def recalcular_derivados(orcamento):
+    """
+    Recalcula (em memória) os totais que dependem só do cabeçalho:
+    custo de produção, despesas/impostos e preço de venda.
+
+    O preço sai de quotes.precificacao (exato no centavo). O
+    preco_venda_final acompanha o calculado, a não ser que tenha sido
+    ajustado à mão. Levanta MargemInviavel se margem + % sobre venda
+    chegarem a 100.
+    """
+    custo = Decimal(orcamento.custo_total_materias_primas) + Decimal(orcamento.custo_total_processos)
+    quantidade = orcamento.quantidade if orcamento.quantidade > 0 else Decimal(1)
+    fixas = Decimal(orcamento.despesas_fixas) / Decimal(quantidade)
+    sobre_custo = custo * Decimal(orcamento.percentual_despesas_custo) / 100
+    preco = preco_de_venda(
+        custo, orcamento.despesas_fixas, orcamento.quantidade, orcamento.percentual_despesas_custo,
+        orcamento.percentual_despesas_venda, orcamento.margem_lucro_percentual,
+    )
+    sobre_venda = preco * Decimal(orcamento.percentual_despesas_venda) / 100
+
+    preco_anterior = orcamento.preco_venda_calculado
+    orcamento.custo_total_producao = arredondar(custo)
+    orcamento.custo_total_despesas_impostos = arredondar(fixas + sobre_custo + sobre_venda)
+    orcamento.preco_venda_calculado = preco
+    if not orcamento.preco_venda_final or orcamento.preco_venda_final == preco_anterior:
+        orcamento.preco_venda_final = preco
+
+
+def _atualizar_linhas_despesa(orcamento, bases):
+    """
+    Regrava o custo_total_item das despesas cuja base mudou (1 SELECT e
+    1 UPDATE em lote), com o mesmo arredondamento (meio para cima) das
+    linhas salvas agora e da reprecificação.
+    """
+    filtros = {
+        'fixo': Q(tipo='fixo'),
+        'custo': Q(tipo='percentual', base_calculo='custo'),
+        'venda': Q(tipo='percentual', base_calculo='venda'),
+    }
+    filtro = Q()
+    for base in bases:
+        filtro |= filtros[base]
+    if not filtro:
+        return
+
+    fatores = _bases_despesas(orcamento)
+    alteradas = []
+    despesas = (
+        OrcamentoItemDespesaImposto.objects.filter(filtro, orcamento=orcamento)
+        .only('id', 'tipo', 'base_calculo', 'valor', 'custo_total_item')
+    )
+    for despesa in despesas:
+        total = arredondar(Decimal(despesa.valor) * fatores[_base_da_despesa(despesa)])
+        if total != despesa.custo_total_item:
+            despesa.custo_total_item = total
+            alteradas.append(despesa)
+    OrcamentoItemDespesaImposto.objects.bulk_update(alteradas, ['custo_total_item'], batch_size=500)
+
+
+class ItemForaDoOrcamento(Exception):
+    """Linha informada não existe ou é de outro orçamento."""
+
+
+def _carregar_linhas(orcamento, ids_por_modelo, so_calculo=False):
+    """
+    Linhas existentes, lidas DEPOIS da trava do cabeçalho (1 query por
+    aba): nenhuma outra edição muda essas linhas agora.
+    Retorna {(Modelo, id): instância}.
+    """
+    linhas = {}
+    for modelo, ids in ids_por_modelo.items():
+        consulta = modelo.objects.filter(orcamento=orcamento, pk__in=ids)
+        if so_calculo:
+            consulta = consulta.only('id', *CAMPOS_CALCULO[modelo])
+        for item in consulta:
+            linhas[(modelo, item.pk)] = item
+    faltando = sorted(pk for modelo, ids in ids_por_modelo.items() for pk in ids if (modelo, pk) not in linhas)
+    if faltando:
+        raise ItemForaDoOrcamento(f"Itens {faltando} não pertencem ao orçamento #{orcamento.pk}.")
+    return linhas
+
+
+def _aplicar(orcamento, salvar, excluir, anteriores, cabecalho=None):
+    """Deltas das linhas + campos do cabeçalho -> um único recálculo e gravação."""
+    contribuicao_anterior = indicadores.contribuicao(orcamento)
+    delta = defaultdict(Decimal)
+    bases_alteradas = set()
+    for item in excluir:
+        for campo, valor in _contribuicao(anteriores[(type(item), item.pk)]).items():
+            delta[campo] -= valor
+    for item in salvar:
+        item.orcamento = orcamento
+        if item.pk:
+            for campo, valor in _contribuicao(anteriores[(type(item), item.pk)]).items():
+                delta[campo] -= valor
+        for campo, valor in _contribuicao(item).items():
+            delta[campo] += valor
+        if isinstance(item, OrcamentoItemDespesaImposto):
+            bases_alteradas.add(_base_da_despesa(item))
+        else:
+            item.custo_total_item = arredondar(_contribuicao(item).popitem()[1])
+
+    # Cabeçalho: campos editados + deltas + recálculo dos derivados
+    antes = _bases_despesas(orcamento)
+    cabecalho = cabecalho or {}
+    for campo, valor in cabecalho.items():
+        setattr(orcamento, campo, valor)
+    for campo, valor in delta.items():
+        setattr(orcamento, campo, Decimal(getattr(orcamento, campo)) + valor)
+    recalcular_derivados(orcamento)
+    depois = _bases_despesas(orcamento)
+    bases_alteradas |= {base for base in depois if depois[base] != antes[base]}
+
+    # Linhas de despesa salvas agora já saem com o valor certo
+    for item in salvar:
+        if isinstance(item, OrcamentoItemDespesaImposto):
+            item.custo_total_item = arredondar(Decimal(item.valor) * depois[_base_da_despesa(item)])
+
+    _gravar_linhas(salvar, excluir)
+    _atualizar_linhas_despesa(orcamento, bases_alteradas)
+    orcamento.save(update_fields={*cabecalho, *CAMPOS_DELTA, *CAMPOS_DERIVADOS, 'updated_at'})
+    indicadores.registrar([contribuicao_anterior], [indicadores.contribuicao(orcamento)])
+    return orcamento
+
+
+@transaction.atomic
+def aplicar_alteracoes(orcamento_id, salvar=(), excluir=()):
+    """
+    Salva/exclui várias linhas (de qualquer aba) de UM orçamento e
+    aplica a soma dos deltas no cabeçalho, com um único recálculo.
+
+    'salvar' são instâncias novas ou alteradas dos itens; 'excluir',
+    instâncias existentes. Retorna o Orcamento atualizado.
+    """
+    orcamento = Orcamento.objects.select_for_update().get(pk=orcamento_id)
+    salvar, excluir = list(salvar), list(excluir)
+
+    ids_por_modelo = defaultdict(set)
+    for item in salvar + excluir:
+        if item.pk:
+            ids_por_modelo[type(item)].add(item.pk)
+    anteriores = _carregar_linhas(orcamento, ids_por_modelo, so_calculo=True)
+    return _aplicar(orcamento, salvar, excluir, anteriores)
+
+
+@transaction.atomic
+def editar_em_lote(orcamento_id, cabecalho=None, alteracoes=None, exclusoes=None):
+    """
+    Edição de várias abas numa chamada só, com UM recálculo dos totais.
+
+    - cabecalho: {campo: valor} do Orcamento (quantidade, margem...);
+    - alteracoes: {Modelo: [{campo: valor}, ...]}; com 'id' altera só os
+      campos informados da linha, sem 'id' cria uma linha nova;
+    - exclusoes: {Modelo: [ids]}.
+
+    Levanta ItemForaDoOrcamento se algum id não for deste orçamento.
+    """
+    orcamento = Orcamento.objects.select_for_update().get(pk=orcamento_id)
+    alteracoes, exclusoes = alteracoes or {}, exclusoes or {}
+
+    ids_por_modelo = defaultdict(set)
+    for modelo, linhas in alteracoes.items():
+        ids_por_modelo[modelo].update(dados['id'] for dados in linhas if dados.get('id'))
+    for modelo, ids in exclusoes.items():
+        ids_por_modelo[modelo].update(ids)
+    anteriores = _carregar_linhas(orcamento, ids_por_modelo)
+
+    salvar = []
+    for modelo, linhas in alteracoes.items():
+        for dados in linhas:
+            dados = dict(dados)
+            pk = dados.pop('id', None)
+            # Cópia: a original guarda o estado anterior (para o delta)
+            item = copy.copy(anteriores[(modelo, pk)]) if pk else modelo()
+            for campo, valor in dados.items():
+                setattr(item, campo, valor)
+            salvar.append(item)
+    excluir = [anteriores[(modelo, pk)] for modelo, ids in exclusoes.items() for pk in ids]
+    return _aplicar(orcamento, salvar, excluir, anteriores, cabecalho)
+
+
+def aplicar_deltas_em_lote(orcamentos, deltas):
+    """
+    Versão em lote para muitos orçamentos JÁ travados pelo chamador
+    (reprecificação): soma os deltas ({orcamento_id: {campo: valor}})
+    nos cabeçalhos, recalcula os derivados e regrava as despesas e os
+    cabeçalhos com bulk_update (3 queries, qualquer que seja o lote,
+    mais uma por mês/status nos indicadores).
+    """
+    agora = timezone.now()
+    bases = {}
+    contribuicoes_anteriores = [indicadores.contribuicao(orcamento) for orcamento in orcamentos]
+    for orcamento in orcamentos:
+        for campo, valor in deltas.get(orcamento.id, {}).items():
+            setattr(orcamento, campo, Decimal(getattr(orcamento, campo)) + valor)
+        recalcular_derivados(orcamento)
+        orcamento.updated_at = agora
+        bases[orcamento.id] = _bases_despesas(orcamento)
+
+    despesas = list(
+        OrcamentoItemDespesaImposto.objects.filter(orcamento_id__in=bases)
+        .only('id', 'orcamento_id', 'tipo', 'base_calculo', 'valor', 'custo_total_item')
+    )
+    for despesa in despesas:
+        despesa.custo_total_item = arredondar(Decimal(despesa.valor) * bases[despesa.orcamento_id][_base_da_despesa(despesa)])
+    OrcamentoItemDespesaImposto.objects.bulk_update(despesas, ['custo_total_item'], batch_size=500)
+    Orcamento.objects.bulk_update(orcamentos, [*CAMPOS_DELTA, *CAMPOS_DERIVADOS, 'updated_at'], batch_size=500)
+    indicadores.registrar(contribuicoes_anteriores, [indicadores.contribuicao(orcamento) for orcamento in orcamentos])
+
+
+def _gravar_linhas(salvar, excluir):
+    """Grava as linhas em lote: 1 DELETE, 1 INSERT e 1 UPDATE por aba (no máximo)."""
+    for modelo in MODELOS_ITENS:
+        ids = [item.pk for item in excluir if isinstance(item, modelo)]
+        if ids:
+            modelo.objects.filter(pk__in=ids).delete()
+
+        novos = [item for item in salvar if isinstance(item, modelo) and not item.pk]
+        alterados = [item for item in salvar if isinstance(item, modelo) and item.pk]
+        modelo.objects.bulk_create(novos, batch_size=500)
+        if alterados:
+            campos = [
+                campo.name for campo in modelo._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'orcamento'
+            ]
+            modelo.objects.bulk_update(alterados, campos, batch_size=500)
+
+
+def salvar_item(item):
+    """Salva UMA linha (nova ou existente) e atualiza os totais."""
+    return aplicar_alteracoes(item.orcamento_id, salvar=[item])
+
+
+def excluir_item(item):
+    """Exclui UMA linha e atualiza os totais."""
+    return aplicar_alteracoes(item.orcamento_id, excluir=[item])
+
+
+@transaction.atomic
+def recalcular_totais(orcamento_id):
+    """
+    Recalcula os totais só a partir do cabeçalho (depois de mudar
+    quantidade, margem ou o preco_venda_final).
+    """
+    orcamento = Orcamento.objects.select_for_update().get(pk=orcamento_id)
+    contribuicao_anterior = indicadores.contribuicao(orcamento)
+    antes = _bases_despesas(orcamento)
+    recalcular_derivados(orcamento)
+    depois = _bases_despesas(orcamento)
+    _atualizar_linhas_despesa(orcamento, [base for base in depois if depois[base] != antes[base]])
+    orcamento.save(update_fields=[*CAMPOS_DERIVADOS, 'updated_at'])
+    indicadores.registrar([contribuicao_anterior], [indicadores.contribuicao(orcamento)])
+    return orcamento
+
+
+@transaction.atomic
+def reconstruir_totais(orcamento_id):
+    """
+    Soma TODAS as linhas de novo (3 queries agregadas) e refaz os
+    totais. Para carga inicial, cópias em lote e conferência; no dia a
+    dia use aplicar_alteracoes.
+    """
+    orcamento = Orcamento.objects.select_for_update().get(pk=orcamento_id)
+    contribuicao_anterior = indicadores.contribuicao(orcamento)
+    orcamento.custo_total_materias_primas = arredondar(OrcamentoItemProduto.objects.filter(
+        orcamento=orcamento
+    ).aggregate(total=Sum('custo_total_item'))['total'] or 0)
+    orcamento.custo_total_processos = arredondar(OrcamentoItemProcesso.objects.filter(
+        orcamento=orcamento
+    ).aggregate(total=Sum('custo_total_item'))['total'] or 0)
+
+    orcamento.despesas_fixas = Decimal(0)
+    orcamento.percentual_despesas_custo = Decimal(0)
+    orcamento.percentual_despesas_venda = Decimal(0)
+    resumo = (
+        OrcamentoItemDespesaImposto.objects.filter(orcamento=orcamento)
+        .values('tipo', 'base_calculo').annotate(total=Sum('valor')).order_by()
+    )
+    for linha in resumo:
+        modelo = OrcamentoItemDespesaImposto(tipo=linha['tipo'], base_calculo=linha['base_calculo'], valor=0)
+        campo, _ = _contribuicao(modelo).popitem()
+        setattr(orcamento, campo, getattr(orcamento, campo) + linha['total'])
+
+    recalcular_derivados(orcamento)
+    _atualizar_linhas_despesa(orcamento, ['fixo', 'custo', 'venda'])
+    orcamento.save(update_fields=[*CAMPOS_DELTA, *CAMPOS_DERIVADOS, 'updated_at'])
+    indicadores.registrar([contribuicao_anterior], [indicadores.contribuicao(orcamento)])
+    return orcamento
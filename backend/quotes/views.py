@@ -1,3 +1,233 @@
-from django.shortcuts import render
+# Em backend/quotes/views.py
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.http import FileResponse
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from users.tenancy import get_empresa
+from .models import Orcamento
+from .serializers import (
+    OrcamentoSerializer, OrcamentoListaSerializer, CriarOrcamentoSerializer,
+    CabecalhoOrcamentoSerializer, EdicaoLoteSerializer, CurvaPrecoSerializer, ClonarOrcamentoSerializer,
+    IndicadoresSerializer,
+)
+from .clonagem import clonar_orcamento
+from .criacao import criar_orcamento, ProdutoSemReceita
+from .documentos import solicitar_documento
+from .indicadores import contribuicao, registrar, resumo_mensal
+from .precificacao import MargemInviavel, curva_de_precos, faixa
+from .totais import ABAS, ItemForaDoOrcamento, editar_em_lote
 
-# Create your views here.
+
+class OrcamentoCursorPagination(CursorPagination):
+    """Mais recentes primeiro, por cursor (sem OFFSET) sobre (created_at, id)."""
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class OrcamentoViewSet(viewsets.ModelViewSet):
+    """
+    API de Orçamentos.
+
+    - list: só o cabeçalho, com o nome do produto e o valor do pedido
+      anotados na própria query (1 query por página);
+    - retrieve: cabeçalho + as três abas (4 queries);
+    - create: copia a receita do produto_base (quotes.criacao);
+    - update/partial_update: só o cabeçalho (os totais são recalculados);
+    - itens (PATCH): várias edições nas abas com UM recálculo;
+    - clonar: cópia do orçamento inteiro, em número fixo de queries;
+    - curva: preço de venda para uma faixa de margens ou quantidades;
+    - documento: o orçamento para o cliente, gerado em segundo plano;
+    - indicadores: conversão, margem e receita por mês (só dos resumos).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrcamentoCursorPagination
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        """Só os orçamentos da empresa do usuário logado."""
+        empresa = get_empresa(self.request)
+        if not empresa:
+            return Orcamento.objects.none()
+
+        orcamentos = Orcamento.objects.filter(empresa=empresa)
+        if self.action == 'list':
+            return self.filtrar_lista(orcamentos).annotate(
+                produto_base_nome=F('produto_base__nome'),
+                valor_total=ExpressionWrapper(
+                    F('preco_venda_final') * F('quantidade'),
+                    output_field=DecimalField(max_digits=22, decimal_places=2),
+                ),
+            )
+        return orcamentos.select_related('produto_base').prefetch_related(*ABAS)
+
+    def filtrar_lista(self, orcamentos):
+        """Filtros da listagem: ?status=approved e ?produto_base=<id>."""
+        parametros = self.request.query_params
+        if parametros.get('status'):
+            orcamentos = orcamentos.filter(status=parametros['status'])
+        if parametros.get('produto_base', '').isdigit():
+            orcamentos = orcamentos.filter(produto_base_id=parametros['produto_base'])
+        return orcamentos
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrcamentoListaSerializer
+        if self.action == 'create':
+            return CriarOrcamentoSerializer
+        if self.action in ('update', 'partial_update'):
+            return CabecalhoOrcamentoSerializer
+        if self.action == 'itens':
+            return EdicaoLoteSerializer
+        return OrcamentoSerializer
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'empresa': get_empresa(self.request)}
+
+    def create(self, request, *args, **kwargs):
+        """
+        Cria o orçamento a partir da receita do produto_base.
+        Corpo: {"produto_base": 1, "quantidade": "10", "margem_lucro_percentual": "25",
+                "descricao": "...", "achatar": false}
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        parametros = dict(serializer.validated_data)
+        try:
+            orcamento = criar_orcamento(parametros.pop('produto_base'), **parametros)
+        except (ProdutoSemReceita, MargemInviavel) as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._responder_detalhe(orcamento.id, status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        """Altera o cabeçalho (quantidade, margem, status...) e recalcula os totais."""
+        orcamento_id = self._conferir_orcamento(kwargs['pk'])
+        serializer = self.get_serializer(data=request.data, partial=kwargs.get('partial', False))
+        serializer.is_valid(raise_exception=True)
+        return self._editar(orcamento_id, cabecalho=serializer.validated_data)
+
+    @action(detail=True, methods=['patch'])
+    def itens(self, request, pk=None):
+        """
+        Edição em lote das abas (veja EdicaoLoteSerializer): todas as
+        linhas são gravadas em lote e os totais recalculados UMA vez.
+        """
+        orcamento_id = self._conferir_orcamento(pk)
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+        return self._editar(
+            orcamento_id,
+            cabecalho=dados.get('cabecalho'),
+            alteracoes={ABAS[aba]: dados[aba] for aba in ABAS if dados.get(aba)},
+            exclusoes={ABAS[aba]: ids for aba, ids in dados.get('excluir', {}).items() if ids},
+        )
+
+    def perform_destroy(self, instance):
+        """Exclui o orçamento e tira a contribuição dele dos indicadores."""
+        with transaction.atomic():
+            orcamento = Orcamento.objects.select_for_update().get(pk=instance.pk)
+            registrar(antes=[contribuicao(orcamento)])
+            orcamento.delete()
+
+    @action(detail=False, methods=['get'])
+    def indicadores(self, request):
+        """
+        Taxa de conversão, margem média e receita por mês, com o
+        detalhe por status. Lê só os indicadores mensais (1 query),
+        nunca a tabela de orçamentos. Ex.: ?de=2026-01&ate=2026-06
+        """
+        parametros = IndicadoresSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        empresa = get_empresa(request)
+        if not empresa:
+            return Response({'meses': []})
+
+        def texto(valor):
+            if isinstance(valor, dict):
+                return {chave: texto(item) for chave, item in valor.items()}
+            return str(valor) if valor is not None and not isinstance(valor, (int, str)) else valor
+
+        meses = resumo_mensal(empresa, parametros.validated_data.get('de'), parametros.validated_data.get('ate'))
+        return Response({'meses': [texto(mes) for mes in meses]})
+
+    @action(detail=True, methods=['post'])
+    def clonar(self, request, pk=None):
+        """
+        Duplica o orçamento (cabeçalho + abas) como um novo rascunho.
+        Corpo (opcional): {"descricao": "..."}
+        """
+        orcamento_id = self._conferir_orcamento(pk)
+        parametros = ClonarOrcamentoSerializer(data=request.data)
+        parametros.is_valid(raise_exception=True)
+        copia = clonar_orcamento(orcamento_id, parametros.validated_data.get('descricao'))
+        return self._responder_detalhe(copia.id, status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def curva(self, request, pk=None):
+        """
+        Curva de preços do orçamento sem gravar nada: o preço de venda
+        (já com os impostos sobre a venda) para cada margem ou cada
+        quantidade da faixa (veja CurvaPrecoSerializer).
+        Ex.: ?variar=margem&de=5&ate=60&passo=0.5
+        """
+        parametros = CurvaPrecoSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        variar, de, ate, passo = (parametros.validated_data[campo] for campo in ('variar', 'de', 'ate', 'passo'))
+
+        # Só o cabeçalho: os totais já resumem as abas
+        orcamento = self.get_queryset().select_related(None).prefetch_related(None).filter(pk=pk).first()
+        if orcamento is None:
+            raise NotFound()
+        valores = faixa(de, ate, passo)
+        pontos = curva_de_precos(orcamento, **{'margens' if variar == 'margem' else 'quantidades': valores})
+        return Response({
+            'variar': variar,
+            'preco_venda_atual': str(orcamento.preco_venda_calculado),
+            'pontos': [
+                {campo: str(valor) if valor is not None else None for campo, valor in ponto.items()}
+                for ponto in pontos
+            ],
+        })
+
+    @action(detail=True, methods=['get'])
+    def documento(self, request, pk=None):
+        """
+        Documento (HTML) do orçamento. Se já existe um para o conteúdo
+        atual, é servido direto do storage; senão a geração é agendada
+        e a resposta é 202 com Retry-After: repita a mesma URL.
+        """
+        orcamento = self.get_object()
+        documento = solicitar_documento(orcamento)
+        if documento.status == 'concluido':
+            return FileResponse(
+                documento.arquivo.open('rb'), content_type='text/html; charset=utf-8',
+                filename=f"orcamento-{orcamento.id}.html",
+            )
+        resposta = Response({'status': documento.status}, status=status.HTTP_202_ACCEPTED)
+        resposta['Retry-After'] = '2'
+        resposta['Location'] = request.build_absolute_uri()
+        return resposta
+
+    def _conferir_orcamento(self, pk):
+        """Confere (sem carregar as abas) que o orçamento é da empresa do usuário."""
+        orcamento_id = self.get_queryset().filter(pk=pk).values_list('id', flat=True).first()
+        if orcamento_id is None:
+            raise NotFound()
+        return orcamento_id
+
+    def _editar(self, orcamento_id, **edicao):
+        try:
+            editar_em_lote(orcamento_id, **edicao)
+        except (ItemForaDoOrcamento, MargemInviavel) as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._responder_detalhe(orcamento_id)
+
+    def _responder_detalhe(self, orcamento_id, codigo=status.HTTP_200_OK):
+        orcamento = self.get_queryset().get(pk=orcamento_id)
+        return Response(OrcamentoSerializer(orcamento).data, status=codigo)
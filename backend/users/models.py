@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
+from .tenancy import limpar_cache_empresa
 
 class User(AbstractUser):
     """User model customizado"""
@@ -55,3 +56,18 @@ class Empresa(models.Model):#cria uma tabela empresa
     
     def __str__(self):
         return self.nome_fantasia
+
+    def save(self, *args, **kwargs):
+        # Se o dono mudou, o antigo também tem a empresa no cache
+        owner_anterior_id = None
+        if self.pk:
+            owner_anterior_id = Empresa.objects.filter(pk=self.pk).values_list('owner_id', flat=True).first()
+        super().save(*args, **kwargs)
+        # A empresa do dono pode estar no cache da resolução do tenant
+        limpar_cache_empresa(self.owner_id, owner_anterior_id)
+
+    def delete(self, *args, **kwargs):
+        owner_id = self.owner_id
+        resultado = super().delete(*args, **kwargs)
+        limpar_cache_empresa(owner_id)
+        return resultado
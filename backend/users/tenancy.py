@@ -0,0 +1,92 @@
+# Em backend/users/tenancy.py
+"""
+Resolução do tenant (Empresa) do usuário logado.
+
+A empresa é buscada UMA vez por request e fica guardada no próprio
+request. Com settings.EMPRESA_CACHE_TTL > 0 ela também fica no cache
+(por usuário) durante alguns segundos, então requests seguidos do mesmo
+usuário não vão ao banco. Esse cache precisa ser compartilhado entre os
+processos (settings.CACHE_URL): a invalidação ao salvar/apagar a
+Empresa vale para todos eles.
+
+Uso nas views/serializers:
+
+    from users.tenancy import get_empresa
+    empresa = get_empresa(request)   # Empresa ou None
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+
+def _chave_cache(user_id):
+    return f'tenancy:empresa:{user_id}'
+
+
+def empresa_do_usuario(user):
+    """Empresa do usuário (a primeira de que ele é dono), usando o cache se ligado."""
+    if user is None or not user.is_authenticated:
+        return None
+
+    ttl = getattr(settings, 'EMPRESA_CACHE_TTL', 0)
+    if ttl:
+        empresa = cache.get(_chave_cache(user.pk))
+        if empresa is not None:
+            return empresa
+
+    empresa = user.owned_empresas.first()
+    # Usuário sem empresa não vai para o cache: a que ele criar em
+    # seguida precisa aparecer já no próximo request
+    if ttl and empresa is not None:
+        cache.set(_chave_cache(user.pk), empresa, ttl)
+    return empresa
+
+
+def limpar_cache_empresa(*user_ids):
+    """
+    Descarta a empresa guardada no cache para os usuários (ex.: ao
+    salvar a Empresa). Limpa agora e de novo depois do commit: um
+    request que leia o valor antigo no meio da transação não o deixa
+    no cache.
+    """
+    chaves = [_chave_cache(user_id) for user_id in user_ids if user_id]
+    if chaves:
+        cache.delete_many(chaves)
+        transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+def get_empresa(request):
+    """
+    Empresa do usuário do request, resolvida uma única vez por request.
+
+    Aceita tanto o HttpRequest quanto o Request do DRF. O resultado fica
+    no HttpRequest junto com o id do usuário: se a autenticação do DRF
+    (JWT/Token) trocar o usuário depois, a empresa é resolvida de novo.
+    """
+    http_request = getattr(request, '_request', request)
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+
+    resolvida = getattr(http_request, '_tenancy_empresa', None)
+    if resolvida is None or resolvida[0] != user_id:
+        resolvida = (user_id, empresa_do_usuario(user))
+        http_request._tenancy_empresa = resolvida
+    return resolvida[1]
+
+
+class EmpresaMiddleware:
+    """
+    Disponibiliza request.empresa, resolvida só quando for acessada
+    (e depois da autenticação do DRF, que roda dentro da view).
+
+    Como é um objeto "preguiçoso", para testar se o usuário tem empresa
+    use get_empresa(request), que devolve None de verdade.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.empresa = SimpleLazyObject(lambda: get_empresa(request))
+        return self.get_response(request)
@@ -1,3 +1,110 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from pricing.models import Produto
+from .models import Empresa
+from .tenancy import _chave_cache, empresa_do_usuario
+
+
+@override_settings(EMPRESA_CACHE_TTL=30)
+class EmpresaCacheTests(TestCase):
+    """O cache da empresa do usuário é invalidado ao salvar/apagar a Empresa."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+
+    def test_usa_o_cache_depois_da_primeira_consulta(self):
+        empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.assertEqual(empresa_do_usuario(self.user), empresa)
+        with self.assertNumQueries(0):
+            self.assertEqual(empresa_do_usuario(self.user), empresa)
+
+    def test_usuario_sem_empresa_nao_fica_no_cache(self):
+        self.assertIsNone(empresa_do_usuario(self.user))
+        empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.assertEqual(empresa_do_usuario(self.user), empresa)
+
+    def test_salvar_invalida(self):
+        empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Antigo')
+        empresa_do_usuario(self.user)
+        empresa.nome_fantasia = 'Novo'
+        with self.captureOnCommitCallbacks(execute=True):
+            empresa.save()
+        self.assertEqual(empresa_do_usuario(self.user).nome_fantasia, 'Novo')
+
+    def test_trocar_o_dono_invalida_o_antigo(self):
+        empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        empresa_do_usuario(self.user)
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        empresa.owner = outro
+        empresa.save()
+        self.assertIsNone(empresa_do_usuario(self.user))
+        self.assertEqual(empresa_do_usuario(outro), empresa)
+
+    def test_apagar_invalida(self):
+        empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        empresa_do_usuario(self.user)
+        empresa.delete()
+        self.assertIsNone(empresa_do_usuario(self.user))
+
+
+class EmpresaPorRequestTests(APITestCase):
+    """Nas views a empresa é resolvida uma vez por request; com EMPRESA_CACHE_TTL=0 sem passar pelo cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(username='dono', email='dono@teste.com', password='x')
+        self.empresa = Empresa.objects.create(owner=self.user, nome_fantasia='Empresa Teste')
+        self.client.force_authenticate(self.user)
+        self.chapa = Produto.objects.create(
+            empresa=self.empresa, nome='Chapa', codigo_sku='CH', tipo='MP', unidade_medida='m2',
+            preco_custo=Decimal('10'), custo_calculado=Decimal('10'),
+        )
+        self.modulo = Produto.objects.create(
+            empresa=self.empresa, nome='Módulo', codigo_sku='MD', tipo='SB', unidade_medida='un',
+        )
+
+    def trocar_dono_por_fora(self):
+        """Troca o dono sem o save(): nada invalida o cache."""
+        outro = get_user_model().objects.create_user(username='outro', email='outro@teste.com', password='x')
+        Empresa.objects.filter(pk=self.empresa.pk).update(owner=outro)
+
+    @override_settings(EMPRESA_CACHE_TTL=0)
+    def test_uma_resolucao_por_request(self):
+        # A criação de receita consulta a empresa em vários pontos (trava, save, resposta)
+        with mock.patch('users.tenancy.empresa_do_usuario', wraps=empresa_do_usuario) as resolver:
+            resposta = self.client.post('/api/composicoes/', {
+                'produto_acabado': self.modulo.id, 'itens': [{'componente': self.chapa.id, 'quantidade': '2'}],
+            }, format='json')
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        resolver.assert_called_once()
+
+        # O request seguinte resolve de novo
+        with mock.patch('users.tenancy.empresa_do_usuario', wraps=empresa_do_usuario) as resolver:
+            self.client.get('/api/produtos/custos/')
+        resolver.assert_called_once()
+
+    @override_settings(EMPRESA_CACHE_TTL=0)
+    def test_ttl_zero_nao_usa_o_cache(self):
+        self.assertIn(str(self.chapa.id), self.client.get('/api/produtos/custos/').json())
+        self.assertIsNone(cache.get(_chave_cache(self.user.pk)))
+
+        self.trocar_dono_por_fora()
+        self.assertEqual(self.client.get('/api/produtos/custos/').json(), {})
+
+    @override_settings(EMPRESA_CACHE_TTL=30)
+    def test_com_ttl_os_requests_seguintes_usam_o_cache(self):
+        self.client.get('/api/produtos/custos/')
+        self.assertEqual(cache.get(_chave_cache(self.user.pk)), self.empresa)
+
+        # Sem invalidação, vale a empresa do cache até o TTL
+        self.trocar_dono_por_fora()
+        self.assertIn(str(self.chapa.id), self.client.get('/api/produtos/custos/').json())
@@ -24,15 +24,20 @@ const initialComposicaoState: NovaComposicao = {
 const ComposicaoForm: React.FC<ComposicaoFormProps> = ({ onSuccess }) => {
     const [formData, setFormData] = useState<NovaComposicao>(initialComposicaoState);
     const [produtosDisponiveis, setProdutosDisponiveis] = useState<Produto[]>([]);
+    const [proximaPagina, setProximaPagina] = useState<string | null>(null);
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
     // --- Busca de Produtos (Para os Dropdowns) ---
-    const fetchProdutos = useCallback(async () => {
+    const fetchProdutos = useCallback(async (url?: string) => {
         try {
-            // Busca todos os produtos para que possam ser usados como componentes
-            const response = await produtosAPI.list();
-            setProdutosDisponiveis(response.data);
+            // Uma página por vez (ordem alfabética); as seguintes vêm com "Carregar mais produtos"
+            const response = url
+                ? await produtosAPI.page(url)
+                : await produtosAPI.page('/produtos/', { page_size: 500 });
+            const produtos = response.data.results;
+            setProdutosDisponiveis(prev => (url ? [...prev, ...produtos] : produtos));
+            setProximaPagina(response.data.next);
         } catch (err) {
             console.error("Erro ao carregar produtos para a composição:", err);
         }
@@ -188,6 +193,17 @@ const ComposicaoForm: React.FC<ComposicaoFormProps> = ({ onSuccess }) => {
                 </div>
             </div>
 
+            {/* Mais produtos para os dropdowns (lista paginada da API) */}
+            {proximaPagina && (
+                <button
+                    type="button"
+                    onClick={() => fetchProdutos(proximaPagina)}
+                    className="text-sm text-blue-600 hover:underline"
+                >
+                    Carregar mais produtos
+                </button>
+            )}
+
             {/* --- SEÇÃO: ITENS DA COMPOSIÇÃO (Receita Dinâmica) --- */}
             <div className="space-y-4 pt-4 border-t border-gray-200">
                 <h4 className="text-lg font-semibold text-gray-700">Ingredientes / Componentes da Receita</h4>
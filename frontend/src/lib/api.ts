@@ -181,11 +181,22 @@ export const composicoesAPI = {
   delete: (id: number) => api.delete(`/composicoes/${id}/`),
 };
 
+// Resposta das listas paginadas por cursor
+export interface PaginaCursor<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 export const produtosAPI = {
   /**
-   * Busca a lista de todos os produtos da empresa logada
+   * Busca uma página de produtos (ordenados por nome).
+   * Filtros: q (nome ou SKU), tipo, is_active, page_size (até 500).
+   * Para continuar, passe o 'next' (ou 'previous') da página como url,
+   * sem params: o link já traz os filtros.
    */
-  list: () => api.get<Produto[]>('/produtos/'),
+  page: (url: string = '/produtos/', params?: Record<string, string | number | boolean>) =>
+    api.get<PaginaCursor<Produto>>(url, { params }),
 
   /**
    * Cria um novo produto no backend
@@ -202,4 +213,151 @@ export const produtosAPI = {
    * Deleta um produto do backend
    */
   delete: (id: number) => api.delete(`/produtos/${id}/`),
-};
\ No newline at end of file
+};
+// --- Orçamentos ---
+
+export interface OrcamentoItemProduto {
+  id: number;
+  componente: number;
+  descricao: string;
+  quantidade: string;
+  custo_unitario: string;
+  custo_total_item: string;
+}
+
+export interface OrcamentoItemProcesso {
+  id: number;
+  descricao: string;
+  horas: string;
+  custo_hora: string;
+  custo_total_item: string;
+}
+
+export interface OrcamentoItemDespesaImposto {
+  id: number;
+  descricao: string;
+  tipo: 'percentual' | 'fixo';
+  base_calculo: 'custo' | 'venda';
+  valor: string;
+  custo_total_item: string;
+}
+
+export type StatusOrcamento = 'draft' | 'sent' | 'approved' | 'rejected';
+
+export interface OrcamentoResumo {
+  id: number;
+  produto_base: number;
+  produto_base_nome: string;
+  quantidade: string;
+  descricao: string;
+  status: StatusOrcamento;
+  custo_total_producao: string;
+  margem_lucro_percentual: string;
+  preco_venda_final: string;
+  valor_total: string;
+  created_at: string;
+  updated_at: string;
+}
+
+export interface Orcamento extends Omit<OrcamentoResumo, 'valor_total'> {
+  custo_total_materias_primas: string;
+  custo_total_processos: string;
+  custo_total_despesas_impostos: string;
+  preco_venda_calculado: string;
+  despesas_fixas: string;
+  percentual_despesas_custo: string;
+  percentual_despesas_venda: string;
+  itens_produto: OrcamentoItemProduto[];
+  itens_processo: OrcamentoItemProcesso[];
+  itens_despesa_imposto: OrcamentoItemDespesaImposto[];
+}
+
+export interface NovoOrcamento {
+  produto_base: number;
+  quantidade?: string;
+  margem_lucro_percentual?: string;
+  descricao?: string;
+  achatar?: boolean;
+}
+
+export type CabecalhoOrcamento = Partial<
+  Pick<Orcamento, 'quantidade' | 'descricao' | 'status' | 'margem_lucro_percentual' | 'preco_venda_final'>
+>;
+
+// Linha com 'id' altera só os campos enviados; sem 'id' cria uma nova
+type LinhaLote<T> = Partial<Omit<T, 'custo_total_item'>>;
+
+export interface EdicaoLoteOrcamento {
+  cabecalho?: CabecalhoOrcamento;
+  itens_produto?: LinhaLote<OrcamentoItemProduto>[];
+  itens_processo?: LinhaLote<OrcamentoItemProcesso>[];
+  itens_despesa_imposto?: LinhaLote<OrcamentoItemDespesaImposto>[];
+  excluir?: {
+    itens_produto?: number[];
+    itens_processo?: number[];
+    itens_despesa_imposto?: number[];
+  };
+}
+
+export interface IndicadorStatus {
+  quantidade: number;
+  valor_total: string;
+  margem_media: string;
+}
+
+export interface IndicadorMes {
+  mes: string; // "2026-10"
+  orcamentos: number;
+  taxa_conversao: string | null; // aprovados / (aprovados + rejeitados), em %
+  receita: string; // valor dos aprovados
+  margem_media: string;
+  margem_realizada: string | null;
+  por_status: Record<string, IndicadorStatus>;
+}
+
+export const orcamentosAPI = {
+  /**
+   * Busca uma página de orçamentos (mais recentes primeiro).
+   * Passe o 'next' da página anterior como url para continuar.
+   */
+  page: (url: string = '/orcamentos/', params?: Record<string, string | number>) =>
+    api.get<PaginaCursor<OrcamentoResumo>>(url, { params }),
+
+  get: (id: number) => api.get<Orcamento>(`/orcamentos/${id}/`),
+
+  /**
+   * Cria um orçamento copiando a receita do produto base
+   */
+  create: (data: NovoOrcamento) => api.post<Orcamento>('/orcamentos/', data),
+
+  updateCabecalho: (id: number, data: CabecalhoOrcamento) =>
+    api.patch<Orcamento>(`/orcamentos/${id}/`, data),
+
+  /**
+   * Envia de uma vez todas as edições feitas nas abas
+   * (os totais são recalculados uma vez só no backend)
+   */
+  editarItens: (id: number, data: EdicaoLoteOrcamento) =>
+    api.patch<Orcamento>(`/orcamentos/${id}/itens/`, data),
+
+  /**
+   * Duplica o orçamento inteiro como um novo rascunho
+   */
+  clonar: (id: number, descricao?: string) =>
+    api.post<Orcamento>(`/orcamentos/${id}/clonar/`, descricao !== undefined ? { descricao } : {}),
+
+  /**
+   * Documento (HTML) do orçamento. Enquanto está sendo gerado a resposta
+   * é 202 (repita a chamada depois do Retry-After); pronto, vem o arquivo.
+   */
+  documento: (id: number) =>
+    api.get<Blob>(`/orcamentos/${id}/documento/`, { responseType: 'blob' }),
+
+  /**
+   * Conversão, margem e receita por mês (ex.: { de: '2026-01', ate: '2026-06' })
+   */
+  indicadores: (params?: { de?: string; ate?: string }) =>
+    api.get<{ meses: IndicadorMes[] }>('/orcamentos/indicadores/', { params }),
+
+  delete: (id: number) => api.delete(`/orcamentos/${id}/`),
+};
@@ -1,37 +1,13 @@
 // Em frontend/src/pages/dashboard/composicoes.tsx
 import React, { useState, useEffect, useCallback } from 'react';
-import { composicoesAPI, Composicao, Produto, produtosAPI } from '../../lib/api';
+import { composicoesAPI, Composicao } from '../../lib/api';
 import ComposicaoForm from '../../components/ComposicaoForm';
 import DashboardLayout from '../../components/DashboardLayoutModerno';
 
-// Componente para mapear o ID do produto ao seu nome
-const useProdutoMap = () => {
-    const [produtoMap, setProdutoMap] = useState<Map<number, string>>(new Map());
-
-    useEffect(() => {
-        const fetchAllProdutos = async () => {
-            try {
-                // Buscamos todos os produtos para que possamos mostrar o nome
-                const response = await produtosAPI.list();
-                const map = new Map<number, string>();
-                response.data.forEach(p => map.set(p.id, p.nome));
-                setProdutoMap(map);
-            } catch (err) {
-                console.error("Erro ao buscar nomes de produtos:", err);
-            }
-        };
-        fetchAllProdutos();
-    }, []);
-
-    return produtoMap;
-};
-
-
 const PaginaComposicoes = () => {
     const [composicoes, setComposicoes] = useState<Composicao[]>([]);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
-    const produtoMap = useProdutoMap(); // Hook para mapear IDs para nomes
 
     // --- Função para carregar as composições da API ---
     const carregarComposicoes = useCallback(async () => {
@@ -20,14 +20,15 @@ import {
 
 const PaginaProdutos = () => {
     const [produtos, setProdutos] = useState<Produto[]>([]);
-    const [produtosFiltrados, setProdutosFiltrados] = useState<Produto[]>([]);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
     const [searchTerm, setSearchTerm] = useState('');
     const [showModal, setShowModal] = useState(false);
     const [modalMode, setModalMode] = useState<'create' | 'edit'>('create');
     const [produtoSelecionado, setProdutoSelecionado] = useState<Produto | null>(null);
-    const [currentPage, setCurrentPage] = useState(1);
+    // Página atual da API (cursor) e os links para as vizinhas
+    const [paginaAtual, setPaginaAtual] = useState<string | null>(null);
+    const [links, setLinks] = useState<{ next: string | null; previous: string | null }>({ next: null, previous: null });
     const itemsPerPage = 10;
 
     // Form state
@@ -39,14 +40,19 @@ const PaginaProdutos = () => {
         unidade_medida: '',
     });
 
-    const carregarProdutos = async () => {
+    // Sem url: primeira página da busca atual. Com url: o 'next'/'previous' de uma página.
+    const carregarProdutos = async (url: string | null = paginaAtual) => {
         setIsLoading(true);
         setError(null);
 
         try {
-            const response = await produtosAPI.list();
-            setProdutos(response.data || []);
-            setProdutosFiltrados(response.data || []);
+            const termo = searchTerm.trim();
+            const response = url
+                ? await produtosAPI.page(url)
+                : await produtosAPI.page('/produtos/', { page_size: itemsPerPage, ...(termo ? { q: termo } : {}) });
+            setProdutos(response.data.results);
+            setLinks({ next: response.data.next, previous: response.data.previous });
+            setPaginaAtual(url);
         } catch (err) {
             console.error('Erro ao carregar:', err);
             setError('Falha ao carregar produtos.');
@@ -56,26 +62,11 @@ const PaginaProdutos = () => {
         }
     };
 
+    // Busca no servidor (nome ou SKU), voltando para a primeira página
     useEffect(() => {
-        carregarProdutos();
-    }, []);
-
-    // Filtro de busca
-    useEffect(() => {
-        const filtered = produtos.filter(produto =>
-            produto.nome.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            produto.codigo_sku.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            produto.tipo.toLowerCase().includes(searchTerm.toLowerCase())
-        );
-        setProdutosFiltrados(filtered);
-        setCurrentPage(1);
-    }, [searchTerm, produtos]);
-
-    // Paginação
-    const indexOfLastItem = currentPage * itemsPerPage;
-    const indexOfFirstItem = indexOfLastItem - itemsPerPage;
-    const currentItems = produtosFiltrados.slice(indexOfFirstItem, indexOfLastItem);
-    const totalPages = Math.ceil(produtosFiltrados.length / itemsPerPage);
+        const espera = setTimeout(() => carregarProdutos(null), 300);
+        return () => clearTimeout(espera);
+    }, [searchTerm]);
 
     const handleNovo = () => {
         setFormData({ nome: '', codigo_sku: '', tipo: 'PA', preco_custo: '', unidade_medida: '' });
@@ -187,7 +178,7 @@ const PaginaProdutos = () => {
                     />
                     <input
                         type="text"
-                        placeholder="Buscar por nome, SKU ou tipo..."
+                        placeholder="Buscar por nome ou SKU..."
                         value={searchTerm}
                         onChange={(e) => setSearchTerm(e.target.value)}
                         className="w-full pl-10 pr-4 py-2.5 border border-gray-300 rounded-lg text-sm outline-none focus:border-blue-500 focus:ring-2 focus:ring-blue-200 transition-all"
@@ -215,7 +206,7 @@ const PaginaProdutos = () => {
                     <div className="py-10 px-6 text-center">
                         <p className="text-red-600">⚠️ {error}</p>
                     </div>
-                ) : produtosFiltrados.length === 0 ? (
+                ) : produtos.length === 0 ? (
                     <div className="py-16 text-center">
                         <Package size={48} className="text-gray-300 mx-auto mb-4" />
                         <p className="text-gray-500 mb-2">
@@ -248,7 +239,7 @@ const PaginaProdutos = () => {
                                 </tr>
                             </thead>
                             <tbody>
-                                {currentItems.map((produto) => (
+                                {produtos.map((produto) => (
                                     <tr
                                         key={produto.id}
                                         className="border-b border-gray-100 hover:bg-gray-50 transition-colors"
@@ -352,22 +343,22 @@ const PaginaProdutos = () => {
                         </table>
 
                         {/* Paginação */}
-                        {totalPages > 1 && (
+                        {(links.next || links.previous) && (
                             <div className="px-5 py-4 border-t border-gray-200 flex justify-between items-center">
                                 <p className="text-sm text-gray-600">
-                                    Mostrando {indexOfFirstItem + 1} a {Math.min(indexOfLastItem, produtosFiltrados.length)} de {produtosFiltrados.length}
+                                    Mostrando {produtos.length} {produtos.length === 1 ? 'produto' : 'produtos'}
                                 </p>
                                 <div className="flex gap-2">
                                     <button
-                                        onClick={() => setCurrentPage((p) => Math.max(1, p - 1))}
-                                        disabled={currentPage === 1}
+                                        onClick={() => carregarProdutos(links.previous)}
+                                        disabled={!links.previous}
                                         className="px-3 py-1.5 border border-gray-300 rounded-md text-sm disabled:opacity-50 disabled:cursor-not-allowed hover:bg-gray-50"
                                     >
                                         Anterior
                                     </button>
                                     <button
-                                        onClick={() => setCurrentPage((p) => Math.min(totalPages, p + 1))}
-                                        disabled={currentPage === totalPages}
+                                        onClick={() => carregarProdutos(links.next)}
+                                        disabled={!links.next}
                                         className="px-3 py-1.5 border border-gray-300 rounded-md text-sm disabled:opacity-50 disabled:cursor-not-allowed hover:bg-gray-50"
                                     >
                                         Próxima
@@ -19,6 +19,7 @@ import { Trash2 } from 'lucide-react';
 
 const PaginaProdutos = () => {
     const [produtos, setProdutos] = useState<Produto[]>([]);
+    const [proximaPagina, setProximaPagina] = useState<string | null>(null);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
 
@@ -26,8 +27,10 @@ const PaginaProdutos = () => {
         setIsLoading(true);
         setError(null);
         try {
-            const response = await produtosAPI.list();
-            setProdutos(response.data);
+            // Primeira página (ordem alfabética); as seguintes vêm com "Carregar mais"
+            const response = await produtosAPI.page('/produtos/', { page_size: 100 });
+            setProdutos(response.data.results);
+            setProximaPagina(response.data.next);
         } catch (err) {
             setError('Falha ao carregar produtos.');
             console.error(err);
@@ -36,6 +39,18 @@ const PaginaProdutos = () => {
         }
     };
 
+    const carregarMais = async () => {
+        if (!proximaPagina) return;
+        try {
+            const response = await produtosAPI.page(proximaPagina);
+            setProdutos(prev => [...prev, ...response.data.results]);
+            setProximaPagina(response.data.next);
+        } catch (err) {
+            setError('Falha ao carregar produtos.');
+            console.error(err);
+        }
+    };
+
     useEffect(() => {
         carregarProdutos();
     }, []);
@@ -151,6 +166,12 @@ const PaginaProdutos = () => {
                             </tbody>
                         </table>
                     )}
+
+                    {!isLoading && proximaPagina && (
+                        <button onClick={carregarMais} style={{ marginTop: '12px', padding: '8px 16px', cursor: 'pointer' }}>
+                            Carregar mais
+                        </button>
+                    )}
                 </div>
             </div>
         </DashboardLayout>
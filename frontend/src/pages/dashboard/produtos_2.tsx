@@ -23,6 +23,7 @@ const initialFormData: ProdutoFormData = {
 
 const PaginaProdutos = () => {
     const [produtos, setProdutos] = useState<Produto[]>([]);
+    const [proximaPagina, setProximaPagina] = useState<string | null>(null);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
     const [searchTerm, setSearchTerm] = useState('');
@@ -38,8 +39,10 @@ const PaginaProdutos = () => {
         setIsLoading(true);
         setError(null);
         try {
-            const response = await produtosAPI.list();
-            setProdutos(response.data);
+            // Primeira página (ordem alfabética); as seguintes vêm com "Carregar mais"
+            const response = await produtosAPI.page('/produtos/', { page_size: 100 });
+            setProdutos(response.data.results);
+            setProximaPagina(response.data.next);
         } catch (err) {
             setError('Falha ao carregar produtos.');
             console.error(err);
@@ -48,6 +51,18 @@ const PaginaProdutos = () => {
         }
     };
 
+    const carregarMais = async () => {
+        if (!proximaPagina) return;
+        try {
+            const response = await produtosAPI.page(proximaPagina);
+            setProdutos(prev => [...prev, ...response.data.results]);
+            setProximaPagina(response.data.next);
+        } catch (err) {
+            setError('Falha ao carregar produtos.');
+            console.error(err);
+        }
+    };
+
     useEffect(() => {
         carregarProdutos();
     }, []);
@@ -403,6 +418,17 @@ const PaginaProdutos = () => {
                                 </tbody>
                             </table>
                         )}
+
+                        {!isLoading && proximaPagina && (
+                            <div className="p-4 border-t border-gray-200 text-center">
+                                <button
+                                    onClick={carregarMais}
+                                    className="px-4 py-2 text-sm font-medium text-blue-600 hover:bg-blue-50 rounded-lg transition-colors"
+                                >
+                                    Carregar mais produtos
+                                </button>
+                            </div>
+                        )}
                     </div>
                 </div>
             </div>